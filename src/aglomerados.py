@@ -0,0 +1,300 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.fronteira import remover_repetidos
+
+# Estados possíveis
+VAZIO = 0
+ARVORE = 1
+FOGO = 2
+
+# Metade da vizinhança de Moore: cada par de vizinhos aparece uma única vez
+LIGACOES = [(0, 1), (1, -1), (1, 0), (1, 1)]
+
+
+def raizes(pai):
+    """Salta ponteiros (pai[pai]) até cada elemento apontar direto para a sua raiz."""
+    while True:
+        avo = pai[pai]
+        if np.array_equal(avo, pai):
+            return pai
+        pai = avo
+
+
+def unir_pares(quantidade, a, b):
+    """Union-find vetorizado sobre `quantidade` elementos ligados pelos pares (a[k], b[k]).
+    A cada rodada, a raiz maior de cada par é pendurada na menor e os caminhos são
+    comprimidos; retorna a raiz (o menor elemento) do componente de cada elemento."""
+    pai = np.arange(quantidade)
+    while True:
+        pai = raizes(pai)
+        ra = pai[a]
+        rb = pai[b]
+        diferentes = ra != rb
+        if not diferentes.any():
+            return pai
+        a, b, ra, rb = a[diferentes], b[diferentes], ra[diferentes], rb[diferentes]
+        np.minimum.at(pai, np.maximum(ra, rb), np.minimum(ra, rb))
+
+
+def renumerar(raiz):
+    """Troca as raízes por rótulos 1..k, na ordem da primeira célula de cada componente."""
+    eh_raiz = raiz == np.arange(raiz.size)
+    novos = np.cumsum(eh_raiz)
+    return novos[raiz], int(novos[-1]) if raiz.size else 0
+
+
+def rotular(mascara):
+    """Rotula os aglomerados conexos (vizinhança de Moore, como em sequencial.vizinhos)
+    de uma máscara booleana. Retorna (rotulos, quantidade): 0 fora da máscara e 1..k nos
+    aglomerados, numerados pela ordem da primeira célula na varredura por linhas.
+    Só as células da máscara entram no union-find."""
+    n, m = mascara.shape
+    indices = np.flatnonzero(mascara)
+    rotulos = np.zeros((n, m), dtype=np.int64)
+    if indices.size == 0:
+        return rotulos, 0
+
+    origens = []
+    destinos = []
+    for di, dj in LIGACOES:
+        # Pares ((i, j), (i + di, j + dj)) com as duas células na máscara
+        ji, jf = max(0, -dj), m - max(0, dj)
+        ambos = mascara[:n - di, ji:jf] & mascara[di:, ji + dj:jf + dj]
+        linhas, colunas = np.nonzero(ambos)
+        origem = linhas * m + colunas + ji
+        origens.append(origem)
+        destinos.append(origem + di * m + dj)
+    # Posição de cada célula da máscara na lista compacta
+    tipo = np.int32 if indices.size < 2 ** 31 else np.int64
+    posicao = np.cumsum(mascara.reshape(-1), dtype=tipo) - 1
+    a = posicao[np.concatenate(origens)]
+    b = posicao[np.concatenate(destinos)]
+
+    rotulo, quantidade = renumerar(unir_pares(indices.size, a, b))
+    rotulos.reshape(-1)[indices] = rotulo
+    return rotulos, quantidade
+
+
+def procurar(ordenadas, alvos, coluna, m):
+    """Procura as posições lineares `alvos` (na coluna `coluna`, que pode sair da grade)
+    no array ordenado `ordenadas`. Retorna (k, achou) com ordenadas[k[achou]] == alvos[achou]."""
+    if ordenadas.size == 0:
+        return np.zeros(alvos.size, dtype=np.int64), np.zeros(alvos.size, dtype=bool)
+    k = np.minimum(np.searchsorted(ordenadas, alvos), ordenadas.size - 1)
+    achou = (coluna >= 0) & (coluna < m) & (ordenadas[k] == alvos)
+    return k, achou
+
+
+def rotular_celulas(celulas, m):
+    """Como rotular, mas para uma máscara esparsa dada pelas posições lineares ordenadas das
+    suas células numa grade de m colunas (ex.: as células em chamas). Custa O(k log k) para
+    k células, sem nenhum array do tamanho da grade. Retorna (rotulo de cada célula, quantidade)."""
+    coluna = celulas % m
+    a = []
+    b = []
+    for di, dj in LIGACOES:
+        k, achou = procurar(celulas, celulas + di * m + dj, coluna + dj, m)
+        a.append(np.flatnonzero(achou))
+        b.append(k[achou])
+    return renumerar(unir_pares(celulas.size, np.concatenate(a), np.concatenate(b)))
+
+
+def unir_faixas(faixas):
+    """Junta os rótulos de faixas horizontais consecutivas, rotuladas cada uma por conta
+    própria (em threads, processos ou nos clientes). Só a última linha de uma faixa e a
+    primeira da seguinte são comparadas; o resultado é igual ao de rotular a grade inteira.
+    faixas: lista de (rotulos, quantidade) na ordem das linhas."""
+    deslocamentos = np.cumsum([0] + [quantidade for _, quantidade in faixas])
+    total = int(deslocamentos[-1])
+
+    a = []
+    b = []
+    for k in range(len(faixas) - 1):
+        acima = faixas[k][0][-1]
+        abaixo = faixas[k + 1][0][0]
+        for dj in (-1, 0, 1):
+            # Coluna j de cima com a coluna j + dj de baixo
+            ji, jf = max(0, -dj), acima.size - max(0, dj)
+            r1 = acima[ji:jf]
+            r2 = abaixo[ji + dj:jf + dj]
+            ambos = (r1 > 0) & (r2 > 0)
+            a.append(r1[ambos] + deslocamentos[k])
+            b.append(r2[ambos] + deslocamentos[k + 1])
+
+    # Elemento 0 é o fundo; os rótulos globais vão de 1 a total
+    pares_a = np.concatenate(a) if a else np.zeros(0, dtype=np.int64)
+    pares_b = np.concatenate(b) if b else np.zeros(0, dtype=np.int64)
+    raiz = unir_pares(total + 1, pares_a, pares_b)
+    novo, quantidade = renumerar(raiz)
+    novo, quantidade = novo - 1, quantidade - 1
+
+    rotulos = np.concatenate([
+        np.where(r > 0, novo[r + deslocamentos[k]], 0) for k, (r, _) in enumerate(faixas)
+    ])
+    return rotulos, quantidade
+
+
+def rotular_faixas(mascara, regioes):
+    """Rotula a máscara faixa a faixa (regioes como em paralelo.dividir_linhas)
+    e junta os rótulos nas fronteiras entre faixas."""
+    return unir_faixas([rotular(mascara[inicio:fim]) for inicio, fim in regioes])
+
+
+def tamanhos(rotulos, quantidade):
+    """Número de células de cada aglomerado 1..quantidade."""
+    return np.bincount(rotulos.reshape(-1), minlength=quantidade + 1)[1:]
+
+
+def distribuicao_tamanhos(valores):
+    """Histograma em escala logarítmica (faixas [2^k, 2^(k+1))) de tamanhos de aglomerados
+    ou de incêndios: a distribuição do modelo segue uma lei de potência."""
+    valores = np.asarray(valores)
+    if valores.size == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    limites = 2 ** np.arange(int(np.log2(valores.max())) + 2)
+    contagens, _ = np.histogram(valores, bins=limites)
+    return limites[:-1], contagens
+
+
+class RastreadorIncendios:
+    """Acompanha cada incêndio da ignição até se apagar. Em cada passo, os aglomerados de
+    células em chamas são rotulados; um aglomerado vizinho de células que queimavam no
+    passo anterior continua o mesmo incêndio, um sem vizinhos é um incêndio novo e
+    aglomerados que se tocam fundem os seus incêndios. Só as células em chamas são
+    guardadas entre passos. Tem a mesma interface de um gravador (registrar(passo, grade)),
+    então pode ser passado como gravador= aos motores; precisa ver todos os passos.
+    Com regioes, a grade é rotulada por faixas, como faria cada cliente."""
+
+    intervalo = 1
+
+    def __init__(self, regioes=None):
+        self.regioes = regioes
+        # Células em chamas no passo anterior (posição linear, ordenadas) e o seu incêndio
+        self.celulas = np.zeros(0, dtype=np.int64)
+        self.incendios = np.zeros(0, dtype=np.int64)
+        self.proximo_id = 1
+        self.ativos = {}
+        self.extintos = []
+        self.ultimo_passo = -1
+
+    def deve_gravar(self, passo):
+        return passo > self.ultimo_passo
+
+    def rotular(self, fogo):
+        """Posições das células em chamas e o rótulo do aglomerado de cada uma."""
+        celulas = np.flatnonzero(fogo)
+        if self.regioes is None:
+            rotulo, quantidade = rotular_celulas(celulas, fogo.shape[1])
+        else:
+            rotulos, quantidade = rotular_faixas(fogo, self.regioes)
+            rotulo = rotulos.reshape(-1)[celulas]
+        return celulas, rotulo, quantidade
+
+    def ligacoes(self, celulas, rotulo, m):
+        """Pares (rótulo novo, posição do incêndio em ativos) entre células em chamas agora
+        e células vizinhas que queimavam no passo anterior, sem repetições."""
+        coluna = celulas % m
+        ids = np.array(sorted(self.ativos), dtype=np.int64)
+        rotulos = []
+        anteriores = []
+        for di in (-1, 0, 1):
+            for dj in (-1, 0, 1):
+                if di == 0 and dj == 0:
+                    continue
+                k, achou = procurar(self.celulas, celulas + di * m + dj, coluna + dj, m)
+                rotulos.append(rotulo[achou])
+                anteriores.append(np.searchsorted(ids, self.incendios[k[achou]]))
+        chaves = remover_repetidos(np.concatenate(rotulos) * (ids.size + 1) + np.concatenate(anteriores))
+        rotulos, anteriores = np.divmod(chaves, ids.size + 1)
+        return ids, rotulos, anteriores
+
+    def registrar(self, passo, grade):
+        """Processa o estado após `passo` iterações (grade NumPy, listas ou GradeBits)."""
+        if not self.deve_gravar(passo):
+            return False
+        if hasattr(grade, 'para_grade'):
+            grade = grade.para_grade()
+        fogo = np.asarray(grade) == FOGO
+        celulas, rotulo, quantidade = self.rotular(fogo)
+        tamanho = np.bincount(rotulo, minlength=quantidade + 1)
+
+        # Union-find entre os incêndios ativos (0..A-1) e os aglomerados novos (A + rótulo):
+        # cada aglomerado fica com o menor incêndio ligado a ele; incêndios ligados pelo
+        # mesmo aglomerado se fundem no menor
+        ids, rotulos, anteriores = self.ligacoes(celulas, rotulo, fogo.shape[1])
+        base = ids.size
+        raiz = unir_pares(base + quantidade + 1, base + rotulos, anteriores)
+
+        for k in np.flatnonzero(raiz[:base] != np.arange(base)):
+            # Fusão: a área e o início do incêndio absorvido passam para o sobrevivente
+            origem = self.ativos.pop(int(ids[k]))
+            destino = self.ativos[int(ids[raiz[k]])]
+            destino['inicio'] = min(destino['inicio'], origem['inicio'])
+            destino['area'] += origem['area']
+            destino['fusoes'] += 1 + origem['fusoes']
+
+        # Incêndio de cada aglomerado; os sem ligação abrem incêndios novos
+        dono = raiz[base + 1:]
+        continua = dono < base
+        incendio = np.zeros(quantidade + 1, dtype=np.int64)
+        incendio[1:][continua] = ids[dono[continua]]
+        novos, posicao = np.unique(dono[~continua], return_inverse=True)
+        incendio[1:][~continua] = self.proximo_id + posicao
+        for k in range(novos.size):
+            id_incendio = self.proximo_id + k
+            self.ativos[id_incendio] = {'id': id_incendio, 'inicio': passo, 'fim': None,
+                                        'area': 0, 'pico': 0, 'fusoes': 0}
+        self.proximo_id += novos.size
+
+        # Células em chamas de cada incêndio neste passo
+        presentes, posicao = np.unique(incendio[1:], return_inverse=True)
+        area = np.bincount(posicao, weights=tamanho[1:], minlength=presentes.size)
+        for id_incendio, celulas_passo in zip(presentes.tolist(), area.tolist()):
+            registro = self.ativos[id_incendio]
+            registro['area'] += int(celulas_passo)
+            registro['pico'] = max(registro['pico'], int(celulas_passo))
+
+        presentes = set(presentes.tolist())
+        for id_incendio in [i for i in self.ativos if i not in presentes]:
+            registro = self.ativos.pop(id_incendio)
+            registro['fim'] = passo
+            self.extintos.append(registro)
+
+        self.celulas = celulas
+        self.incendios = incendio[rotulo]
+        self.ultimo_passo = passo
+        return True
+
+    def areas(self):
+        """Área total queimada (células) de cada incêndio já extinto."""
+        return np.array([registro['area'] for registro in self.extintos], dtype=np.int64)
+
+    def fechar(self):
+        """Sem efeito: mantém a interface de um gravador."""
+
+
+if __name__ == "__main__":
+    # Uso: aglomerados.py <n> <iteracoes>  ou  aglomerados.py <diretorio de gravação>
+    rastreador = RastreadorIncendios()
+    inicio = time.perf_counter()
+    if len(sys.argv) > 1 and os.path.isdir(sys.argv[1]):
+        from src.gravacao import LeitorGravacao
+        for passo, grade in LeitorGravacao(sys.argv[1]):
+            rastreador.registrar(passo, grade)
+    else:
+        from src.vetorizado import simular_vetorizado
+        n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+        iteracoes = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+        simular_vetorizado(n, iteracoes, gravador=rastreador)
+
+    areas = rastreador.areas()
+    print(f"{len(areas)} incêndios extintos, {len(rastreador.ativos)} ainda ativos "
+          f"({time.perf_counter() - inicio:.2f}s)")
+    for limite, contagem in zip(*distribuicao_tamanhos(areas)):
+        print(f"área {limite:>8}-{2 * limite - 1:<8}: {contagem}")
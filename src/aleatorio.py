@@ -0,0 +1,37 @@
+import numpy as np
+
+# Fluxos independentes derivados da mesma semente
+FLUXO_GRADE = 0  # sorteios da grade inicial
+FLUXO_PASSO = 1  # sorteios de cada iteração
+FLUXO_PADRAO = 2  # sorteios dos padrões de grade inicial (ex.: manchas de floresta)
+
+# O Philox gera 4 números de 64 bits por valor do contador
+POR_CONTADOR = 4
+
+
+def semente_aleatoria():
+    """Semente nova, para execuções sem semente que precisam do fluxo contador (ex.: faixas
+    que recalculam linhas das vizinhas e precisam dos mesmos sorteios que elas)."""
+    return int(np.random.SeedSequence().generate_state(1, np.uint64)[0] >> np.uint64(1))
+
+
+def contadores_por_linha(m):
+    """Quantos valores do contador uma linha de m células consome."""
+    return (m + POR_CONTADOR - 1) // POR_CONTADOR
+
+
+def gerador(semente, passo=0, linha=0, m=1, fluxo=FLUXO_PASSO):
+    """Gerador contador (Philox) posicionado no início da linha `linha` do passo `passo`.
+    A chave vem de (semente, fluxo, passo) e o contador da linha, então o número sorteado
+    para uma célula não depende de quem o calcula nem de como a grade foi dividida."""
+    chave = np.random.SeedSequence([semente, fluxo, passo]).generate_state(2, np.uint64)
+    contador = [linha * contadores_por_linha(m), 0, 0, 0]
+    return np.random.Generator(np.random.Philox(key=chave, counter=contador))
+
+
+def sorteios(semente, passo, inicio, fim, m, fluxo=FLUXO_PASSO):
+    """Números uniformes em [0, 1) das linhas [inicio, fim) de uma grade de m colunas.
+    Cada linha ocupa um trecho fixo do contador; as sobras do último bloco são descartadas."""
+    passo_linha = contadores_por_linha(m) * POR_CONTADOR
+    rng = gerador(semente, passo, inicio, m, fluxo)
+    return rng.random((fim - inicio) * passo_linha).reshape(fim - inicio, passo_linha)[:, :m]
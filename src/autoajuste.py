@@ -0,0 +1,154 @@
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.nucleo import NUCLEO
+from src.paralelo import simular_paralelo_final
+
+# Cache das calibrações: uma entrada por máquina e por faixa de tamanho de grade
+ARQUIVO_PADRAO = os.environ.get('FOREST_FIRE_AUTOAJUSTE',
+                                os.path.join(os.path.expanduser('~'), '.cache', 'forest_fire', 'autoajuste.json'))
+
+# Faixas de linhas por trabalhador testadas nos backends de threads (mais faixas que
+# threads equilibra a carga quando o fogo se concentra numa parte da grade)
+FAIXAS_POR_TRABALHADOR = (1, 2, 4)
+
+# Com o núcleo em Python puro (src/nucleo.py), acima disto o backend de threads fica fora
+# da calibração: é ordens de grandeza mais lento que os vetorizados e a tentativa
+# custaria mais que a simulação
+LIMITE_PYTHON = 250_000
+
+
+def balde(n):
+    """Faixa de tamanho da grade: a potência de 2 mais próxima acima de n."""
+    return 1 << max(0, math.ceil(math.log2(max(1, n))))
+
+
+def assinatura():
+    """Identifica a máquina: uma calibração não vale em outro hardware ou ambiente (nem
+    com outro núcleo de passo, src/nucleo.py)."""
+    return '|'.join(str(v) for v in (platform.node(), platform.machine(), os.cpu_count(),
+                                     platform.python_version(), np.__version__, NUCLEO))
+
+
+def trabalhadores_possiveis(nucleos=None):
+    """Potências de 2 até o número de núcleos, e o próprio número de núcleos."""
+    nucleos = nucleos or os.cpu_count() or 1
+    return sorted({1 << k for k in range(nucleos.bit_length()) if 1 << k <= nucleos} | {nucleos})
+
+
+def candidatos(n, nucleos=None):
+    """Configurações (backend, trabalhadores, faixas) testadas na calibração. Todas chegam
+    à mesma grade com a mesma semente, então qualquer uma pode ser escolhida."""
+    configuracoes = [{'backend': 'numpy', 'trabalhadores': 1, 'faixas': 1}]
+    for t in trabalhadores_possiveis(nucleos):
+        backends = ['bits'] + (['threads'] if NUCLEO != 'python' or n * n <= LIMITE_PYTHON else [])
+        for backend in backends:
+            for k in FAIXAS_POR_TRABALHADOR:
+                if t * k <= n:
+                    configuracoes.append({'backend': backend, 'trabalhadores': t, 'faixas': t * k})
+        if t > 1:
+            configuracoes.append({'backend': 'processos', 'trabalhadores': t, 'faixas': t})
+    return configuracoes
+
+
+def padrao(n):
+    """Configuração usada sem calibração: vetorizado nas grades pequenas, grade compacta
+    com uma thread por núcleo nas grandes."""
+    if n < 400:
+        return {'backend': 'numpy', 'trabalhadores': 1, 'faixas': 1}
+    nucleos = os.cpu_count() or 1
+    return {'backend': 'bits', 'trabalhadores': nucleos, 'faixas': nucleos}
+
+
+def medir(configuracao, n, iteracoes=3, repeticoes=2, semente=0):
+    """Menor tempo por passo da configuração entre as repetições (segundos)."""
+    tempos = [
+        simular_paralelo_final(n, iteracoes, configuracao['trabalhadores'], backend=configuracao['backend'],
+                               semente=semente, num_faixas=configuracao['faixas'])
+        for _ in range(repeticoes)
+    ]
+    return min(tempos) / iteracoes
+
+
+def calibrar(n, iteracoes=3, repeticoes=2, nucleos=None, verboso=False):
+    """Mede cada candidata numa grade n x n e retorna (melhor configuração, medidas)."""
+    medidas = []
+    for configuracao in candidatos(n, nucleos):
+        tempo = medir(configuracao, n, iteracoes, repeticoes)
+        medidas.append(dict(configuracao, tempo_passo=tempo))
+        if verboso:
+            print(f"  {configuracao['backend']:<10}{configuracao['trabalhadores']:>4}{configuracao['faixas']:>5}"
+                  f"{1000 * tempo:>12.2f}ms/passo")
+    melhor = min(medidas, key=lambda m: m['tempo_passo'])
+    return dict(melhor, n=n), medidas
+
+
+def carregar(arquivo=None):
+    """Calibrações guardadas para esta máquina: {balde (str): configuração}."""
+    try:
+        with open(arquivo or ARQUIVO_PADRAO) as f:
+            return json.load(f).get(assinatura(), {})
+    except (OSError, ValueError):
+        return {}
+
+
+def guardar(tamanho, configuracao, arquivo=None):
+    """Grava a configuração do balde de `tamanho`, preservando as de outras máquinas."""
+    arquivo = arquivo or ARQUIVO_PADRAO
+    try:
+        with open(arquivo) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    cache.setdefault(assinatura(), {})[str(balde(tamanho))] = configuracao
+    os.makedirs(os.path.dirname(os.path.abspath(arquivo)), exist_ok=True)
+    # Escreve num temporário e troca: outro processo nunca lê um arquivo pela metade
+    temporario = f"{arquivo}.{os.getpid()}.tmp"
+    with open(temporario, 'w') as f:
+        json.dump(cache, f, indent=1)
+    os.replace(temporario, arquivo)
+
+
+def escolher(n, arquivo=None, calibrar_se_preciso=True):
+    """Configuração mais rápida para uma grade n x n nesta máquina. Sem calibração guardada
+    para o balde de n, calibra uma vez (com esse n) e guarda o resultado; com
+    calibrar_se_preciso=False, usa a configuração padrão."""
+    configuracao = carregar(arquivo).get(str(balde(n)))
+    if configuracao is not None:
+        return configuracao
+    if not calibrar_se_preciso:
+        return padrao(n)
+    print(f"Autoajuste: calibrando grades até {balde(n)}x{balde(n)} nesta máquina (uma vez)")
+    configuracao, _ = calibrar(n)
+    try:
+        guardar(n, configuracao, arquivo)
+    except OSError as e:
+        print(f"Autoajuste: não foi possível guardar a calibração ({e})")
+    return configuracao
+
+
+if __name__ == "__main__":
+    # Recalibra os tamanhos pedidos e atualiza o cache, por exemplo:
+    # python src/autoajuste.py 200 500 1000 iteracoes=5 repeticoes=3 arquivo=autoajuste.json
+    opcoes = dict(o.split('=', 1) for o in sys.argv[1:] if '=' in o)
+    tamanhos = [int(a) for a in sys.argv[1:] if '=' not in a] or [200, 500, 1000]
+    arquivo = opcoes.get('arquivo')
+
+    print(f"Máquina: {assinatura()}")
+    for n in tamanhos:
+        print(f"\nn={n} (balde {balde(n)})")
+        print(f"  {'Backend':<10}{'T':>4}{'F':>5}{'Tempo':>14}")
+        inicio = time.perf_counter()
+        melhor, _ = calibrar(n, int(opcoes.get('iteracoes', 3)), int(opcoes.get('repeticoes', 2)), verboso=True)
+        guardar(n, melhor, arquivo)
+        print(f"  Melhor: {melhor['backend']} com {melhor['trabalhadores']} trabalhador(es) e {melhor['faixas']} "
+              f"faixa(s) ({time.perf_counter() - inicio:.1f}s de calibração)")
+    print(f"\nCalibrações em {arquivo or ARQUIVO_PADRAO}")
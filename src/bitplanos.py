@@ -0,0 +1,259 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.aleatorio import semente_aleatoria
+from src.estatisticas import novos_contadores, somar_contadores, somar_transicoes
+from src.inicializacao import criar_grade_bits
+from src.paralelo import dividir_linhas
+from src.vetorizado import CELULAS_POR_BLOCO, avancar_passos, sortear_linhas
+
+# Estados possíveis
+VAZIO = 0
+ARVORE = 1
+FOGO = 2
+
+# Palavras de 64 bits, bit j % 64 da palavra j // 64 é a coluna j
+BITS = 64
+PALAVRA = np.dtype('<u8')
+
+
+def palavras_por_linha(m):
+    """Quantidade de palavras de 64 bits para guardar m colunas."""
+    return (m + BITS - 1) // BITS
+
+
+def empacotar_linhas(mascara):
+    """Converte uma máscara booleana (linhas x m) em palavras de 64 bits por linha."""
+    linhas, m = mascara.shape
+    bytes_ = np.packbits(mascara, axis=1, bitorder='little')
+    completo = np.zeros((linhas, palavras_por_linha(m) * 8), dtype=np.uint8)
+    completo[:, :bytes_.shape[1]] = bytes_
+    return completo.view(PALAVRA)
+
+
+def desempacotar_linhas(plano, m):
+    """Operação inversa de empacotar_linhas."""
+    return np.unpackbits(plano.view(np.uint8), axis=1, count=m, bitorder='little').astype(bool)
+
+
+class GradeBits:
+    """Grade compacta em dois planos de bits ('árvore' e 'fogo'): 2 bits por célula.
+    Uma célula vazia não tem nenhum dos dois bits. Uma grade 20k x 20k ocupa 100 MB."""
+
+    def __init__(self, n, m=None):
+        self.n = n
+        self.m = n if m is None else m
+        w = palavras_por_linha(self.m)
+        self.arvore = np.zeros((n, w), dtype=PALAVRA)
+        self.fogo = np.zeros((n, w), dtype=PALAVRA)
+        # Bits válidos da última palavra (as colunas além de m ficam sempre zeradas)
+        self.validos = np.full(w, ~np.uint64(0), dtype=PALAVRA)
+        if self.m % BITS:
+            self.validos[-1] = np.uint64((1 << (self.m % BITS)) - 1)
+
+    @classmethod
+    def de_grade(cls, grade):
+        """Cria a grade compacta a partir de uma grade de estados (array ou listas)."""
+        grade = np.asarray(grade, dtype=np.uint8)
+        bits = cls(*grade.shape)
+        bits.arvore[...] = empacotar_linhas(grade == ARVORE)
+        bits.fogo[...] = empacotar_linhas(grade == FOGO)
+        return bits
+
+    def para_grade(self, inicio=0, fim=None):
+        """Expande as linhas [inicio, fim) para um array uint8 de estados."""
+        fim = self.n if fim is None else fim
+        grade = desempacotar_linhas(self.arvore[inicio:fim], self.m).astype(np.uint8)
+        grade[desempacotar_linhas(self.fogo[inicio:fim], self.m)] = FOGO
+        return grade
+
+    def linhas(self, inicio, fim):
+        """Grade com as linhas [inicio, fim) desta, compartilhando a memória."""
+        vista = object.__new__(type(self))
+        vista.n, vista.m, vista.validos = fim - inicio, self.m, self.validos
+        vista.arvore = self.arvore[inicio:fim]
+        vista.fogo = self.fogo[inicio:fim]
+        return vista
+
+    @property
+    def nbytes(self):
+        return self.arvore.nbytes + self.fogo.nbytes
+
+    def marcar(self, mascara_plana, indices):
+        """Liga em mascara_plana (n x palavras, achatada) os bits das células indices."""
+        linhas, colunas = np.divmod(indices, self.m)
+        palavras = linhas * self.arvore.shape[1] + colunas // BITS
+        bits = np.left_shift(np.uint64(1), (colunas % BITS).astype(PALAVRA))
+        np.bitwise_or.at(mascara_plana, palavras, bits)
+
+
+def contar_bits(plano):
+    """Quantidade de bits ligados (popcount) de um plano."""
+    if hasattr(np, 'bitwise_count'):
+        return int(np.bitwise_count(plano).sum(dtype=np.int64))
+    return int(np.unpackbits(plano.view(np.uint8)).sum(dtype=np.int64))
+
+
+def vizinhos_em_fogo_bits(fogo, inicio, fim, validos):
+    """Máscara de bits das linhas [inicio, fim) com algum vizinho de Moore em chamas.
+    OR vertical das três linhas e depois deslocamentos de 1 bit com o vai-um entre palavras."""
+    n = fogo.shape[0]
+    um = np.uint64(1)
+    topo = np.uint64(BITS - 1)
+
+    vertical = fogo[inicio:fim].copy()
+    if inicio > 0:
+        vertical[0] |= fogo[inicio - 1]
+    vertical[1:] |= fogo[inicio:fim - 1]
+    vertical[:-1] |= fogo[inicio + 1:fim]
+    if fim < n:
+        vertical[-1] |= fogo[fim]
+
+    # Coluna j recebe a coluna j - 1 (deslocamento para a esquerda) e j + 1 (para a direita)
+    resultado = vertical | (vertical << um) | (vertical >> um)
+    resultado[:, 1:] |= vertical[:, :-1] >> topo
+    resultado[:, :-1] |= vertical[:, 1:] << topo
+    resultado &= validos
+    return resultado
+
+
+def sortear_mascara(grade, inicio, fim, prob, rng):
+    """Máscara de bits das linhas [inicio, fim) com cada célula ligada com probabilidade prob.
+    Sorteia quantas células são atingidas (binomial) e quais, como no motor de fronteira."""
+    linhas = fim - inicio
+    total = linhas * grade.m
+    mascara = np.zeros((linhas, grade.arvore.shape[1]), dtype=PALAVRA)
+    quantidade = rng.binomial(total, prob)
+    if quantidade:
+        indices = rng.choice(total, size=quantidade, replace=False, shuffle=False)
+        grade.marcar(mascara.reshape(-1), indices)
+    return mascara
+
+
+def avancar_faixa_bits(atual, nova, inicio, fim, prob_crescimento=0.01, prob_fogo=0.0001, rng=None,
+                       semente=None, passo=0, deslocamento=0, contadores=None):
+    """Escreve em nova as linhas [inicio, fim) do próximo estado de atual, palavra a palavra.
+    Cada operação lógica processa 64 células de uma vez; a faixa é percorrida em blocos
+    de linhas para limitar a memória temporária. Com semente, as máscaras aleatórias saem
+    de um sorteio por célula (o mesmo de vetorizado.avancar_faixa) e o resultado é idêntico.
+    contadores (src/estatisticas.py) recebe as contagens do passo, por popcount das máscaras."""
+    rng = np.random.default_rng() if rng is None else rng
+    linhas_por_bloco = max(1, CELULAS_POR_BLOCO // max(1, atual.m))
+    for a in range(inicio, fim, linhas_por_bloco):
+        b = min(fim, a + linhas_por_bloco)
+        arvore = atual.arvore[a:b]
+        fogo = atual.fogo[a:b]
+
+        if semente is None:
+            espontaneo = sortear_mascara(atual, a, b, prob_fogo, rng)
+            crescimento = sortear_mascara(atual, a, b, prob_crescimento, rng)
+        else:
+            sorteio = sortear_linhas(a + deslocamento, b + deslocamento, atual.m, semente=semente, passo=passo)
+            espontaneo = empacotar_linhas(sorteio < prob_fogo)
+            crescimento = empacotar_linhas(sorteio < prob_crescimento)
+
+        queimando = vizinhos_em_fogo_bits(atual.fogo, a, b, atual.validos)
+        queimando |= espontaneo
+        vazio = ~(arvore | fogo) & atual.validos
+
+        crescimento &= vazio
+        np.bitwise_and(arvore, queimando, out=nova.fogo[a:b])
+        nova.arvore[a:b] = (arvore & ~queimando) | crescimento
+        if contadores is not None:
+            somar_transicoes(contadores, (b - a) * atual.m, contar_bits(arvore), contar_bits(vazio),
+                             contar_bits(crescimento), contar_bits(nova.fogo[a:b]))
+
+
+def avancar_bloco_bits(atual, nova, locais, inicio, fim, passos, prob_crescimento, prob_fogo, semente, passo, serie):
+    """Bloqueio temporal na grade compacta: copia a faixa [inicio, fim) com até `passos`
+    linhas de halo para os buffers locais da faixa, avança `passos` passos neles e escreve
+    a faixa em nova. serie recebe os contadores de cada passo da faixa."""
+    topo, base = max(0, inicio - passos), min(atual.n, fim + passos)
+    # Os buffers locais têm espaço para o halo completo; na borda da grade usa-se só o começo
+    local, reserva = (grade.linhas(0, base - topo) for grade in locais)
+    local.arvore[...] = atual.arvore[topo:base]
+    local.fogo[...] = atual.fogo[topo:base]
+    resultado, _ = avancar_passos(local, reserva, inicio - topo, fim - topo, passos, prob_crescimento, prob_fogo,
+                                  None, semente, passo, topo, serie, avancar=avancar_faixa_bits)
+    nova.arvore[inicio:fim] = resultado.arvore[inicio - topo:fim - topo]
+    nova.fogo[inicio:fim] = resultado.fogo[inicio - topo:fim - topo]
+
+
+def simular_bits(n, iteracoes, prob_arvore=0.6, prob_crescimento=0.01, prob_fogo=0.0001, num_threads=1,
+                 semente=None, gravador=None, serie=None, num_faixas=None, profundidade=1):
+    """Executa a simulação com a grade compacta e retorna o tempo gasto.
+    Com num_threads > 1, as faixas de linhas são avançadas em paralelo (o NumPy libera o GIL).
+    num_faixas divide as linhas em mais faixas que threads (padrão: uma por thread).
+    Com profundidade k > 1, cada faixa avança k passos sobre uma cópia com k linhas de halo
+    e as threads sincronizam uma vez por bloco (sem semente, uma é sorteada).
+    Com serie (lista), cada faixa conta o seu passo e as contagens são somadas."""
+    atual = criar_grade_bits(n, prob_arvore, semente, num_threads=num_threads)
+    nova = GradeBits(n)
+    faixas = dividir_linhas(n, num_faixas or num_threads)
+    geradores = [np.random.default_rng(s) for s in np.random.SeedSequence().spawn(len(faixas))]
+    if profundidade > 1:
+        semente = semente_aleatoria() if semente is None else semente
+        locais = [[GradeBits(b - a + 2 * profundidade, n) for _ in range(2)] for a, b in faixas]
+
+    with ThreadPoolExecutor(max_workers=max(1, min(num_threads, len(faixas)))) as executor:
+        inicio = time.perf_counter()
+        if gravador is not None:
+            gravador.registrar(0, atual)
+        passo = 0
+        while profundidade > 1 and passo < iteracoes:
+            # Blocos terminam nos passos que o gravador quer
+            k = min(profundidade, iteracoes - passo)
+            if gravador is not None:
+                k = min(k, gravador.intervalo - passo % gravador.intervalo)
+            series = [[] for _ in faixas]
+            futuros = [
+                executor.submit(avancar_bloco_bits, atual, nova, locais_faixa, a, b, k, prob_crescimento, prob_fogo,
+                                semente, passo, parcial)
+                for (a, b), locais_faixa, parcial in zip(faixas, locais, series)
+            ]
+            for futuro in futuros:
+                futuro.result()
+            atual, nova = nova, atual
+            if serie is not None:
+                for j in range(k):
+                    total = novos_contadores()
+                    for parcial in series:
+                        somar_contadores(total, parcial[j])
+                    serie.append(total)
+            passo += k
+            if gravador is not None:
+                gravador.registrar(passo, atual)
+        for passo in range(passo, iteracoes):
+            parciais = [None if serie is None else novos_contadores() for _ in faixas]
+            futuros = [
+                executor.submit(avancar_faixa_bits, atual, nova, a, b, prob_crescimento, prob_fogo, rng, semente, passo,
+                                0, parcial)
+                for (a, b), rng, parcial in zip(faixas, geradores, parciais)
+            ]
+            for futuro in futuros:
+                futuro.result()
+            atual, nova = nova, atual
+            if serie is not None:
+                total = novos_contadores()
+                for parcial in parciais:
+                    somar_contadores(total, parcial)
+                serie.append(total)
+            if gravador is not None:
+                gravador.registrar(passo + 1, atual)
+        fim = time.perf_counter()
+
+    return fim - inicio
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    iteracoes = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    tempo = simular_bits(n, iteracoes)
+    print(f"Tempo grade compacta ({n}x{n}, {2 * n * n / 8 / 1e6:.0f} MB): {tempo:.4f} segundos")
@@ -0,0 +1,225 @@
+import itertools
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.estatisticas import novos_contadores, somar_transicoes
+from src.inicializacao import criar_grade
+from src.vetorizado import sortear_linhas
+
+# Estados possíveis
+VAZIO = 0
+ARVORE = 1
+FOGO = 2
+
+# Tamanho padrão dos blocos: 32 mil células, cujo bloco uint8 e sorteios (float64) cabem
+# juntos no cache L2 de um núcleo
+ALTURA_BLOCO = 128
+LARGURA_BLOCO = 256
+
+
+def dividir(total, tamanho):
+    """Intervalos [inicio, fim) de até `tamanho` elementos cobrindo 0..total."""
+    return [(inicio, min(total, inicio + tamanho)) for inicio in range(0, total, tamanho)]
+
+
+def dilatar(mascara):
+    """OR 3x3 de uma máscara booleana (blocos vizinhos de um bloco com fogo)."""
+    n, m = mascara.shape
+    borda = np.zeros((n + 2, m + 2), dtype=bool)
+    borda[1:-1, 1:-1] = mascara
+    vertical = borda[:-2] | borda[1:-1] | borda[2:]
+    return vertical[:, :-2] | vertical[:, 1:-1] | vertical[:, 2:]
+
+
+class SimulacaoBlocos:
+    """Motor em blocos 2D: a grade é dividida em blocos do tamanho do cache, distribuídos
+    dinamicamente entre as threads (cada uma pega o próximo bloco livre).
+    Os dois buffers têm uma moldura de células vazias, então a vizinhança de qualquer
+    bloco é uma janela com uma célula a mais de cada lado, sem testes de limite.
+    Um bloco só de árvores, sem fogo nele nem nos blocos vizinhos, só muda por ignição
+    espontânea: não passa pelo estêncil (comum em floresta densa). Sem semente, as ignições
+    desses blocos são sorteadas em bloco (binomial), como no motor de fronteira; com
+    semente, vêm dos mesmos sorteios dos outros motores e a grade é idêntica à deles."""
+
+    def __init__(self, grade, num_threads=1, prob_crescimento=0.01, prob_fogo=0.0001, semente=None,
+                 altura=ALTURA_BLOCO, largura=LARGURA_BLOCO):
+        self.n, self.m = grade.shape
+        self.atual = np.zeros((self.n + 2, self.m + 2), dtype=np.uint8)
+        self.atual[1:-1, 1:-1] = grade
+        self.nova = np.zeros_like(self.atual)
+        self.prob_crescimento = prob_crescimento
+        self.prob_fogo = prob_fogo
+        self.semente = semente
+        self.passos = 0
+        self.contadores = None
+        self.linhas = dividir(self.n, altura)
+        self.colunas = dividir(self.m, largura)
+        self.blocos = [(bi, bj) for bi in range(len(self.linhas)) for bj in range(len(self.colunas))]
+
+        # Situação de cada bloco no estado atual; atualizada por quem calcula o bloco
+        forma = (len(self.linhas), len(self.colunas))
+        self.tem_fogo = np.zeros(forma, dtype=bool)
+        self.tem_vazio = np.zeros(forma, dtype=bool)
+        for bi, bj in self.blocos:
+            cel = self.bloco(self.atual, bi, bj)
+            self.tem_fogo[bi, bj] = (cel == FOGO).any()
+            self.tem_vazio[bi, bj] = (cel == VAZIO).any()
+        self.inertes = 0
+
+        # Com semente, os sorteios de uma linha de blocos são gerados uma vez (pela primeira
+        # thread que precisa deles) e descartados quando o último bloco da linha termina
+        self.travas = [threading.Lock() for _ in self.linhas]
+        self.sorteios_linha = [None] * len(self.linhas)
+        self.pendentes = [0] * len(self.linhas)
+
+        self.num_threads = max(1, min(num_threads, len(self.blocos)))
+        self.geradores = [np.random.default_rng(s) for s in np.random.SeedSequence().spawn(self.num_threads)]
+        self.executor = ThreadPoolExecutor(max_workers=self.num_threads) if self.num_threads > 1 else None
+
+    def bloco(self, buffer, bi, bj, borda=0):
+        """Vista do bloco (bi, bj) num buffer com moldura, com `borda` células em volta."""
+        (i0, i1), (j0, j1) = self.linhas[bi], self.colunas[bj]
+        return buffer[i0 + 1 - borda:i1 + 1 + borda, j0 + 1 - borda:j1 + 1 + borda]
+
+    def sorteios(self, bi, bj, rng):
+        """Um número por célula do bloco: do fluxo da semente ou do gerador da thread."""
+        (i0, i1), (j0, j1) = self.linhas[bi], self.colunas[bj]
+        if self.semente is None:
+            return rng.random((i1 - i0, j1 - j0))
+        with self.travas[bi]:
+            if self.sorteios_linha[bi] is None:
+                self.sorteios_linha[bi] = sortear_linhas(i0, i1, self.m, semente=self.semente, passo=self.passos)
+            return self.sorteios_linha[bi][:, j0:j1]
+
+    def liberar(self, bi):
+        """Marca um bloco da linha bi como feito; o último libera os sorteios da linha."""
+        if self.semente is not None:
+            with self.travas[bi]:
+                self.pendentes[bi] -= 1
+                if self.pendentes[bi] == 0:
+                    self.sorteios_linha[bi] = None
+
+    def avancar_bloco(self, bi, bj, ativo, rng, contadores):
+        """Escreve em self.nova o próximo estado do bloco (bi, bj)."""
+        cel = self.bloco(self.atual, bi, bj)
+        saida = self.bloco(self.nova, bi, bj)
+        altura, largura = cel.shape
+
+        if not ativo:
+            # Só árvores e nenhum fogo por perto: só a ignição espontânea muda alguma célula
+            saida.fill(ARVORE)
+            if self.semente is None:
+                quantidade = rng.binomial(cel.size, self.prob_fogo)
+                posicoes = rng.choice(cel.size, size=quantidade, replace=False, shuffle=False)
+                saida[posicoes // largura, posicoes % largura] = FOGO
+                ignicoes = int(quantidade)
+            else:
+                queimou = self.sorteios(bi, bj, rng) < self.prob_fogo
+                saida[queimou] = FOGO
+                ignicoes = int(np.count_nonzero(queimou))
+            arvores, vazios, crescimento = cel.size, 0, 0
+        else:
+            fogo = self.bloco(self.atual, bi, bj, 1) == FOGO
+            vertical = fogo[:-2] | fogo[1:-1] | fogo[2:]
+            queimando = vertical[:, :-2] | vertical[:, 1:-1] | vertical[:, 2:]
+            sorteio = self.sorteios(bi, bj, rng)
+            arvore = cel == ARVORE
+            vazio = cel == VAZIO
+            # Mesmas regras de vetorizado.avancar_faixa: um sorteio por célula
+            cresceu = vazio & (sorteio < self.prob_crescimento)
+            queimou = arvore & ((sorteio < self.prob_fogo) | queimando)
+            saida[...] = arvore | cresceu
+            saida[queimou] = FOGO
+            arvores, vazios = int(np.count_nonzero(arvore)), int(np.count_nonzero(vazio))
+            crescimento, ignicoes = int(np.count_nonzero(cresceu)), int(np.count_nonzero(queimou))
+
+        self.liberar(bi)
+        # Situação do bloco no novo estado, tirada das contagens (sem nova varredura)
+        self.tem_fogo[bi, bj] = ignicoes > 0
+        self.tem_vazio[bi, bj] = cel.size - arvores - crescimento > 0
+        if contadores is not None:
+            somar_transicoes(contadores, cel.size, arvores, vazios, crescimento, ignicoes)
+
+    def trabalhar(self, proximo, ativos, rng):
+        """Laço de uma thread: pega o próximo bloco livre até acabarem os blocos."""
+        contadores = novos_contadores()
+        for k in proximo:
+            if k >= len(self.blocos):
+                break
+            bi, bj = self.blocos[k]
+            self.avancar_bloco(bi, bj, ativos[bi, bj], rng, contadores)
+        return contadores
+
+    def passo(self):
+        """Avança uma iteração e retorna a grade atual (sem a moldura)."""
+        # Decidido antes do passo: as threads reescrevem tem_fogo e tem_vazio
+        ativos = self.tem_vazio | dilatar(self.tem_fogo)
+        self.inertes = int(ativos.size - np.count_nonzero(ativos))
+        self.pendentes = [len(self.colunas)] * len(self.linhas)
+        # next() num itertools.count é atômico: cada bloco sai para uma única thread
+        proximo = itertools.count()
+        if self.executor is None:
+            parciais = [self.trabalhar(proximo, ativos, self.geradores[0])]
+        else:
+            futuros = [self.executor.submit(self.trabalhar, proximo, ativos, rng) for rng in self.geradores]
+            parciais = [futuro.result() for futuro in futuros]
+        self.contadores = novos_contadores()
+        for parcial in parciais:
+            for campo, valor in parcial.items():
+                self.contadores[campo] += valor
+
+        self.atual, self.nova = self.nova, self.atual
+        self.passos += 1
+        return self.grade()
+
+    def grade(self):
+        """Vista da grade atual sem a moldura."""
+        return self.atual[1:-1, 1:-1]
+
+    def fechar(self):
+        """Encerra o pool de threads."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+def simular_blocos(n, iteracoes, prob_arvore=0.6, prob_crescimento=0.01, prob_fogo=0.0001, num_threads=1,
+                   semente=None, gravador=None, serie=None, altura=ALTURA_BLOCO, largura=LARGURA_BLOCO):
+    """Executa a simulação com o motor em blocos e retorna o tempo gasto nas iterações.
+    gravador (src/gravacao.py) recebe os estados a gravar e serie (lista) os contadores."""
+    grade = criar_grade(n, prob_arvore, semente=semente)
+    with SimulacaoBlocos(grade, num_threads, prob_crescimento, prob_fogo, semente, altura, largura) as simulacao:
+        inicio = time.perf_counter()
+        if gravador is not None:
+            gravador.registrar(0, simulacao.grade())
+        for passo in range(iteracoes):
+            simulacao.passo()
+            if serie is not None:
+                serie.append(simulacao.contadores)
+            if gravador is not None:
+                gravador.registrar(passo + 1, simulacao.grade())
+        fim = time.perf_counter()
+    return fim - inicio
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    iteracoes = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    prob_arvore = float(sys.argv[3]) if len(sys.argv) > 3 else 0.6
+
+    for num_threads in [1, 2, 4]:
+        tempo = simular_blocos(n, iteracoes, prob_arvore, num_threads=num_threads, semente=0)
+        print(f"{num_threads} threads: {tempo:.4f} segundos")
@@ -1,138 +1,371 @@
-import random
+import os
 import socket
-import json
 import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.aleatorio import sorteios
+from src.estatisticas import novos_contadores
+from src.nucleo import avancar_linhas, buffer_como, formatar
+from src.protocolo import FORMATO_JSON, FORMATOS, codificar_partes, decodificar
+from src.quadros import Receptor, enviar_quadro
+from src.vetorizado import avancar_faixa, avancar_passos
+from src.bitplanos import GradeBits, avancar_faixa_bits, empacotar_linhas
+from src.inicializacao import gerar_linhas
+from src.memoria_local import GradesCompartilhadas
 
 # Estados possíveis
 VAZIO = 0
 ARVORE = 1
 FOGO = 2
 
-def contar_vizinhos_fogo(matriz, i, j):
-    """Conta quantos vizinhos estão em chamas."""
-    n, m = len(matriz), len(matriz[0]) if matriz else 0
-    count = 0
-    
-    for di in [-1, 0, 1]:
-        for dj in [-1, 0, 1]:
-            if di == 0 and dj == 0:
-                continue
-            ni, nj = i + di, j + dj
-            if 0 <= ni < n and 0 <= nj < m and matriz[ni][nj] == FOGO:
-                count += 1
-    return count
-
-def processar_regiao(regiao_data, prob_crescimento=0.01, prob_fogo=0.0001):
-    """Processa uma região da matriz aplicando as regras do Forest Fire."""
-    matriz_expandida = regiao_data['matriz']
+def processar_regiao(regiao_data, prob_crescimento=0.01, prob_fogo=0.0001, semente=None, passo=0, contadores=None):
+    """Processa uma região da matriz aplicando as regras do Forest Fire com o núcleo de
+    src/nucleo.py. Com semente, usa os sorteios das linhas globais da região (execução
+    reproduzível). contadores (src/estatisticas.py) recebe as contagens do passo na região."""
+    matriz_expandida = formatar(regiao_data['matriz'])
     offset_original = regiao_data['offset_original']
     linha_inicio = regiao_data['linha_inicio_original']
     linha_fim = regiao_data['linha_fim_original']
     
     altura_original = linha_fim - linha_inicio
-    m_expandida = len(matriz_expandida[0]) if matriz_expandida else 0
-    matriz_resultado = []
-    
-    for i_local in range(altura_original):
-        linha_resultado = []
-        i_expandida = i_local + offset_original
-        
-        for j in range(m_expandida):
-            cel = matriz_expandida[i_expandida][j]
-            
-            if cel == VAZIO:
-                novo_estado = ARVORE if random.random() < prob_crescimento else VAZIO
-            elif cel == ARVORE:
-                if random.random() < prob_fogo or contar_vizinhos_fogo(matriz_expandida, i_expandida, j) > 0:
-                    novo_estado = FOGO
-                else:
-                    novo_estado = ARVORE
-            elif cel == FOGO:
-                novo_estado = VAZIO
-            else:
-                novo_estado = cel
-                
-            linha_resultado.append(novo_estado)
-        matriz_resultado.append(linha_resultado)
-    
-    return matriz_resultado
+    nova = buffer_como(matriz_expandida)
+    sorteio = None
+    if semente is not None:
+        m_expandida = len(matriz_expandida[0]) if len(matriz_expandida) else 0
+        sorteio = sorteios(semente, passo, linha_inicio, linha_fim, m_expandida)
+    avancar_linhas(matriz_expandida, nova, offset_original, offset_original + altura_original,
+                   prob_crescimento, prob_fogo, sorteio, contadores)
+    return nova[offset_original:offset_original + altura_original]
 
 class ClienteForestFire:
-    def __init__(self, host='localhost', porta=8000):
+    def __init__(self, host='localhost', porta=8000, formatos=FORMATOS, intervalo_batimento=2.0, compacto=False,
+                 memoria_local=True):
         self.host = host
         self.porta = porta
         self.socket = None
         self.conectado = False
+        # Buffer de recepção reaproveitado entre as mensagens (src/quadros.py)
+        self.receptor = Receptor()
+        self.formatos = formatos
+        self.formato = FORMATO_JSON
+        # Modo com estado: faixa residente entre iterações (dois buffers com linhas de borda)
+        self.buffers = None
+        # compacto=True guarda a faixa residente em planos de bits (2 bits por célula)
+        self.compacto = compacto
+        self.prob_crescimento = 0.01
+        self.prob_fogo = 0.0001
+        self.rng = np.random.default_rng()
+        # Semente da execução e linha global do início da faixa residente
+        self.semente = None
+        self.linha_inicio = 0
+        # Linhas de halo de cada lado da faixa residente (passos por sincronização) e
+        # linhas da grade inteira (para saber se a faixa encosta na borda de baixo)
+        self.profundidade = 1
+        self.linhas_grade = 0
+        # Pipeline: interior já calculado (passo, contadores, tempo) à espera dos halos, e
+        # o passo até o qual o interior do passo seguinte é calculado logo após cada resposta
+        self.antecipado = None
+        self.antecipar_ate = 0
+        # Enquanto calcula, o cliente avisa periodicamente que está vivo (batimentos)
+        self.intervalo_batimento = intervalo_batimento
+        self.ocupado = False
+        self.trava_envio = threading.Lock()
+        # Na mesma máquina do servidor, a grade é lida e escrita em memória compartilhada
+        # (src/memoria_local.py), aberta no primeiro comando que a usa
+        self.memoria_local = memoria_local
+        self.grades_locais = None
         
     def conectar(self):
         """Conecta ao servidor."""
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket.connect((self.host, self.porta))
+            self.receptor = Receptor()
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             self.conectado = True
-            print(f"Conectado ao servidor {self.host}:{self.porta}")
+            self.negociar_formato()
+            print(f"Conectado ao servidor {self.host}:{self.porta} (formato {self.formato})")
             return True
         except Exception as e:
             print(f"Erro ao conectar: {e}")
             return False
     
+    def negociar_formato(self):
+        """Oferece ao servidor os formatos suportados e adota o escolhido por ele."""
+        self.enviar_dados({'comando': 'ola', 'formatos': self.formatos, 'memoria': self.memoria_local})
+        resposta = self.receber_dados()
+        if resposta and resposta.get('comando') == 'formato':
+            self.formato = resposta['formato']
+    
     def enviar_dados(self, dados):
-        """Envia dados para o servidor."""
+        """Envia dados para o servidor no formato negociado."""
         try:
-            mensagem = json.dumps(dados).encode('utf-8')
-            tamanho = len(mensagem)
-            self.socket.sendall(tamanho.to_bytes(4, byteorder='big'))
-            self.socket.sendall(mensagem)
+            partes = codificar_partes(dados, self.formato)
+            # A trava impede que um batimento se intercale com outra mensagem
+            with self.trava_envio:
+                enviar_quadro(self.socket, partes)
             return True
         except:
             return False
     
     def receber_dados(self):
-        """Recebe dados do servidor."""
+        """Recebe dados do servidor. Grades binárias são vistas do buffer de recepção,
+        válidas até a próxima mensagem (os comandos as copiam ou usam antes disso)."""
         try:
-            tamanho_bytes = self.socket.recv(4)
-            if len(tamanho_bytes) != 4:
-                return None
-            tamanho = int.from_bytes(tamanho_bytes, byteorder='big')
-            
-            dados_bytes = b''
-            while len(dados_bytes) < tamanho:
-                chunk = self.socket.recv(min(tamanho - len(dados_bytes), 4096))
-                if not chunk:
-                    break
-                dados_bytes += chunk
-                
-            return json.loads(dados_bytes.decode('utf-8'))
+            mensagem = self.receptor.receber(self.socket)
+            return None if mensagem is None else decodificar(mensagem)
         except:
             return None
     
+    def mapear(self, dados):
+        """Buffers da grade em memória compartilhada indicados no comando do servidor."""
+        if self.grades_locais is None or self.grades_locais.nomes != dados['grades']:
+            self.fechar_memoria()
+            self.grades_locais = GradesCompartilhadas(dados['linhas_grade'], dados['grades'])
+        return self.grades_locais.grades
+    
+    def fechar_memoria(self):
+        """Desfaz o mapeamento da memória compartilhada, se houver."""
+        if self.grades_locais is not None:
+            self.grades_locais.fechar()
+            self.grades_locais = None
+    
+    def processar_local(self, dados, contadores=None):
+        """Avança as linhas [linha_inicio, linha_fim) lendo o buffer compartilhado de origem
+        e escrevendo no outro: nenhuma célula passa pelo socket."""
+        grades = self.mapear(dados)
+        origem = dados['origem']
+        inicio, fim = dados['linha_inicio'], dados['linha_fim']
+        sorteio = None
+        if dados.get('semente') is not None:
+            sorteio = sorteios(dados['semente'], dados.get('passo', 0), inicio, fim, dados['linhas_grade'])
+        avancar_linhas(grades[origem], grades[1 - origem], inicio, fim, dados.get('prob_crescimento', 0.01),
+                       dados.get('prob_fogo', 0.0001), sorteio, contadores)
+    
+    def carregar_faixa(self, dados):
+        """Guarda a faixa recebida; as k primeiras e as k últimas linhas dos buffers recebem
+        os halos das faixas vizinhas (k = profundidade, 1 sem bloqueio temporal)."""
+        faixa = np.asarray(dados['faixa'], dtype=np.uint8)
+        altura, m = faixa.shape
+        k = self.profundidade = max(1, dados.get('passos', 1))
+        self.linhas_grade = dados.get('linhas_grade', 0)
+        if self.compacto:
+            self.buffers = [GradeBits(altura + 2 * k, m) for _ in range(2)]
+            self.buffers[0].arvore[k:-k] = empacotar_linhas(faixa == ARVORE)
+            self.buffers[0].fogo[k:-k] = empacotar_linhas(faixa == FOGO)
+        else:
+            self.buffers = [np.zeros((altura + 2 * k, m), dtype=np.uint8) for _ in range(2)]
+            self.buffers[0][k:-k] = faixa
+        self.prob_crescimento = dados.get('prob_crescimento', 0.01)
+        self.prob_fogo = dados.get('prob_fogo', 0.0001)
+        self.semente = dados.get('semente')
+        self.linha_inicio = dados.get('linha_inicio', 0)
+        # Faixa nova: nada antecipado até o servidor pedir o pipeline ('antecipar')
+        self.antecipado = None
+        self.antecipar_ate = 0
+    
+    def altura_faixa(self):
+        """Linhas da faixa residente (sem os halos)."""
+        atual = self.buffers[0]
+        return (atual.n if self.compacto else len(atual)) - 2 * self.profundidade
+    
+    def colocar_halos(self, atual, bordas):
+        """Escreve nas k primeiras e k últimas linhas do buffer os halos recebidos."""
+        k = self.profundidade
+        if self.compacto:
+            atual.arvore[:k] = empacotar_linhas(bordas[:k] == ARVORE)
+            atual.fogo[:k] = empacotar_linhas(bordas[:k] == FOGO)
+            atual.arvore[-k:] = empacotar_linhas(bordas[k:] == ARVORE)
+            atual.fogo[-k:] = empacotar_linhas(bordas[k:] == FOGO)
+        else:
+            atual[:k] = bordas[:k]
+            atual[-k:] = bordas[k:]
+    
+    def bordas_faixa(self, atual):
+        """As k primeiras e as k últimas linhas da faixa (o que as vizinhas precisam)."""
+        k, altura = self.profundidade, self.altura_faixa()
+        if self.compacto:
+            return np.vstack((atual.para_grade(k, 2 * k), atual.para_grade(altura, altura + k)))
+        return np.vstack((atual[k:2 * k], atual[altura:altura + k]))
+    
+    def avancar_faixa_residente(self, dados):
+        """Avança a faixa residente usando os halos recebidos (k linhas de cada vizinha) e
+        devolve as novas bordas (k primeiras e k últimas linhas da faixa), junto com os
+        contadores de cada passo na faixa. Com 'passos' > 1, avança vários passos antes de
+        responder, recalculando as linhas de halo (src/vetorizado.avancar_passos)."""
+        atual, nova = self.buffers
+        k = self.profundidade
+        passo = dados.get('passo', 0)
+        passos = dados.get('passos', 1)
+        altura = self.altura_faixa()
+        # A linha local k é a primeira linha da faixa na grade global
+        deslocamento = self.linha_inicio - k
+        # Na borda da grade o halo é só de células vazias: não é recalculado
+        acima = 0 if self.linha_inicio == 0 else k
+        abaixo = 0 if self.linha_inicio + altura == self.linhas_grade else k
+        serie = []
+        self.colocar_halos(atual, np.asarray(dados['bordas'], dtype=np.uint8))
+        avancar = avancar_faixa_bits if self.compacto else avancar_faixa
+        atual, nova = avancar_passos(atual, nova, k, k + altura, passos, self.prob_crescimento, self.prob_fogo,
+                                     self.rng, self.semente, passo, deslocamento, serie, acima, abaixo, avancar)
+        self.buffers = [atual, nova]
+        resposta = {'comando': 'bordas', 'bordas': self.bordas_faixa(atual), 'estatisticas': serie[-1]}
+        if passos > 1:
+            resposta['serie'] = serie
+        return resposta
+    
+    def antecipar(self, passo):
+        """Pipeline (halos de uma linha): calcula já o interior da faixa no passo `passo`,
+        as linhas que não dependem dos halos, enquanto os halos ainda estão a caminho."""
+        inicio = time.perf_counter()
+        atual, nova = self.buffers
+        altura = self.altura_faixa()
+        contadores = novos_contadores()
+        if altura > 2:
+            avancar = avancar_faixa_bits if self.compacto else avancar_faixa
+            avancar(atual, nova, 2, altura, self.prob_crescimento, self.prob_fogo, self.rng, self.semente, passo,
+                    self.linha_inicio - 1, contadores)
+        self.antecipado = (passo, contadores, time.perf_counter() - inicio)
+    
+    def completar_faixa(self, dados):
+        """Pipeline: com os halos do passo antecipado, calcula só as linhas de borda da faixa
+        e responde como avancar_faixa_residente. O tempo de cálculo inclui o do interior."""
+        passo, contadores, tempo = self.antecipado
+        self.antecipado = None
+        inicio = time.perf_counter()
+        atual, nova = self.buffers
+        altura = self.altura_faixa()
+        self.colocar_halos(atual, np.asarray(dados['bordas'], dtype=np.uint8))
+        avancar = avancar_faixa_bits if self.compacto else avancar_faixa
+        for linha in sorted({1, altura}):
+            avancar(atual, nova, linha, linha + 1, self.prob_crescimento, self.prob_fogo, self.rng, self.semente,
+                    passo, self.linha_inicio - 1, contadores)
+        self.buffers = [nova, atual]
+        return {'comando': 'bordas', 'bordas': self.bordas_faixa(nova), 'estatisticas': contadores,
+                'tempo_calculo': tempo + time.perf_counter() - inicio}
+    
+    def enviar_batimentos(self):
+        """Thread de batimentos: enquanto há cálculo em andamento, envia 'vivo' ao servidor
+        para que ele não confunda uma faixa demorada com um cliente caído."""
+        while self.conectado:
+            time.sleep(self.intervalo_batimento)
+            if self.ocupado:
+                self.enviar_dados({'comando': 'vivo'})
+    
     def executar(self):
         """Loop principal do cliente."""
+        threading.Thread(target=self.enviar_batimentos, daemon=True).start()
         while self.conectado:
             comando_data = self.receber_dados()
             if not comando_data:
                 print("Conexão perdida")
                 break
             
-            comando = comando_data.get('comando')
-            if comando == 'processar':
-                regiao_data = comando_data['regiao']
-                prob_crescimento = comando_data.get('prob_crescimento', 0.01)
-                prob_fogo = comando_data.get('prob_fogo', 0.0001)
-                
-                matriz_processada = processar_regiao(regiao_data, prob_crescimento, prob_fogo)
-                resultado = {'matriz_processada': matriz_processada}
-                
-                if not self.enviar_dados(resultado):
-                    break
-                    
-            elif comando == 'encerrar':
-                print("Encerrando cliente")
+            self.ocupado = True
+            try:
+                continuar = self.atender(comando_data)
+            finally:
+                self.ocupado = False
+            if not continuar:
                 break
     
+    def atender(self, comando_data):
+        """Executa um comando do servidor. Retorna False quando o cliente deve parar."""
+        comando = comando_data.get('comando')
+        if comando == 'processar':
+            regiao_data = comando_data['regiao']
+            prob_crescimento = comando_data.get('prob_crescimento', 0.01)
+            prob_fogo = comando_data.get('prob_fogo', 0.0001)
+            
+            contadores = novos_contadores()
+            inicio = time.perf_counter()
+            matriz_processada = processar_regiao(regiao_data, prob_crescimento, prob_fogo,
+                                                 comando_data.get('semente'), comando_data.get('passo', 0), contadores)
+            # O servidor separa o tempo de cálculo do de comunicação (src/instrumentacao.py)
+            resultado = {'matriz_processada': matriz_processada, 'estatisticas': contadores,
+                         'tempo_calculo': time.perf_counter() - inicio}
+            return self.enviar_dados(resultado)
+        
+        elif comando == 'processar_local':
+            # Cliente na máquina do servidor: as linhas são lidas e escritas na memória compartilhada
+            contadores = novos_contadores()
+            inicio = time.perf_counter()
+            self.processar_local(comando_data, contadores)
+            return self.enviar_dados({'comando': 'pronto', 'estatisticas': contadores,
+                                      'tempo_calculo': time.perf_counter() - inicio})
+        
+        elif comando == 'carregar':
+            self.carregar_faixa(comando_data)
+        
+        elif comando == 'carregar_local':
+            grades = self.mapear(comando_data)
+            faixa = grades[comando_data['origem']][comando_data['linha_inicio']:comando_data['linha_fim']]
+            self.carregar_faixa(dict(comando_data, faixa=faixa))
+        
+        elif comando == 'gerar':
+            # Modo com estado e semente: a faixa da grade inicial é gerada aqui, sem trafegar
+            faixa = gerar_linhas(comando_data['linha_inicio'], comando_data['linha_fim'],
+                                 comando_data['linhas_grade'], comando_data.get('prob_arvore', 0.6),
+                                 comando_data['semente_grade'], comando_data.get('padrao', 'uniforme'))
+            self.carregar_faixa(dict(comando_data, faixa=faixa))
+        
+        elif comando == 'passo':
+            inicio = time.perf_counter()
+            passo = comando_data.get('passo', 0)
+            if self.antecipado is not None and self.antecipado[0] == passo:
+                resposta = self.completar_faixa(comando_data)
+            else:
+                resposta = self.avancar_faixa_residente(comando_data)
+                resposta['tempo_calculo'] = time.perf_counter() - inicio
+            if not self.enviar_dados(resposta):
+                return False
+            # Pipeline: o interior do próximo passo é calculado enquanto as bordas viajam
+            proximo = passo + comando_data.get('passos', 1)
+            if proximo < self.antecipar_ate:
+                self.antecipar(proximo)
+        
+        elif comando == 'antecipar':
+            # Modo pipeline (halos de uma linha): a partir de agora o interior de cada passo
+            # é calculado antes de os halos chegarem
+            self.antecipar_ate = comando_data['ate']
+            if comando_data['passo'] < self.antecipar_ate:
+                self.antecipar(comando_data['passo'])
+        
+        elif comando == 'coletar':
+            atual, k = self.buffers[0], self.profundidade
+            faixa = atual.para_grade(k, atual.n - k) if self.compacto else atual[k:-k]
+            resultado = {'comando': 'resultado', 'matriz_processada': faixa}
+            return self.enviar_dados(resultado)
+        
+        elif comando == 'coletar_local':
+            atual, k = self.buffers[0], self.profundidade
+            altura = (atual.n if self.compacto else len(atual)) - 2 * k
+            destino = self.mapear(dict(comando_data, linhas_grade=self.linhas_grade))[0]
+            destino[self.linha_inicio:self.linha_inicio + altura] = \
+                atual.para_grade(k, k + altura) if self.compacto else atual[k:-k]
+            return self.enviar_dados({'comando': 'coletado'})
+                
+        elif comando == 'lote':
+            # Varredura de parâmetros (src/lote.py): execuções inteiras, não faixas
+            from src.lote import executar_grupo
+            resultados = executar_grupo(comando_data['execucoes'], comando_data.get('motor', 'numpy'))
+            return self.enviar_dados({'comando': 'lote', 'resultados': resultados})
+
+        elif comando == 'encerrar':
+            print("Encerrando cliente")
+            self.fechar_memoria()
+            return False
+        return True
+    
     def desconectar(self):
         """Desconecta do servidor."""
         self.conectado = False
+        self.fechar_memoria()
         if self.socket:
             try:
                 self.socket.close()
@@ -150,10 +383,13 @@ if __name__ == "__main__":
             pass
     if len(sys.argv) > 2:
         host = sys.argv[2]
+    compacto = 'compacto' in sys.argv[3:]
+    # "tcp": não usa memória compartilhada mesmo na máquina do servidor
+    memoria_local = 'tcp' not in sys.argv[3:]
     
     print(f"Cliente Forest Fire conectando em {host}:{porta}")
     
-    cliente = ClienteForestFire(host, porta)
+    cliente = ClienteForestFire(host, porta, compacto=compacto, memoria_local=memoria_local)
     if cliente.conectar():
         try:
             cliente.executar()
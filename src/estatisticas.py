@@ -0,0 +1,45 @@
+import csv
+
+# Contadores de um passo (transição do estado k para o k + 1):
+# vazio, arvore, fogo -> células em cada estado no novo estado
+# ignicoes            -> árvores que pegaram fogo
+# crescimento         -> células vazias que viraram árvore
+# queimadas           -> células em chamas que viraram vazio (área queimada no passo)
+CAMPOS = ('vazio', 'arvore', 'fogo', 'ignicoes', 'crescimento', 'queimadas')
+
+
+def novos_contadores():
+    """Contadores zerados de um passo."""
+    return dict.fromkeys(CAMPOS, 0)
+
+
+def somar_contadores(total, parcial):
+    """Soma em total os contadores de uma faixa (threads, processos ou clientes)."""
+    for campo in CAMPOS:
+        total[campo] += int(parcial[campo])
+    return total
+
+
+def somar_transicoes(contadores, celulas, arvores, vazios, crescimento, ignicoes):
+    """Acumula em contadores um passo de uma faixa com `celulas` células, a partir das
+    contagens do estado antigo (árvores, vazios) e das transições já calculadas na
+    atualização. Todo o resto sai por diferença, sem nova varredura."""
+    arvores_novas = arvores - ignicoes + crescimento
+    contadores['vazio'] += celulas - arvores_novas - ignicoes
+    contadores['arvore'] += arvores_novas
+    contadores['fogo'] += ignicoes
+    contadores['ignicoes'] += ignicoes
+    contadores['crescimento'] += crescimento
+    contadores['queimadas'] += celulas - arvores - vazios
+    return contadores
+
+
+def salvar_serie(arquivo, serie, passo_inicial=0):
+    """Grava a série de contadores em CSV, um passo por linha, com a área queimada acumulada."""
+    with open(arquivo, 'w', newline='') as f:
+        escritor = csv.writer(f)
+        escritor.writerow(('passo',) + CAMPOS + ('area_queimada',))
+        acumulada = 0
+        for k, contadores in enumerate(serie):
+            acumulada += contadores['queimadas']
+            escritor.writerow((passo_inicial + k + 1,) + tuple(contadores[c] for c in CAMPOS) + (acumulada,))
@@ -0,0 +1,134 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.estatisticas import novos_contadores, somar_transicoes
+from src.inicializacao import criar_grade
+
+# Estados possíveis
+VAZIO = 0
+ARVORE = 1
+FOGO = 2
+
+# Deslocamentos da vizinhança de Moore
+DESLOCAMENTOS = [(di, dj) for di in (-1, 0, 1) for dj in (-1, 0, 1) if (di, dj) != (0, 0)]
+
+
+def remover_repetidos(indices):
+    """Ordena os índices e remove repetições (ordenação simples, mais rápida que np.unique aqui)."""
+    indices.sort()
+    if indices.size == 0:
+        return indices
+    manter = np.empty(indices.size, dtype=bool)
+    manter[0] = True
+    np.not_equal(indices[1:], indices[:-1], out=manter[1:])
+    return indices[manter]
+
+
+class SimulacaoFronteira:
+    """Motor orientado a eventos: o custo de cada passo é proporcional à atividade.
+    Mantém o índice (plano) das células em chamas e propaga o fogo só a partir dele.
+    Crescimento e ignição espontânea sorteiam quantas células são atingidas
+    (binomial) e quais são, em vez de um sorteio por célula; como cada célula é
+    escolhida com a mesma probabilidade, a distribuição é a mesma das regras de referência."""
+
+    def __init__(self, grade, prob_crescimento=0.01, prob_fogo=0.0001, rng=None):
+        self.grade = np.ascontiguousarray(grade, dtype=np.uint8)
+        self.plana = self.grade.reshape(-1)
+        self.n, self.m = self.grade.shape
+        self.prob_crescimento = prob_crescimento
+        self.prob_fogo = prob_fogo
+        self.rng = np.random.default_rng() if rng is None else rng
+        # Única varredura completa: montar a fronteira inicial e contar as árvores
+        self.fogo = np.flatnonzero(self.plana == FOGO)
+        self.arvores = int(np.count_nonzero(self.plana == ARVORE))
+        # Contadores do último passo (src/estatisticas.py), mantidos pelas próprias transições
+        self.contadores = None
+
+    def arvores_vizinhas(self, indices):
+        """Retorna os índices planos (ordenados, sem repetição) das árvores vizinhas de indices."""
+        linhas, colunas = np.divmod(indices, self.m)
+        partes = []
+        for di, dj in DESLOCAMENTOS:
+            ni = linhas + di
+            nj = colunas + dj
+            validos = (ni >= 0) & (ni < self.n) & (nj >= 0) & (nj < self.m)
+            vizinhos = ni[validos] * self.m + nj[validos]
+            partes.append(vizinhos[self.plana[vizinhos] == ARVORE])
+        return remover_repetidos(np.concatenate(partes))
+
+    def sortear_celulas(self, prob):
+        """Sorteia as células atingidas por um evento de probabilidade prob.
+        Equivale a um sorteio independente por célula."""
+        total = self.plana.size
+        quantidade = self.rng.binomial(total, prob)
+        return self.rng.choice(total, size=quantidade, replace=False, shuffle=False)
+
+    def passo(self):
+        """Avança uma iteração modificando a grade no lugar."""
+        plana = self.plana
+
+        # Todas as decisões usam o estado antigo, antes de qualquer escrita
+        por_vizinho = self.arvores_vizinhas(self.fogo)
+
+        espontaneas = self.sortear_celulas(self.prob_fogo)
+        espontaneas = espontaneas[plana[espontaneas] == ARVORE]
+
+        crescimento = self.sortear_celulas(self.prob_crescimento)
+        crescimento = crescimento[plana[crescimento] == VAZIO]
+
+        # Os três conjuntos são disjuntos (fogo, vazio e árvores no estado antigo)
+        total = plana.size
+        vazios = total - self.arvores - self.fogo.size
+        plana[self.fogo] = VAZIO
+        plana[crescimento] = ARVORE
+        self.fogo = remover_repetidos(np.concatenate((por_vizinho, espontaneas)))
+        plana[self.fogo] = FOGO
+
+        self.contadores = somar_transicoes(novos_contadores(), total, self.arvores, vazios,
+                                           crescimento.size, self.fogo.size)
+        self.arvores = self.contadores['arvore']
+        return self.grade
+
+    def avancar(self, iteracoes):
+        """Avança várias iterações e retorna a grade."""
+        for _ in range(iteracoes):
+            self.passo()
+        return self.grade
+
+
+def simular_fronteira(n, iteracoes, prob_arvore=0.6, prob_crescimento=0.01, prob_fogo=0.0001, semente=None,
+                      gravador=None, serie=None):
+    """Executa a simulação com o motor de fronteira ativa e retorna o tempo gasto.
+    Com semente, a grade inicial é a dos outros motores e a execução é reproduzível;
+    como o sorteio é por evento, não por célula, só a distribuição coincide com eles."""
+    rng = np.random.default_rng(semente)
+    simulacao = SimulacaoFronteira(criar_grade(n, prob_arvore, semente), prob_crescimento, prob_fogo, rng)
+
+    inicio = time.perf_counter()
+    if gravador is None and serie is None:
+        simulacao.avancar(iteracoes)
+    else:
+        if gravador is not None:
+            gravador.registrar(0, simulacao.grade)
+        for passo in range(iteracoes):
+            simulacao.passo()
+            if gravador is not None:
+                gravador.registrar(passo + 1, simulacao.grade)
+            if serie is not None:
+                serie.append(simulacao.contadores)
+    fim = time.perf_counter()
+
+    return fim - inicio
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    iteracoes = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    tempo = simular_fronteira(n, iteracoes)
+    print(f"Tempo fronteira ativa ({n}x{n}): {tempo:.4f} segundos")
@@ -0,0 +1,215 @@
+import json
+import os
+import queue
+import sys
+import threading
+import zlib
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.protocolo import desempacotar_2bits, empacotar_2bits
+
+# Arquivos de uma gravação (um diretório por execução)
+ARQUIVO_METADADOS = 'metadados.json'
+ARQUIVO_CELULAS = 'celulas.bin'
+ARQUIVO_INDICE = 'indice.bin'
+
+# Tipos de quadro: completo (células com 2 bits, lido direto do mapa de memória)
+# ou delta (XOR com o quadro gravado anterior, comprimido)
+QUADRO_COMPLETO = 0
+QUADRO_DELTA = 1
+
+# Uma entrada de índice por quadro gravado
+INDICE = np.dtype([('passo', '<u8'), ('inicio', '<u8'), ('tamanho', '<u8'), ('tipo', 'u1')])
+
+VERSAO = 1
+
+
+class Gravador:
+    """Grava em disco um de cada `intervalo` estados da simulação, sem parar o cálculo.
+    registrar() só copia a grade e a põe numa fila; empacotar (2 bits por célula),
+    calcular o delta e escrever ficam com uma thread de fundo. A fila é limitada: se o
+    disco não acompanhar, registrar() espera em vez de acumular grades na memória.
+    Com delta=True, só um quadro a cada quadros_chave é completo; os demais guardam o
+    XOR com o anterior, comprimido (poucas células mudam entre passos)."""
+
+    def __init__(self, caminho, n, m=None, intervalo=1, delta=False, quadros_chave=50, fila=8):
+        self.caminho = caminho
+        self.n = n
+        self.m = n if m is None else m
+        self.intervalo = max(1, intervalo)
+        self.delta = delta
+        self.quadros_chave = max(1, quadros_chave)
+        self.ultimo_passo = -1
+        self.erro = None
+
+        os.makedirs(caminho, exist_ok=True)
+        with open(os.path.join(caminho, ARQUIVO_METADADOS), 'w') as f:
+            json.dump({'versao': VERSAO, 'n': self.n, 'm': self.m, 'intervalo': self.intervalo,
+                       'delta': delta, 'quadros_chave': self.quadros_chave}, f)
+        self.celulas = open(os.path.join(caminho, ARQUIVO_CELULAS), 'wb')
+        self.indice = open(os.path.join(caminho, ARQUIVO_INDICE), 'wb')
+        self.tamanho = 0
+        self.gravados = 0
+        self.anterior = None
+
+        self.fila = queue.Queue(maxsize=fila)
+        self.thread = threading.Thread(target=self.escrever, daemon=True)
+        self.thread.start()
+
+    def deve_gravar(self, passo):
+        """Indica se o estado do passo `passo` entra na gravação."""
+        return passo % self.intervalo == 0 and passo > self.ultimo_passo
+
+    def registrar(self, passo, grade):
+        """Entrega o estado após `passo` iterações (grade NumPy, listas ou GradeBits).
+        A grade é copiada na hora: o chamador pode reaproveitar o buffer em seguida.
+        Passos já gravados são ignorados (ex.: iterações refeitas após uma falha)."""
+        if self.erro is not None:
+            raise self.erro
+        if not self.deve_gravar(passo):
+            return False
+        if hasattr(grade, 'para_grade'):
+            # Grade compacta: copia os planos de bits, a expansão fica com a thread de fundo
+            copia = type(grade)(grade.n, grade.m)
+            copia.arvore[...] = grade.arvore
+            copia.fogo[...] = grade.fogo
+        else:
+            copia = np.array(grade, dtype=np.uint8)
+        self.ultimo_passo = passo
+        self.fila.put((passo, copia))
+        return True
+
+    def escrever(self):
+        """Thread de fundo: empacota e escreve os quadros na ordem em que chegam."""
+        while True:
+            item = self.fila.get()
+            if item is None:
+                break
+            passo, grade = item
+            try:
+                if hasattr(grade, 'para_grade'):
+                    grade = grade.para_grade()
+                self.escrever_quadro(passo, empacotar_2bits(grade))
+            except Exception as e:
+                self.erro = e
+
+    def escrever_quadro(self, passo, empacotada):
+        """Acrescenta um quadro ao arquivo de células e a sua entrada ao índice."""
+        if self.delta and self.anterior is not None and self.gravados % self.quadros_chave:
+            corpo = zlib.compress(np.bitwise_xor(empacotada, self.anterior).tobytes(), 1)
+            tipo = QUADRO_DELTA
+        else:
+            corpo = empacotada.tobytes()
+            tipo = QUADRO_COMPLETO
+        self.anterior = empacotada
+
+        self.celulas.write(corpo)
+        self.celulas.flush()
+        entrada = np.array([(passo, self.tamanho, len(corpo), tipo)], dtype=INDICE)
+        # O índice só é escrito depois das células: um leitor nunca vê um quadro incompleto
+        self.indice.write(entrada.tobytes())
+        self.indice.flush()
+        self.tamanho += len(corpo)
+        self.gravados += 1
+
+    def fechar(self):
+        """Espera a fila esvaziar e fecha os arquivos."""
+        if self.thread is not None:
+            self.fila.put(None)
+            self.thread.join()
+            self.thread = None
+            self.celulas.close()
+            self.indice.close()
+        if self.erro is not None:
+            raise self.erro
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+class LeitorGravacao:
+    """Acesso aleatório e preguiçoso a uma gravação: o arquivo de células é mapeado em
+    memória e só os quadros pedidos são lidos. Quadros completos são desempacotados
+    direto do mapa; um quadro delta é reconstruído a partir do quadro completo anterior."""
+
+    def __init__(self, caminho):
+        with open(os.path.join(caminho, ARQUIVO_METADADOS)) as f:
+            self.metadados = json.load(f)
+        self.n = self.metadados['n']
+        self.m = self.metadados['m']
+        self.indice = np.fromfile(os.path.join(caminho, ARQUIVO_INDICE), dtype=INDICE)
+        arquivo = os.path.join(caminho, ARQUIVO_CELULAS)
+        self.dados = np.memmap(arquivo, dtype=np.uint8, mode='r') if os.path.getsize(arquivo) else None
+        # Último quadro reconstruído (posição, células empacotadas): leitura sequencial barata
+        self.cache = (None, None)
+
+    @property
+    def passos(self):
+        """Passos gravados, em ordem."""
+        return self.indice['passo']
+
+    def __len__(self):
+        return len(self.indice)
+
+    def __contains__(self, passo):
+        return self.posicao(passo) is not None
+
+    def posicao(self, passo):
+        """Posição do passo no índice, ou None se ele não foi gravado."""
+        k = int(np.searchsorted(self.indice['passo'], passo))
+        if k < len(self.indice) and self.indice['passo'][k] == passo:
+            return k
+        return None
+
+    def corpo(self, k):
+        entrada = self.indice[k]
+        return self.dados[int(entrada['inicio']):int(entrada['inicio'] + entrada['tamanho'])]
+
+    def empacotada(self, k):
+        """Células empacotadas do quadro k, aplicando os deltas desde o último quadro completo."""
+        if self.indice['tipo'][k] == QUADRO_COMPLETO:
+            atual = self.corpo(k)
+        else:
+            anterior_k, anterior = self.cache
+            if anterior_k != k - 1:
+                anterior = self.empacotada_desde_chave(k - 1)
+            delta = np.frombuffer(zlib.decompress(self.corpo(k)), dtype=np.uint8)
+            atual = np.bitwise_xor(anterior, delta)
+        self.cache = (k, atual)
+        return atual
+
+    def empacotada_desde_chave(self, k):
+        chave = k
+        while self.indice['tipo'][chave] != QUADRO_COMPLETO:
+            chave -= 1
+        self.cache = (None, None)
+        for j in range(chave, k + 1):
+            atual = self.empacotada(j)
+        return atual
+
+    def __getitem__(self, passo):
+        """Grade (uint8) do estado após `passo` iterações."""
+        k = self.posicao(passo)
+        if k is None:
+            raise KeyError(f"Passo {passo} não foi gravado")
+        return desempacotar_2bits(self.empacotada(k), self.n, self.m)
+
+    def __iter__(self):
+        """Percorre (passo, grade) em ordem, lendo cada quadro uma única vez."""
+        for k, passo in enumerate(self.indice['passo']):
+            yield int(passo), desempacotar_2bits(self.empacotada(k), self.n, self.m)
+
+
+if __name__ == "__main__":
+    # Resumo de uma gravação: quantidade de árvores e de fogo em cada passo gravado
+    leitor = LeitorGravacao(sys.argv[1])
+    print(f"Grade {leitor.n}x{leitor.m}, {len(leitor)} passos gravados")
+    for passo, grade in leitor:
+        contagem = np.bincount(grade.reshape(-1), minlength=3)
+        print(f"Passo {passo}: {contagem[1]} árvores, {contagem[2]} em chamas")
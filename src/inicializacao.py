@@ -0,0 +1,158 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.aleatorio import FLUXO_GRADE, FLUXO_PADRAO, semente_aleatoria, sorteios
+from src.vetorizado import CELULAS_POR_BLOCO, sortear_linhas
+
+# Estados possíveis
+VAZIO = 0
+ARVORE = 1
+FOGO = 2
+
+# Padrões de grade inicial, gerados só aqui para todos os motores (mesma semente, mesma
+# grade). 'uniforme' tem uma árvore em cada célula com prob_arvore; 'aglomerada'
+# concentra as árvores em manchas quadradas que cobrem prob_arvore da área; 'aceiros' é
+# a uniforme cortada por faixas vazias (aceiros) a intervalos regulares, nas linhas e
+# nas colunas
+PADROES = ('uniforme', 'aglomerada', 'aceiros')
+
+# Lado das manchas do padrão aglomerado e densidade de árvores dentro e fora delas
+LADO_MANCHA = 32
+DENSIDADE_MANCHA = 0.95
+DENSIDADE_FORA = 0.05
+
+# Distância entre aceiros e largura de cada um (células)
+ESPACO_ACEIROS = 64
+LARGURA_ACEIROS = 2
+
+
+def gerar_linhas(inicio, fim, m, prob_arvore=0.6, semente=None, padrao='uniforme', rng=None):
+    """Linhas [inicio, fim) da grade inicial com m colunas (array uint8).
+    Cada célula depende só da sua posição na grade e da semente: qualquer divisão em
+    faixas, em threads ou em clientes, monta a mesma grade. O padrão aglomerado precisa
+    de semente (a mancha de uma célula não pode depender de quem gerou a linha)."""
+    if padrao not in PADROES:
+        raise ValueError(f"Padrão desconhecido: {padrao} (disponíveis: {', '.join(PADROES)})")
+    if semente is None:
+        if padrao == 'aglomerada':
+            raise ValueError("O padrão aglomerado precisa de semente")
+        rng = np.random.default_rng() if rng is None else rng
+    sorteio = sortear_linhas(inicio, fim, m, rng, semente, fluxo=FLUXO_GRADE)
+
+    if padrao == 'aglomerada':
+        # Um sorteio por mancha decide se ela é floresta; o da célula, se ali há árvore
+        primeira, ultima = inicio // LADO_MANCHA, (fim - 1) // LADO_MANCHA + 1
+        colunas = (m + LADO_MANCHA - 1) // LADO_MANCHA
+        manchas = sorteios(semente, 0, primeira, ultima, colunas, FLUXO_PADRAO) < prob_arvore
+        densidade = np.where(manchas, DENSIDADE_MANCHA, DENSIDADE_FORA)
+        i = np.arange(inicio, fim) // LADO_MANCHA - primeira
+        j = np.arange(m) // LADO_MANCHA
+        return (sorteio < densidade[i[:, None], j]).astype(np.uint8)
+
+    linhas = (sorteio < prob_arvore).astype(np.uint8)
+    if padrao == 'aceiros':
+        linhas[np.arange(inicio, fim) % ESPACO_ACEIROS < LARGURA_ACEIROS] = VAZIO
+        linhas[:, np.arange(m) % ESPACO_ACEIROS < LARGURA_ACEIROS] = VAZIO
+    return linhas
+
+
+def blocos_de_linhas(n, m):
+    """Blocos de linhas com até CELULAS_POR_BLOCO células (limita a memória de cada sorteio)."""
+    linhas_por_bloco = max(1, CELULAS_POR_BLOCO // max(1, m))
+    return [(inicio, min(n, inicio + linhas_por_bloco)) for inicio in range(0, n, linhas_por_bloco)]
+
+
+def preencher(escrever, n, m, prob_arvore, semente, padrao, num_threads):
+    """Gera os blocos de linhas em paralelo e entrega cada um a escrever(inicio, fim, linhas).
+    O NumPy libera o GIL no sorteio e nas comparações. Sem semente, o padrão uniforme usa
+    um gerador independente por bloco; os outros padrões sorteiam uma semente, porque a
+    mancha de uma célula não pode depender de qual bloco a gerou."""
+    blocos = blocos_de_linhas(n, m)
+    if semente is None and padrao != 'uniforme':
+        semente = semente_aleatoria()
+    geradores = [None] * len(blocos) if semente is not None else \
+        [np.random.default_rng(s) for s in np.random.SeedSequence().spawn(len(blocos))]
+
+    def gerar(bloco, rng):
+        inicio, fim = bloco
+        escrever(inicio, fim, gerar_linhas(inicio, fim, m, prob_arvore, semente, padrao, rng))
+
+    if num_threads <= 1 or len(blocos) == 1:
+        for bloco, rng in zip(blocos, geradores):
+            gerar(bloco, rng)
+        return
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        for futuro in [executor.submit(gerar, bloco, rng) for bloco, rng in zip(blocos, geradores)]:
+            futuro.result()
+
+
+def criar_grade(n, prob_arvore=0.6, semente=None, padrao='uniforme', num_threads=1, saida=None):
+    """Grade inicial n x n (uint8), gerada em blocos de linhas por num_threads threads.
+    saida pode ser um buffer já alocado (memória compartilhada, np.memmap): as linhas são
+    escritas direto nele, sem grade intermediária."""
+    grade = np.empty((n, n), dtype=np.uint8) if saida is None else saida
+
+    def escrever(inicio, fim, linhas):
+        grade[inicio:fim] = linhas
+
+    preencher(escrever, n, n, prob_arvore, semente, padrao, num_threads)
+    return grade
+
+
+def criar_grade_bits(n, prob_arvore=0.6, semente=None, padrao='uniforme', num_threads=1):
+    """Grade inicial direto nos planos de bits (src/bitplanos.py): cada bloco de linhas é
+    empacotado assim que gerado, sem a grade de 1 byte por célula."""
+    from src.bitplanos import GradeBits, empacotar_linhas
+    bits = GradeBits(n)
+
+    def escrever(inicio, fim, linhas):
+        bits.arvore[inicio:fim] = empacotar_linhas(linhas == ARVORE)
+
+    preencher(escrever, n, n, prob_arvore, semente, padrao, num_threads)
+    return bits
+
+
+def carregar_grade(arquivo):
+    """Lê uma grade inicial de um arquivo .npy (mapeado em memória: as páginas só são lidas
+    quando usadas) ou de um checkpoint do servidor (.npz com o campo 'matriz')."""
+    if arquivo.endswith('.npz'):
+        with np.load(arquivo) as dados:
+            return dados['matriz'].astype(np.uint8)
+    grade = np.load(arquivo, mmap_mode='r')
+    if grade.ndim != 2 or grade.shape[0] != grade.shape[1]:
+        raise ValueError(f"{arquivo}: esperada uma grade quadrada, encontrado formato {grade.shape}")
+    return grade if grade.dtype == np.uint8 else grade.astype(np.uint8)
+
+
+def grade_inicial(n, prob_arvore=0.6, semente=None, inicial='uniforme', num_threads=1):
+    """Grade inicial a partir de um padrão (PADROES) ou do caminho de um arquivo
+    (carregar_grade; nesse caso o tamanho vem do arquivo)."""
+    if inicial in PADROES:
+        return criar_grade(n, prob_arvore, semente, inicial, num_threads)
+    return carregar_grade(inicial)
+
+
+if __name__ == "__main__":
+    # Gera uma grade inicial direto num arquivo .npy mapeado em memória, por exemplo:
+    # python src/inicializacao.py floresta.npy 20000 padrao=aglomerada semente=1 threads=4
+    if len(sys.argv) < 3:
+        print(f"Uso: python inicializacao.py <saida.npy> <n> [prob_arvore=0.6] [semente=N] "
+              f"[padrao={'|'.join(PADROES)}] [threads=N]")
+        sys.exit(1)
+
+    opcoes = dict(o.split('=', 1) for o in sys.argv[3:] if '=' in o)
+    n = int(sys.argv[2])
+    saida = np.lib.format.open_memmap(sys.argv[1], mode='w+', dtype=np.uint8, shape=(n, n))
+    inicio = time.perf_counter()
+    criar_grade(n, float(opcoes.get('prob_arvore', 0.6)),
+                int(opcoes['semente']) if 'semente' in opcoes else None, opcoes.get('padrao', 'uniforme'),
+                int(opcoes.get('threads', os.cpu_count() or 1)), saida)
+    saida.flush()
+    print(f"Grade {n}x{n} ({opcoes.get('padrao', 'uniforme')}) em {sys.argv[1]}: "
+          f"{time.perf_counter() - inicio:.2f}s, {np.count_nonzero(saida == ARVORE) / saida.size:.1%} de árvores")
@@ -0,0 +1,111 @@
+import json
+import time
+from contextlib import contextmanager, nullcontext
+
+# Fases registradas pelos motores paralelos e pelo servidor distribuído
+FASES = ('particionamento', 'sorteio', 'calculo', 'serializacao', 'envio', 'recepcao', 'decodificacao',
+         'montagem', 'espera')
+
+# Fases que contam como comunicação no resumo do distribuído
+COMUNICACAO = ('serializacao', 'envio', 'recepcao', 'decodificacao')
+
+
+class Instrumentacao:
+    """Registra a duração de cada fase de cada iteração, por trabalhador (thread, faixa ou
+    cliente). Cada registro é um intervalo (fase, início, duração, passo, trabalhador, cpu),
+    com o tempo de CPU da thread quando medido aqui: parede bem maior que CPU indica espera
+    (GIL, E/S). O resultado sai como relatório (dicionário) ou como trace no formato do
+    Chrome (chrome://tracing, ui.perfetto.dev)."""
+
+    ativa = True
+
+    def __init__(self):
+        self.origem = time.perf_counter()
+        self.eventos = []
+        # Passo em andamento, usado quando o registro não informa o seu
+        self.passo = None
+
+    def registrar(self, fase, inicio, fim, passo=None, trabalhador=None, cpu=None):
+        """Registra um intervalo medido por fora (ex.: tempo de cálculo informado pelo cliente)."""
+        # list.append é atômico: threads podem registrar sem trava
+        self.eventos.append((fase, inicio, fim - inicio, self.passo if passo is None else passo,
+                             'principal' if trabalhador is None else trabalhador, cpu))
+
+    @contextmanager
+    def medir(self, fase, passo=None, trabalhador=None):
+        """Mede o bloco `with` como um intervalo da fase."""
+        cpu = time.thread_time()
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(fase, inicio, time.perf_counter(), passo, trabalhador, time.thread_time() - cpu)
+
+    def relatorio(self):
+        """Totais por fase, por trabalhador e por passo (segundos)."""
+        fases = {}
+        trabalhadores = {}
+        passos = {}
+        for fase, _, duracao, passo, trabalhador, cpu in self.eventos:
+            total = fases.setdefault(fase, {'total': 0.0, 'chamadas': 0, 'maximo': 0.0, 'cpu': 0.0})
+            total['total'] += duracao
+            total['chamadas'] += 1
+            total['maximo'] = max(total['maximo'], duracao)
+            total['cpu'] += cpu or 0.0
+            por_trabalhador = trabalhadores.setdefault(trabalhador, {})
+            por_trabalhador[fase] = por_trabalhador.get(fase, 0.0) + duracao
+            if passo is not None:
+                por_passo = passos.setdefault(passo, {})
+                por_passo[fase] = por_passo.get(fase, 0.0) + duracao
+        for total in fases.values():
+            total['media'] = total['total'] / total['chamadas']
+        return {'fases': fases, 'trabalhadores': trabalhadores, 'passos': passos}
+
+    def imprimir(self):
+        """Tabela com o tempo de cada fase por trabalhador e a parcela de comunicação."""
+        relatorio = self.relatorio()
+        fases = [f for f in FASES if f in relatorio['fases']] + \
+                sorted(f for f in relatorio['fases'] if f not in FASES)
+        print(f"{'Trabalhador':<14}" + ''.join(f"{f:>16}" for f in fases) + f"{'comunicação':>13}")
+        for trabalhador, tempos in relatorio['trabalhadores'].items():
+            comunicacao = sum(tempos.get(f, 0.0) for f in COMUNICACAO)
+            ocupado = comunicacao + tempos.get('calculo', 0.0)
+            parcela = f"{100 * comunicacao / ocupado:.0f}%" if ocupado and comunicacao else '-'
+            print(f"{str(trabalhador):<14}" + ''.join(f"{1000 * tempos.get(f, 0.0):>14.1f}ms" for f in fases)
+                  + f"{parcela:>13}")
+
+    def salvar_trace(self, arquivo):
+        """Grava os intervalos no formato de eventos do Chrome: um trilho por trabalhador."""
+        trilhos = {}
+        eventos = []
+        for fase, inicio, duracao, passo, trabalhador, cpu in self.eventos:
+            tid = trilhos.setdefault(trabalhador, len(trilhos) + 1)
+            argumentos = {'passo': passo}
+            if cpu is not None:
+                argumentos['cpu_ms'] = round(1000 * cpu, 3)
+            eventos.append({'name': fase, 'cat': fase, 'ph': 'X', 'pid': 1, 'tid': tid,
+                            'ts': (inicio - self.origem) * 1e6, 'dur': duracao * 1e6, 'args': argumentos})
+        for trabalhador, tid in trilhos.items():
+            eventos.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid,
+                            'args': {'name': str(trabalhador)}})
+        with open(arquivo, 'w') as f:
+            json.dump({'traceEvents': eventos, 'displayTimeUnit': 'ms'}, f)
+
+
+class InstrumentacaoDesligada:
+    """Padrão dos motores: mesma interface, sem medir nada (custo de uma chamada vazia).
+    DESLIGADA é compartilhada pelos motores que não guardam estado nela; quem atribui
+    `passo` (o servidor) cria a sua."""
+
+    ativa = False
+    passo = None
+
+    def registrar(self, *args, **kwargs):
+        pass
+
+    def medir(self, *args, **kwargs):
+        return NADA
+
+
+NADA = nullcontext()
+DESLIGADA = InstrumentacaoDesligada()
@@ -0,0 +1,269 @@
+import csv
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.estatisticas import CAMPOS, novos_contadores, somar_contadores, somar_transicoes
+from src.inicializacao import criar_grade
+from src.vetorizado import sortear_linhas, vizinhos_em_fogo
+
+# Estados possíveis
+VAZIO = 0
+ARVORE = 1
+FOGO = 2
+
+# Colunas do arquivo de resultados: parâmetros da execução (a chave para retomar uma
+# varredura) seguidos do resumo dela
+PARAMETROS = ('n', 'iteracoes', 'prob_arvore', 'prob_crescimento', 'prob_fogo', 'semente')
+RESULTADOS = ('arvores', 'fogo', 'densidade_media', 'area_queimada', 'ignicoes', 'tempo')
+
+# Grades menores que isto são empilhadas num mesmo passo vetorizado; o lote inteiro
+# fica abaixo deste número de células (limita a memória dos sorteios)
+CELULAS_POR_LOTE = 1 << 22
+
+
+def combinacoes(n, iteracoes, prob_arvore=(0.6,), prob_crescimento=(0.01,), prob_fogo=(0.0001,), sementes=(None,)):
+    """Produto cartesiano dos valores de cada parâmetro: uma execução (dict) por combinação.
+    Cada execução precisa de ao menos uma iteração: o resultado vem dos contadores dos passos."""
+    if int(iteracoes) < 1:
+        raise ValueError(f"iteracoes deve ser pelo menos 1 (recebido {iteracoes})")
+    return [
+        {'n': int(n), 'iteracoes': int(iteracoes), 'prob_arvore': float(a), 'prob_crescimento': float(p),
+         'prob_fogo': float(f), 'semente': None if s is None else int(s)}
+        for a, p, f, s in itertools.product(prob_arvore, prob_crescimento, prob_fogo, sementes)
+    ]
+
+
+def chave(execucao):
+    """Identifica a execução pelos parâmetros, como aparecem no arquivo de resultados."""
+    return tuple('' if execucao[campo] is None else str(execucao[campo]) for campo in PARAMETROS)
+
+
+def concluidas(arquivo):
+    """Chaves das execuções já gravadas no arquivo de resultados."""
+    if not os.path.exists(arquivo):
+        return set()
+    with open(arquivo, newline='') as f:
+        return {chave(linha) for linha in csv.DictReader(f) if linha.get('tempo')}
+
+
+def abrir_resultados(arquivo):
+    """Abre o arquivo de resultados para acrescentar linhas. Uma linha incompleta no fim
+    (execução interrompida durante a escrita) é descartada; o cabeçalho só vai num arquivo novo."""
+    novo = not os.path.exists(arquivo) or os.path.getsize(arquivo) == 0
+    if not novo:
+        with open(arquivo, 'rb+') as f:
+            conteudo = f.read()
+            if not conteudo.endswith(b'\n'):
+                f.truncate(conteudo.rfind(b'\n') + 1)
+    f = open(arquivo, 'a', newline='')
+    escritor = csv.DictWriter(f, PARAMETROS + RESULTADOS)
+    if novo:
+        escritor.writeheader()
+    return f, escritor
+
+
+def resumir(execucao, totais, final, tempo):
+    """Linha de resultado de uma execução a partir dos contadores somados em todos os passos
+    (totais) e dos contadores do último passo (final)."""
+    celulas = execucao['n'] * execucao['n'] * execucao['iteracoes']
+    return dict(execucao, arvores=int(final['arvore']), fogo=int(final['fogo']),
+                densidade_media=float(totais['arvore']) / celulas, area_queimada=int(totais['queimadas']),
+                ignicoes=int(totais['ignicoes']), tempo=tempo)
+
+
+def avancar_lote(atual, nova, prob_crescimento, prob_fogo, sorteio, contadores=None):
+    """Um passo de k grades independentes empilhadas em atual (k, n, m), com as mesmas
+    regras de vetorizado.avancar_faixa. prob_crescimento e prob_fogo têm uma entrada por
+    grade; contadores recebe, em cada campo, um array com a contagem de cada grade."""
+    k, n, m = atual.shape
+    p = np.asarray(prob_crescimento).reshape(k, 1, 1)
+    f = np.asarray(prob_fogo).reshape(k, 1, 1)
+    queimando = vizinhos_em_fogo(atual)
+    arvore = atual == ARVORE
+    vazio = atual == VAZIO
+    crescimento = vazio & (sorteio < p)
+    ignicoes = arvore & ((sorteio < f) | queimando)
+    nova[...] = arvore | crescimento
+    nova[ignicoes] = FOGO
+    if contadores is not None:
+        eixos = (1, 2)
+        somar_transicoes(contadores, n * m, np.count_nonzero(arvore, axis=eixos), np.count_nonzero(vazio, axis=eixos),
+                         np.count_nonzero(crescimento, axis=eixos), np.count_nonzero(ignicoes, axis=eixos))
+    return nova
+
+
+def simular_empilhadas(execucoes):
+    """Executa juntas execuções com a mesma grade e o mesmo número de iterações, num passo
+    vetorizado por iteração para todas. Com semente, cada grade sorteia no seu próprio fluxo
+    e termina igual à de simular(..., motor="numpy", semente=...)."""
+    inicio = time.perf_counter()
+    n = execucoes[0]['n']
+    iteracoes = execucoes[0]['iteracoes']
+    rng = np.random.default_rng()
+    atual = np.stack([criar_grade(n, e['prob_arvore'], e['semente']) for e in execucoes])
+    nova = np.empty_like(atual)
+    sorteio = np.empty(atual.shape)
+    p = [e['prob_crescimento'] for e in execucoes]
+    f = [e['prob_fogo'] for e in execucoes]
+
+    com_semente = [k for k, e in enumerate(execucoes) if e['semente'] is not None]
+
+    totais = novos_contadores()
+    final = novos_contadores()
+    for passo in range(iteracoes):
+        if len(com_semente) < len(execucoes):
+            rng.random(out=sorteio)
+        for k in com_semente:
+            sorteio[k] = sortear_linhas(0, n, n, semente=execucoes[k]['semente'], passo=passo)
+        final = novos_contadores()
+        avancar_lote(atual, nova, p, f, sorteio, final)
+        for campo in CAMPOS:
+            totais[campo] = totais[campo] + final[campo]
+        atual, nova = nova, atual
+
+    # O tempo do lote é dividido entre as execuções
+    tempo = (time.perf_counter() - inicio) / len(execucoes)
+    return [
+        resumir(execucao, {c: totais[c][k] for c in CAMPOS}, {c: final[c][k] for c in CAMPOS}, tempo)
+        for k, execucao in enumerate(execucoes)
+    ]
+
+
+def executar_grupo(execucoes, motor="numpy"):
+    """Executa um grupo montado por agrupar(): grades pequenas empilhadas, ou uma única
+    execução grande com o motor escolhido. Retorna uma linha de resultado por execução."""
+    if execucoes[0]['n'] ** 2 < CELULAS_POR_LOTE:
+        return simular_empilhadas(execucoes)
+
+    from src.sequencial import simular
+    resultados = []
+    for execucao in execucoes:
+        serie = []
+        tempo = simular(execucao['n'], execucao['iteracoes'], execucao['prob_arvore'], execucao['prob_crescimento'],
+                        execucao['prob_fogo'], motor=motor, semente=execucao['semente'], serie=serie)
+        totais = novos_contadores()
+        for contadores in serie:
+            somar_contadores(totais, contadores)
+        resultados.append(resumir(execucao, totais, serie[-1], tempo))
+    return resultados
+
+
+def agrupar(execucoes, trabalhadores=1):
+    """Junta as execuções de mesma grade e mesmo número de iterações em grupos de até
+    CELULAS_POR_LOTE células, sem deixar trabalhadores ociosos quando há poucas execuções."""
+    por_forma = {}
+    for execucao in execucoes:
+        por_forma.setdefault((execucao['n'], execucao['iteracoes']), []).append(execucao)
+
+    grupos = []
+    for (n, _), mesmas in por_forma.items():
+        por_grupo = max(1, min(CELULAS_POR_LOTE // max(1, n * n), -(-len(mesmas) // trabalhadores)))
+        grupos += [mesmas[k:k + por_grupo] for k in range(0, len(mesmas), por_grupo)]
+    return grupos
+
+
+def executar_em_clientes(grupos, num_clientes, porta=8000, motor="numpy", ao_terminar=None):
+    """Distribui os grupos entre clientes conectados (src/cliente.py), um grupo por cliente
+    a cada rodada. Grupos de clientes que falham voltam para a fila; sem clientes, o
+    restante é executado aqui mesmo."""
+    from src.servidor import ServidorForestFire
+
+    servidor = ServidorForestFire(porta)
+    if not servidor.iniciar_servidor():
+        raise RuntimeError(f"Não foi possível abrir a porta {porta}")
+    try:
+        servidor.aceitar_clientes(num_clientes)
+        fila = list(grupos)
+        while fila:
+            ativos = servidor.clientes_ativos()
+            if not ativos:
+                for grupo in fila:
+                    ao_terminar(executar_grupo(grupo, motor))
+                return
+            envios = {}
+            for cliente_id in ativos[:len(fila)]:
+                envios[cliente_id] = {'comando': 'lote', 'execucoes': fila.pop(0), 'motor': motor}
+            for cliente_id, resposta in servidor.trocar_concorrente(envios).items():
+                if resposta is None:
+                    fila.append(envios[cliente_id]['execucoes'])
+                else:
+                    ao_terminar(resposta['resultados'])
+        for cliente_id in servidor.clientes_ativos():
+            servidor.enviar_dados(cliente_id, {'comando': 'encerrar'})
+    finally:
+        servidor.fechar()
+
+
+def executar_varredura(execucoes, arquivo, processos=None, motor="numpy", clientes=0, porta=8000):
+    """Executa as execuções ainda ausentes do arquivo de resultados (CSV) e acrescenta uma
+    linha por execução assim que o seu grupo termina; uma varredura interrompida continua
+    de onde parou. Os grupos rodam num pool de `processos` processos (padrão: um por
+    núcleo) ou, com clientes > 0, nos clientes conectados à `porta`. Retorna quantas
+    execuções foram feitas."""
+    feitas = concluidas(arquivo)
+    pendentes = [e for e in execucoes if chave(e) not in feitas]
+    if not pendentes:
+        return 0
+
+    processos = processos or os.cpu_count() or 1
+    f, escritor = abrir_resultados(arquivo)
+
+    def gravar(resultados):
+        escritor.writerows(resultados)
+        f.flush()
+
+    try:
+        if clientes:
+            executar_em_clientes(agrupar(pendentes, clientes), clientes, porta, motor, gravar)
+        elif processos == 1:
+            for grupo in agrupar(pendentes):
+                gravar(executar_grupo(grupo, motor))
+        else:
+            with ProcessPoolExecutor(max_workers=processos) as pool:
+                tarefas = [pool.submit(executar_grupo, grupo, motor) for grupo in agrupar(pendentes, processos)]
+                for tarefa in as_completed(tarefas):
+                    gravar(tarefa.result())
+    finally:
+        f.close()
+    return len(pendentes)
+
+
+def valores(texto, tipo=float):
+    """Lista de valores de uma opção: "0.5,0.6" ou, para inteiros, um intervalo "1-10"."""
+    if tipo is int and '-' in texto:
+        primeiro, ultimo = texto.split('-')
+        return list(range(int(primeiro), int(ultimo) + 1))
+    return [tipo(v) for v in texto.split(',')]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python lote.py <resultados.csv> [n=200] [iteracoes=500] [prob_arvore=0.5,0.6] "
+              "[prob_crescimento=0.01] [prob_fogo=0.0001,0.001] [sementes=1-10] [processos=N] "
+              "[motor=numpy] [clientes=N] [porta=8000]")
+        sys.exit(1)
+
+    opcoes = dict(o.split('=', 1) for o in sys.argv[2:] if '=' in o)
+    try:
+        execucoes = combinacoes(
+            int(opcoes.get('n', 200)), int(opcoes.get('iteracoes', 500)),
+            valores(opcoes.get('prob_arvore', '0.6')), valores(opcoes.get('prob_crescimento', '0.01')),
+            valores(opcoes.get('prob_fogo', '0.0001')),
+            valores(opcoes['sementes'], int) if 'sementes' in opcoes else [None],
+        )
+    except ValueError as erro:
+        print(erro)
+        sys.exit(1)
+    inicio = time.perf_counter()
+    feitas = executar_varredura(execucoes, sys.argv[1], int(opcoes.get('processos', 0)) or None,
+                                opcoes.get('motor', 'numpy'), int(opcoes.get('clientes', 0)),
+                                int(opcoes.get('porta', 8000)))
+    print(f"{feitas} execuções em {time.perf_counter() - inicio:.2f}s "
+          f"({len(execucoes) - feitas} já estavam em {sys.argv[1]})")
@@ -0,0 +1,70 @@
+import ipaddress
+import os
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def endereco_local(endereco):
+    """True quando o endereço (host, porta) do outro lado do socket é desta máquina."""
+    try:
+        return ipaddress.ip_address(endereco[0].split('%')[0]).is_loopback
+    except (ValueError, IndexError, TypeError, AttributeError):
+        return False
+
+
+# Segmentos criados por este processo (servidor e clientes podem ser threads do mesmo processo)
+CRIADOS = set()
+
+
+def anexar(nome):
+    """Abre um segmento criado por outro processo (que não é pai deste). O rastreador de
+    recursos do multiprocessing apagaria o segmento quando este processo terminasse:
+    quem apaga é quem criou."""
+    try:
+        return shared_memory.SharedMemory(name=nome, track=False)
+    except TypeError:
+        # Python < 3.13: sem o parâmetro track
+        segmento = shared_memory.SharedMemory(name=nome)
+        if nome not in CRIADOS:
+            resource_tracker.unregister(segmento._name, 'shared_memory')
+        return segmento
+
+
+class GradesCompartilhadas:
+    """Os dois buffers (estado atual e próximo) de uma grade n x n em memória compartilhada.
+    O servidor cria os segmentos; os clientes da mesma máquina os abrem pelos nomes e leem
+    e escrevem as linhas direto neles, sem que as células passem pelo socket."""
+
+    def __init__(self, n, nomes=None):
+        self.n = n
+        self.criador = nomes is None
+        if self.criador:
+            self.segmentos = [shared_memory.SharedMemory(create=True, size=max(1, n * n)) for _ in range(2)]
+        else:
+            self.segmentos = [anexar(nome) for nome in nomes]
+        self.nomes = [s.name for s in self.segmentos]
+        if self.criador:
+            CRIADOS.update(self.nomes)
+        self.grades = [np.ndarray((n, n), dtype=np.uint8, buffer=s.buf) for s in self.segmentos]
+
+    def indice(self, matriz):
+        """0 ou 1 se matriz é um dos buffers, senão None."""
+        return next((k for k, grade in enumerate(self.grades) if matriz is grade), None)
+
+    def fechar(self):
+        """Desfaz o mapeamento; o criador também apaga os segmentos."""
+        self.grades = []
+        for s in self.segmentos:
+            try:
+                s.close()
+            except BufferError:
+                # Ainda há vistas em uso (ex.: saída por exceção): o mapeamento vai com elas
+                pass
+            if self.criador:
+                s.unlink()
+                CRIADOS.discard(s.name)
+        self.segmentos = []
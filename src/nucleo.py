@@ -0,0 +1,167 @@
+import os
+import random
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.estatisticas import somar_transicoes
+from src.vetorizado import aplicar_regras
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Estados possíveis
+VAZIO = 0
+ARVORE = 1
+FOGO = 2
+
+# Ordem de preferência: a primeira implementação disponível vira o núcleo padrão
+ORDEM = ('numba', 'numpy', 'python')
+
+
+def avancar_python(atual, nova, inicio, fim, prob_crescimento=0.01, prob_fogo=0.0001, sorteio=None,
+                   contadores=None):
+    """Implementação de referência, célula a célula. Aceita listas de listas ou arrays.
+    Sem sorteios, usa random.random nas células vazias e nas árvores."""
+    n, m = len(atual), len(atual[0]) if len(atual) else 0
+    if isinstance(sorteio, np.ndarray):
+        sorteio = sorteio.tolist()
+    sortear = random.random
+    arvores = vazios = crescimento = ignicoes = 0
+
+    for i in range(inicio, fim):
+        linha = atual[i]
+        saida = nova[i]
+        vizinhas = atual[max(0, i - 1):min(n, i + 2)]
+        numeros = None if sorteio is None else sorteio[i - inicio]
+        for j in range(m):
+            cel = linha[j]
+
+            # Se está vazio → pode nascer árvore
+            if cel == VAZIO:
+                vazios += 1
+                u = sortear() if numeros is None else numeros[j]
+                if u < prob_crescimento:
+                    saida[j] = ARVORE
+                    crescimento += 1
+                else:
+                    saida[j] = VAZIO
+
+            # Se é árvore → pega fogo espontaneamente ou por um vizinho em chamas
+            elif cel == ARVORE:
+                arvores += 1
+                u = sortear() if numeros is None else numeros[j]
+                if u < prob_fogo or any(FOGO in v[max(0, j - 1):j + 2] for v in vizinhas):
+                    saida[j] = FOGO
+                    ignicoes += 1
+                else:
+                    saida[j] = ARVORE
+
+            # Se está pegando fogo → vira vazio
+            else:
+                saida[j] = VAZIO
+
+    if contadores is not None:
+        somar_transicoes(contadores, (fim - inicio) * m, arvores, vazios, crescimento, ignicoes)
+
+
+def avancar_numpy(atual, nova, inicio, fim, prob_crescimento=0.01, prob_fogo=0.0001, sorteio=None,
+                  contadores=None):
+    """Estêncil vetorizado (vetorizado.aplicar_regras). Sem sorteios, usa um gerador novo."""
+    if sorteio is None:
+        sorteio = np.random.default_rng().random((fim - inicio, atual.shape[1]))
+    aplicar_regras(atual, nova, inicio, fim, prob_crescimento, prob_fogo, sorteio, contadores)
+
+
+IMPLEMENTACOES = {'python': avancar_python, 'numpy': avancar_numpy}
+
+if numba is not None:
+    @numba.njit(cache=True, nogil=True)
+    def _regras_numba(atual, nova, inicio, fim, prob_crescimento, prob_fogo, sorteio):
+        """Laço compilado; sem o GIL, as threads de uma sessão rodam de fato em paralelo."""
+        n, m = atual.shape
+        arvores = vazios = crescimento = ignicoes = 0
+        for i in range(inicio, fim):
+            for j in range(m):
+                cel = atual[i, j]
+                if cel == VAZIO:
+                    vazios += 1
+                    if sorteio[i - inicio, j] < prob_crescimento:
+                        nova[i, j] = ARVORE
+                        crescimento += 1
+                    else:
+                        nova[i, j] = VAZIO
+                elif cel == ARVORE:
+                    arvores += 1
+                    queima = sorteio[i - inicio, j] < prob_fogo
+                    x = max(0, i - 1)
+                    while not queima and x < min(n, i + 2):
+                        for y in range(max(0, j - 1), min(m, j + 2)):
+                            if atual[x, y] == FOGO:
+                                queima = True
+                        x += 1
+                    if queima:
+                        nova[i, j] = FOGO
+                        ignicoes += 1
+                    else:
+                        nova[i, j] = ARVORE
+                else:
+                    nova[i, j] = VAZIO
+        return arvores, vazios, crescimento, ignicoes
+
+    def avancar_numba(atual, nova, inicio, fim, prob_crescimento=0.01, prob_fogo=0.0001, sorteio=None,
+                      contadores=None):
+        """Laço célula a célula compilado pelo numba (opcional). Sem sorteios, usa um gerador novo."""
+        if sorteio is None:
+            sorteio = np.random.default_rng().random((fim - inicio, atual.shape[1]))
+        arvores, vazios, crescimento, ignicoes = _regras_numba(atual, nova, inicio, fim, prob_crescimento,
+                                                               prob_fogo, sorteio)
+        if contadores is not None:
+            somar_transicoes(contadores, (fim - inicio) * atual.shape[1], arvores, vazios, crescimento, ignicoes)
+
+    IMPLEMENTACOES['numba'] = avancar_numba
+
+
+def escolher(nome=None):
+    """Nome da implementação a usar: a pedida, ou a primeira disponível de ORDEM."""
+    if nome:
+        if nome not in IMPLEMENTACOES:
+            raise ValueError(f"Núcleo indisponível: {nome} (disponíveis: {', '.join(IMPLEMENTACOES)})")
+        return nome
+    return next(nome for nome in ORDEM if nome in IMPLEMENTACOES)
+
+
+# Núcleo escolhido na importação; FOREST_FIRE_NUCLEO força uma implementação
+NUCLEO = escolher(os.environ.get('FOREST_FIRE_NUCLEO'))
+avancar_linhas = IMPLEMENTACOES[NUCLEO]
+
+
+def formatar(matriz, nucleo=None):
+    """A matriz no formato do núcleo: array uint8, ou a própria matriz no núcleo Python."""
+    if (nucleo or NUCLEO) == 'python':
+        return matriz
+    return np.asarray(matriz, dtype=np.uint8)
+
+
+def buffer_como(atual):
+    """Buffer de saída vazio no mesmo formato (e forma) de atual."""
+    if isinstance(atual, np.ndarray):
+        return np.zeros_like(atual)
+    return [[VAZIO] * len(linha) for linha in atual]
+
+
+def como(original, resultado):
+    """resultado no formato de original: lista de listas quando original é uma lista."""
+    if isinstance(resultado, np.ndarray) and not isinstance(original, np.ndarray):
+        return resultado.tolist()
+    return resultado
+
+
+if __name__ == "__main__":
+    # Núcleo padrão e implementações disponíveis; a conformidade com a referência fica em
+    # tests/test_nucleo.py (python -m pytest tests)
+    print(f"Núcleo padrão: {NUCLEO} (disponíveis: {', '.join(IMPLEMENTACOES)})")
@@ -1,194 +1,217 @@
-import random
+import os
+import sys
 import time
 import threading
 from concurrent.futures import ThreadPoolExecutor
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.estatisticas import novos_contadores, somar_contadores
+from src.instrumentacao import DESLIGADA
+from src.nucleo import NUCLEO, avancar_linhas, buffer_como, como, formatar
+
 # Estados possíveis
 VAZIO = 0
 ARVORE = 1
 FOGO = 2
 
 
-def criar_matriz(n, prob_arvore=0.6):
-    """Cria uma matriz nxn com árvores distribuídas aleatoriamente."""
-    return [
-        [ARVORE if random.random() < prob_arvore else VAZIO for _ in range(n)]
-        for _ in range(n)
-    ]
-
-
-def contar_vizinhos_fogo(matriz, i, j):
-    """Conta vizinhos em chamas de forma otimizada."""
-    n = len(matriz)
-    count = 0
-    
-    # Verifica apenas vizinhos válidos
-    for di in [-1, 0, 1]:
-        for dj in [-1, 0, 1]:
-            if di == 0 and dj == 0:
-                continue
-            ni, nj = i + di, j + dj
-            if 0 <= ni < n and 0 <= nj < n and matriz[ni][nj] == FOGO:
-                count += 1
-    
-    return count
+def criar_matriz(n, prob_arvore=0.6, semente=None):
+    """Cria uma matriz nxn com árvores distribuídas aleatoriamente, no formato do núcleo.
+    Os sorteios são feitos em bloco pelo NumPy (src/inicializacao.py), não célula a célula."""
+    from src.inicializacao import criar_grade
+    grade = criar_grade(n, prob_arvore, semente)
+    return grade.tolist() if NUCLEO == 'python' else grade
 
 
 def processar_chunk_otimizado(args):
-    """Processa um chunk de células de forma otimizada."""
-    matriz, coordenadas, prob_crescimento, prob_fogo = args
-    resultados = {}
-    
-    for i, j in coordenadas:
-        cel = matriz[i][j]
-        
-        if cel == VAZIO:
-            novo_estado = ARVORE if random.random() < prob_crescimento else VAZIO
-        elif cel == ARVORE:
-            if random.random() < prob_fogo or contar_vizinhos_fogo(matriz, i, j) > 0:
-                novo_estado = FOGO
-            else:
-                novo_estado = ARVORE
-        else:  # FOGO
-            novo_estado = VAZIO
-        
-        resultados[(i, j)] = novo_estado
-    
-    return resultados
+    """Processa as linhas [inicio, fim) escrevendo direto no buffer de saída.
+    O chunk é só um intervalo de linhas: não há lista de coordenadas nem dicionário de resultados.
+    Um sétimo elemento opcional traz os sorteios das linhas (um número por célula).
+    O passo é feito pelo núcleo de src/nucleo.py; com numba ou NumPy o cálculo libera o GIL.
+    Retorna os contadores do passo na faixa (src/estatisticas.py), somados pela sessão."""
+    atual, nova, inicio, fim, prob_crescimento, prob_fogo = args[:6]
+    sorteio = args[6] if len(args) > 6 else None
+    contadores = novos_contadores()
+    avancar_linhas(atual, nova, inicio, fim, prob_crescimento, prob_fogo, sorteio, contadores)
+    return contadores
+
+
+def dividir_linhas(n, partes):
+    """Divide as n linhas em faixas horizontais contíguas (inicio, fim), uma por parte
+    (threads, processos ou clientes). Nunca há mais faixas do que linhas: partes é
+    limitado a n, e a última faixa fica com o resto da divisão."""
+    partes = max(1, min(partes, n))
+    linhas_por_parte = n // partes
+    faixas = []
+    for i in range(partes):
+        inicio = i * linhas_por_parte
+        fim = n if i == partes - 1 else (i + 1) * linhas_por_parte
+        faixas.append((inicio, fim))
+    return faixas
+
+
+class SessaoParalela:
+    """Sessão de simulação com threads que reaproveita tudo entre iterações.
+    O pool e a divisão das linhas são criados uma vez; as threads escrevem direto
+    no buffer de saída e os dois buffers são trocados a cada passo. A matriz inicial,
+    já no formato do núcleo (src/nucleo.py), passa a ser um dos buffers, então é
+    sobrescrita a partir do segundo passo.
+    Com semente, cada faixa gera os sorteios das suas linhas no fluxo reproduzível
+    (src/aleatorio.py): o resultado não depende do número de threads.
+    instrumentacao (src/instrumentacao.py) recebe o tempo de cada fase por faixa; o tempo
+    de CPU de cada thread junto do tempo de parede mostra a espera pelo GIL.
+    num_faixas divide as linhas em mais faixas que threads (padrão: uma por thread)."""
+
+    def __init__(self, matriz, num_threads=4, prob_crescimento=0.01, prob_fogo=0.0001, semente=None,
+                 instrumentacao=None, num_faixas=None):
+        n = len(matriz)
+        self.instrumentacao = DESLIGADA if instrumentacao is None else instrumentacao
+        self.atual = formatar(matriz)
+        self.nova = buffer_como(self.atual)
+        self.prob_crescimento = prob_crescimento
+        self.prob_fogo = prob_fogo
+        self.semente = semente
+        self.passos = 0
+        self.contadores = None
+        if semente is not None:
+            from src.aleatorio import sorteios
+            self.sorteios = sorteios
+
+        # Chunk muito pequeno, use sequencial (divisão escolhida pelo chamador é respeitada)
+        if num_faixas is None and (n * n) // max(1, num_threads) < 100:
+            num_threads = 1
+        with self.instrumentacao.medir('particionamento', 0):
+            self.faixas = dividir_linhas(n, num_faixas or num_threads)
+        trabalhadores = min(num_threads, len(self.faixas))
+        self.executor = ThreadPoolExecutor(max_workers=trabalhadores) if trabalhadores > 1 else None
+
+    def processar_faixa(self, inicio, fim, trabalhador=None):
+        """Avança as linhas [inicio, fim), sorteando em bloco quando há semente."""
+        args = (self.atual, self.nova, inicio, fim, self.prob_crescimento, self.prob_fogo)
+        if self.semente is not None:
+            with self.instrumentacao.medir('sorteio', self.passos, trabalhador):
+                args += (self.sorteios(self.semente, self.passos, inicio, fim, len(self.atual)),)
+        with self.instrumentacao.medir('calculo', self.passos, trabalhador):
+            return processar_chunk_otimizado(args)
+
+    def passo(self):
+        """Avança uma iteração e retorna a matriz atual. Os contadores das faixas
+        ficam somados em self.contadores."""
+        if self.executor is None:
+            parciais = [self.processar_faixa(inicio, fim, f'faixa {k + 1}') for k, (inicio, fim) in enumerate(self.faixas)]
+        else:
+            futuros = [self.executor.submit(self.processar_faixa, inicio, fim, f'faixa {k + 1}')
+                       for k, (inicio, fim) in enumerate(self.faixas)]
+            # Tempo da thread principal esperando a faixa mais lenta
+            with self.instrumentacao.medir('espera', self.passos):
+                parciais = [futuro.result() for futuro in futuros]
+        with self.instrumentacao.medir('montagem', self.passos):
+            self.contadores = novos_contadores()
+            for parcial in parciais:
+                somar_contadores(self.contadores, parcial)
+
+        self.atual, self.nova = self.nova, self.atual
+        self.passos += 1
+        return self.atual
+
+    def avancar(self, iteracoes):
+        """Avança várias iterações e retorna a matriz atual."""
+        for _ in range(iteracoes):
+            self.passo()
+        return self.atual
+
+    def fechar(self):
+        """Encerra o pool de threads."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
 
 
 def proximo_estado_paralelo_otimizado(matriz, num_threads=4, prob_crescimento=0.01, prob_fogo=0.0001):
-    """Versão paralela otimizada usando chunks de células."""
-    n = len(matriz)
-    
-    # Gera todas as coordenadas
-    todas_coords = [(i, j) for i in range(n) for j in range(n)]
-    
-    # Divide em chunks
-    chunk_size = len(todas_coords) // num_threads
-    if chunk_size < 100:  # Chunk muito pequeno, use sequencial
-        nova = [[VAZIO for _ in range(n)] for _ in range(n)]
-        for i, j in todas_coords:
-            cel = matriz[i][j]
-            if cel == VAZIO:
-                nova[i][j] = ARVORE if random.random() < prob_crescimento else VAZIO
-            elif cel == ARVORE:
-                if random.random() < prob_fogo or contar_vizinhos_fogo(matriz, i, j) > 0:
-                    nova[i][j] = FOGO
-                else:
-                    nova[i][j] = ARVORE
-            else:
-                nova[i][j] = VAZIO
-        return nova
-    
-    chunks = []
-    for i in range(num_threads):
-        inicio = i * chunk_size
-        if i == num_threads - 1:
-            fim = len(todas_coords)
+    """Calcula um único passo em paralelo. Para várias iterações use SessaoParalela,
+    que mantém o pool e os buffers entre os passos."""
+    with SessaoParalela(matriz, num_threads, prob_crescimento, prob_fogo) as sessao:
+        return como(matriz, sessao.passo())
+
+
+def simular_paralelo_final(n, iteracoes, num_threads=4, prob_arvore=0.6, prob_crescimento=0.01, prob_fogo=0.0001, backend="threads", semente=None,
+                           gravador=None, serie=None, instrumentacao=None, num_faixas=None, profundidade=1):
+    """Versão final da simulação paralela.
+    backend="processos" usa processos persistentes sobre memória compartilhada
+    (src/processos.py); nesse caso num_threads é o número de processos.
+    backend="bits" usa threads sobre a grade compacta de 2 bits por célula (src/bitplanos.py).
+    backend="numpy" usa o motor vetorizado numa thread só (src/vetorizado.py).
+    backend="blocos" distribui blocos 2D do tamanho do cache entre as threads e pula os
+    blocos que não podem mudar (src/blocos.py).
+    backend="auto" usa a configuração (backend, trabalhadores, faixas) mais rápida medida
+    nesta máquina para o tamanho da grade (src/autoajuste.py); num_threads é ignorado.
+    num_faixas divide as linhas em mais faixas que threads nos backends threads e bits.
+    profundidade=k (backends processos e bits) sincroniza as faixas uma vez a cada k passos,
+    com halos de k linhas recalculados por cada faixa (bloqueio temporal).
+    Com a mesma semente, todos os backends chegam à mesma grade.
+    gravador (src/gravacao.py) grava em disco um de cada N estados, sem parar o cálculo, e
+    serie (lista) recebe os contadores de cada passo, somados entre as faixas.
+    instrumentacao (src/instrumentacao.py) mede as fases de cada passo no backend de threads."""
+    if backend == "auto":
+        from src.autoajuste import escolher
+        configuracao = escolher(n)
+        backend, num_threads, num_faixas = (configuracao['backend'], configuracao['trabalhadores'],
+                                            configuracao['faixas'])
+    if backend == "numpy":
+        from src.vetorizado import simular_vetorizado
+        return simular_vetorizado(n, iteracoes, prob_arvore, prob_crescimento, prob_fogo,
+                                  semente=semente, gravador=gravador, serie=serie)
+    if backend == "blocos":
+        from src.blocos import simular_blocos
+        return simular_blocos(n, iteracoes, prob_arvore, prob_crescimento, prob_fogo, num_threads, semente, gravador,
+                              serie)
+    if backend == "processos":
+        from src.processos import simular_processos
+        return simular_processos(n, iteracoes, num_threads, prob_arvore, prob_crescimento, prob_fogo, semente, gravador,
+                                 serie, profundidade)
+    if backend == "bits":
+        from src.bitplanos import simular_bits
+        return simular_bits(n, iteracoes, prob_arvore, prob_crescimento, prob_fogo, num_threads, semente, gravador, serie,
+                            num_faixas, profundidade)
+    if backend != "threads":
+        raise ValueError(f"Backend desconhecido: {backend}")
+
+    matriz = criar_matriz(n, prob_arvore, semente)
+    # Para matrizes menores, sequencial é mais rápido (sem divisão escolhida pelo chamador)
+    if num_faixas is None and n < 400:
+        num_threads = 1
+
+    with SessaoParalela(matriz, num_threads, prob_crescimento, prob_fogo, semente, instrumentacao,
+                        num_faixas) as sessao:
+        inicio = time.perf_counter()
+        if gravador is None and serie is None:
+            sessao.avancar(iteracoes)
         else:
-            fim = (i + 1) * chunk_size
-        
-        chunk_coords = todas_coords[inicio:fim]
-        chunks.append((matriz, chunk_coords, prob_crescimento, prob_fogo))
-    
-    # Processa em paralelo
-    with ThreadPoolExecutor(max_workers=num_threads) as executor:
-        resultados_chunks = list(executor.map(processar_chunk_otimizado, chunks))
-    
-    # Reconstroi matriz
-    nova = [[VAZIO for _ in range(n)] for _ in range(n)]
-    for resultado_chunk in resultados_chunks:
-        for (i, j), valor in resultado_chunk.items():
-            nova[i][j] = valor
-    
-    return nova
-
-
-def simular_paralelo_final(n, iteracoes, num_threads=4, prob_arvore=0.6, prob_crescimento=0.01, prob_fogo=0.0001):
-    """Versão final da simulação paralela."""
-    matriz = criar_matriz(n, prob_arvore)
-
-    inicio = time.time()
-    for _ in range(iteracoes):
-        if n >= 400:  # Só usa paralelo para matrizes grandes
-            matriz = proximo_estado_paralelo_otimizado(matriz, num_threads, prob_crescimento, prob_fogo)
-        else:
-            # Para matrizes menores, sequencial é mais rápido
-            nova = [[VAZIO for _ in range(n)] for _ in range(n)]
-            for i in range(n):
-                for j in range(n):
-                    cel = matriz[i][j]
-                    if cel == VAZIO:
-                        nova[i][j] = ARVORE if random.random() < prob_crescimento else VAZIO
-                    elif cel == ARVORE:
-                        if random.random() < prob_fogo or contar_vizinhos_fogo(matriz, i, j) > 0:
-                            nova[i][j] = FOGO
-                        else:
-                            nova[i][j] = ARVORE
-                    else:
-                        nova[i][j] = VAZIO
-            matriz = nova
-    fim = time.time()
-    
-    return fim - inicio
-
+            if gravador is not None:
+                gravador.registrar(0, sessao.atual)
+            for passo in range(iteracoes):
+                sessao.passo()
+                if gravador is not None:
+                    gravador.registrar(passo + 1, sessao.atual)
+                if serie is not None:
+                    serie.append(sessao.contadores)
+        fim = time.perf_counter()
 
-def benchmark_final():
-    """Benchmark final com foco na utilidade prática."""
-    print("🎯 BENCHMARK FINAL - THREADS EM FOREST FIRE")
-    print("=" * 55)
-    
-    # Importa sequencial
-    import sys
-    import os
-    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    from src.sequencial import simular
-    
-    print("\nObjetivo: Encontrar cenários onde threads ajudam\n")
-    
-    # Configurações que podem se beneficiar de paralelismo
-    cenarios = [
-        {"n": 600, "iter": 15, "nome": "Grande (600x600)"},
-        {"n": 1000, "iter": 10, "nome": "Muito Grande (1000x1000)"},
-        {"n": 1500, "iter": 5, "nome": "Gigante (1500x1500)"},
-    ]
-    
-    for cenario in cenarios:
-        n = cenario["n"]
-        iteracoes = cenario["iter"]
-        nome = cenario["nome"]
-        
-        print(f"🔥 {nome} - {iteracoes} iterações")
-        print("-" * 50)
-        
-        # Sequencial
-        tempo_seq = simular(n, iteracoes)
-        print(f"Sequencial:\t{tempo_seq:.3f}s")
-        
-        # Teste com diferentes threads
-        melhor_tempo = tempo_seq
-        melhor_threads = 1
-        
-        print("\nThreads\tTempo\tSpeedup\tMelhoria")
-        print("-" * 40)
-        
-        for threads in [2, 4, 6, 8]:
-            tempo_par = simular_paralelo_final(n, iteracoes, threads)
-            speedup = tempo_seq / tempo_par
-            melhoria = ((tempo_seq - tempo_par) / tempo_seq) * 100
-            
-            if tempo_par < melhor_tempo:
-                melhor_tempo = tempo_par
-                melhor_threads = threads
-            
-            status = "✅" if speedup > 1.05 else "❌" if speedup < 0.95 else "⚖️"
-            print(f"{threads}\t{tempo_par:.3f}s\t{speedup:.2f}x\t{melhoria:+.1f}% {status}")
-        
-        print(f"\n🏆 Melhor: {melhor_threads} threads ({melhor_tempo:.3f}s)")
-        economia = ((tempo_seq - melhor_tempo) / tempo_seq) * 100
-        print(f"💰 Economia: {economia:.1f}% de tempo\n")
+    return fim - inicio
 
 
 if __name__ == "__main__":
-    benchmark_final()
\ No newline at end of file
+    # Comparações completas (todos os motores, repetições, memória): tests/benchmark.py
+    n = 1000
+    iteracoes = 10
+
+    for num_threads in [1, 2, 4, 8]:
+        tempo = simular_paralelo_final(n, iteracoes, num_threads, semente=0)
+        print(f"{num_threads} threads: {tempo:.4f} segundos")
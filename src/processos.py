@@ -0,0 +1,179 @@
+import os
+import sys
+import time
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.estatisticas import novos_contadores, somar_contadores
+from src.aleatorio import semente_aleatoria
+from src.inicializacao import criar_grade
+from src.paralelo import dividir_linhas
+from src.vetorizado import avancar_faixa, avancar_passos
+
+
+def _trabalhador(nomes, n, inicio, fim, barreira, conexao, prob_crescimento, prob_fogo, semente_faixa, semente,
+                 profundidade=1):
+    """Loop de um processo: avança sua faixa de linhas nos dois buffers compartilhados.
+    As bordas (uma linha acima e uma abaixo) são lidas direto da faixa vizinha.
+    Com semente, os sorteios vêm do fluxo reproduzível em vez do gerador do processo.
+    Com profundidade k > 1, o processo copia a faixa com k linhas de halo para um buffer
+    próprio, avança k passos nele e só então sincroniza (src/vetorizado.avancar_passos)."""
+    segmentos = [shared_memory.SharedMemory(name=nome) for nome in nomes]
+    buffers = [np.ndarray((n, n), dtype=np.uint8, buffer=s.buf) for s in segmentos]
+    rng = np.random.default_rng(semente_faixa)
+    if profundidade > 1:
+        locais = [np.empty((fim - inicio + 2 * profundidade, n), dtype=np.uint8) for _ in range(2)]
+
+    try:
+        while True:
+            comando = conexao.recv()
+            if comando[0] == 'encerrar':
+                break
+
+            _, iteracoes, atual, passo = comando
+            # Contadores de cada passo na faixa, devolvidos junto com o buffer atual
+            serie = []
+            final = passo + iteracoes
+            while passo < final:
+                if profundidade == 1:
+                    serie.append(novos_contadores())
+                    avancar_faixa(buffers[atual], buffers[1 - atual], inicio, fim, prob_crescimento, prob_fogo, rng,
+                                  semente, passo, 0, serie[-1])
+                    passo += 1
+                else:
+                    # Bloco de k passos sobre a cópia local (faixa e halos de até k linhas)
+                    k = min(profundidade, final - passo)
+                    topo, base = max(0, inicio - k), min(n, fim + k)
+                    local, reserva = (b[:base - topo] for b in locais)
+                    local[...] = buffers[atual][topo:base]
+                    local, _ = avancar_passos(local, reserva, inicio - topo, fim - topo, k, prob_crescimento,
+                                              prob_fogo, rng, semente, passo, topo, serie)
+                    buffers[1 - atual][inicio:fim] = local[inicio - topo:fim - topo]
+                    passo += k
+                # Ninguém começa o próximo passo (ou bloco) antes de todas as faixas estarem escritas
+                barreira.wait()
+                atual = 1 - atual
+            conexao.send((atual, serie))
+    finally:
+        del buffers
+        for s in segmentos:
+            s.close()
+
+
+class SimulacaoProcessos:
+    """Simulação com processos persistentes, cada um dono de uma faixa de linhas.
+    A grade fica em dois buffers de memória compartilhada (leitura/escrita alternadas),
+    então por passo só as linhas de borda das faixas vizinhas são lidas entre processos.
+    Com profundidade k > 1 (bloqueio temporal), os processos sincronizam uma vez a cada k
+    passos, recalculando as k linhas de halo; sem semente, uma é sorteada, porque as faixas
+    vizinhas precisam dos mesmos sorteios."""
+
+    def __init__(self, grade, num_processos=4, prob_crescimento=0.01, prob_fogo=0.0001, semente=None,
+                 profundidade=1):
+        n = grade.shape[0]
+        self.n = n
+        self.segmentos = [shared_memory.SharedMemory(create=True, size=n * n) for _ in range(2)]
+        self.buffers = [np.ndarray((n, n), dtype=np.uint8, buffer=s.buf) for s in self.segmentos]
+        self.buffers[0][...] = grade
+        self.atual = 0
+        self.passos = 0
+
+        self.faixas = dividir_linhas(n, num_processos)
+        if profundidade > 1 and semente is None:
+            semente = semente_aleatoria()
+        barreira = mp.Barrier(len(self.faixas))
+        sementes = np.random.SeedSequence().spawn(len(self.faixas))
+        nomes = [s.name for s in self.segmentos]
+
+        self.conexoes = []
+        self.processos = []
+        for (inicio, fim), semente_faixa in zip(self.faixas, sementes):
+            local, remota = mp.Pipe()
+            processo = mp.Process(
+                target=_trabalhador,
+                args=(nomes, n, inicio, fim, barreira, remota, prob_crescimento, prob_fogo, semente_faixa, semente,
+                      profundidade),
+                daemon=True,
+            )
+            processo.start()
+            self.conexoes.append(local)
+            self.processos.append(processo)
+
+    def avancar(self, iteracoes=1):
+        """Avança a simulação; os processos sincronizam entre si a cada passo.
+        Retorna os contadores de cada passo (src/estatisticas.py), somados entre as faixas."""
+        for conexao in self.conexoes:
+            conexao.send(('avancar', iteracoes, self.atual, self.passos))
+        serie = [novos_contadores() for _ in range(iteracoes)]
+        for conexao in self.conexoes:
+            self.atual, parciais = conexao.recv()
+            for total, parcial in zip(serie, parciais):
+                somar_contadores(total, parcial)
+        self.passos += iteracoes
+        return serie
+
+    def grade(self):
+        """Retorna uma cópia do estado atual."""
+        return self.buffers[self.atual].copy()
+
+    def fechar(self):
+        """Encerra os processos e libera a memória compartilhada."""
+        for conexao in self.conexoes:
+            try:
+                conexao.send(('encerrar',))
+            except (BrokenPipeError, OSError):
+                pass
+        for processo in self.processos:
+            processo.join()
+        self.buffers = []
+        for s in self.segmentos:
+            s.close()
+            s.unlink()
+        self.segmentos = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+def simular_processos(n, iteracoes, num_processos=4, prob_arvore=0.6, prob_crescimento=0.01, prob_fogo=0.0001,
+                      semente=None, gravador=None, serie=None, profundidade=1):
+    """Executa a simulação com processos e retorna o tempo gasto nas iterações.
+    profundidade > 1 sincroniza os processos uma vez a cada `profundidade` passos.
+    Com gravador, os processos avançam em blocos de gravador.intervalo passos e o estado
+    é entregue ao gravador (direto da memória compartilhada) entre os blocos.
+    serie (lista) recebe os contadores de cada passo."""
+    # A grade inicial é gerada em blocos de linhas em paralelo (src/inicializacao.py)
+    grade = criar_grade(n, prob_arvore, semente, num_threads=num_processos)
+
+    with SimulacaoProcessos(grade, num_processos, prob_crescimento, prob_fogo, semente, profundidade) as simulacao:
+        inicio = time.perf_counter()
+        if gravador is None:
+            contadores = simulacao.avancar(iteracoes)
+            if serie is not None:
+                serie.extend(contadores)
+        else:
+            gravador.registrar(0, simulacao.buffers[simulacao.atual])
+            while simulacao.passos < iteracoes:
+                contadores = simulacao.avancar(min(gravador.intervalo, iteracoes - simulacao.passos))
+                if serie is not None:
+                    serie.extend(contadores)
+                gravador.registrar(simulacao.passos, simulacao.buffers[simulacao.atual])
+        fim = time.perf_counter()
+
+    return fim - inicio
+
+
+if __name__ == "__main__":
+    n = 1000
+    iteracoes = 100
+
+    for num_processos in [1, 2, 4, 8]:
+        tempo = simular_processos(n, iteracoes, num_processos)
+        print(f"{num_processos} processos: {tempo:.4f} segundos")
@@ -0,0 +1,219 @@
+import json
+import os
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.estatisticas import CAMPOS as CAMPOS_ESTATISTICAS
+
+# Formatos de mensagem negociados na conexão (em ordem de preferência)
+FORMATO_BINARIO = 'binario'
+FORMATO_JSON = 'json'
+FORMATOS = [FORMATO_BINARIO, FORMATO_JSON]
+
+# Comandos do quadro binário
+COMANDOS = {
+    'processar': 1, 'resultado': 2, 'encerrar': 3,
+    # Modo com estado: o cliente mantém sua faixa e só as bordas trafegam
+    'carregar': 4, 'passo': 5, 'bordas': 6, 'coletar': 7,
+}
+NOMES_COMANDOS = {codigo: nome for nome, codigo in COMANDOS.items()}
+
+# Campo da mensagem que carrega a grade, por comando ('processar' usa a região aninhada)
+CAMPOS_GRADE = {'resultado': 'matriz_processada', 'carregar': 'faixa', 'passo': 'bordas', 'bordas': 'bordas'}
+
+# Campos escalares levados no cabeçalho pelos demais comandos
+CAMPOS_CABECALHO = ['linha_inicio', 'linha_fim', 'passo', 'prob_crescimento', 'prob_fogo', 'semente', 'tempo_calculo',
+                    'passos', 'linhas_grade']
+
+# Codificação das células
+CELULAS_UINT8 = 0
+CELULAS_2BITS = 1
+
+# Cabeçalho: mágico, comando, codificação das células, compressão, linha_inicio,
+# linha_fim, offset, linhas, colunas, passo, prob_crescimento, prob_fogo, semente, tempo
+# de cálculo no cliente (segundos, nas respostas), passos do bloco (bloqueio temporal:
+# passos por sincronização; no 'carregar', a profundidade dos halos), linhas da grade
+# inteira, quantidade de linhas da série de contadores que segue o cabeçalho e os
+# contadores do passo (src/estatisticas.py), zerados quando a mensagem não os traz
+MAGICO = b'FF'
+CABECALHO = struct.Struct('!2sBBBIIIIIIddqdIII' + 'Q' * len(CAMPOS_ESTATISTICAS))
+
+# Série de contadores (um passo por linha) entre o cabeçalho e as células
+CONTADOR = np.dtype('>u8')
+
+# Valor da semente no cabeçalho quando a execução não é reproduzível
+SEM_SEMENTE = -1
+
+
+def empacotar_2bits(grade):
+    """Empacota uma grade de estados (0, 1, 2) em 2 bits por célula, 4 células por byte."""
+    plana = np.ascontiguousarray(grade, dtype=np.uint8).reshape(-1)
+    sobra = (-plana.size) % 4
+    if sobra:
+        plana = np.concatenate((plana, np.zeros(sobra, dtype=np.uint8)))
+    grupos = plana.reshape(-1, 4)
+    return grupos[:, 0] | (grupos[:, 1] << 2) | (grupos[:, 2] << 4) | (grupos[:, 3] << 6)
+
+
+def desempacotar_2bits(dados, linhas, colunas):
+    """Operação inversa de empacotar_2bits."""
+    bytes_ = np.frombuffer(dados, dtype=np.uint8)
+    grupos = np.empty((bytes_.size, 4), dtype=np.uint8)
+    for k in range(4):
+        np.bitwise_and(bytes_ >> (2 * k), 3, out=grupos[:, k])
+    return grupos.reshape(-1)[:linhas * colunas].reshape(linhas, colunas)
+
+
+def partes_binario(comando, grade=None, linha_inicio=0, linha_fim=0, offset=0, passo=0,
+                   prob_crescimento=0.0, prob_fogo=0.0, empacotar=True, comprimir=False, semente=None,
+                   estatisticas=None, tempo_calculo=0.0, passos=1, linhas_grade=0, serie=None):
+    """Partes de um quadro binário, na ordem: cabeçalho fixo, a série de contadores de um
+    bloco de vários passos (se houver) e as células da grade. As partes são enviadas
+    como estão (src/quadros.py); com células uint8 sem compressão, a última é a própria
+    memória da grade, sem cópia."""
+    linhas, colunas = (0, 0) if grade is None else grade.shape
+    if grade is None:
+        corpo = b''
+    elif empacotar:
+        corpo = empacotar_2bits(grade)
+    else:
+        corpo = np.ascontiguousarray(grade, dtype=np.uint8)
+    if comprimir:
+        corpo = zlib.compress(corpo, 1)
+    serie = [] if serie is None else serie
+    contadores = np.array([[c[campo] for campo in CAMPOS_ESTATISTICAS] for c in serie], dtype=CONTADOR)
+
+    cabecalho = CABECALHO.pack(
+        MAGICO, COMANDOS[comando], CELULAS_2BITS if empacotar else CELULAS_UINT8, int(comprimir),
+        linha_inicio, linha_fim, offset, linhas, colunas, passo, prob_crescimento, prob_fogo,
+        SEM_SEMENTE if semente is None else semente, tempo_calculo, passos, linhas_grade, len(serie),
+        *(0 if estatisticas is None else int(estatisticas[campo]) for campo in CAMPOS_ESTATISTICAS),
+    )
+    return [cabecalho, contadores.tobytes(), corpo]
+
+
+def codificar_binario(*args, **kwargs):
+    """Quadro binário numa mensagem só (mesmos parâmetros de partes_binario)."""
+    return b''.join(memoryview(parte).cast('B') for parte in partes_binario(*args, **kwargs))
+
+
+def decodificar_binario(dados):
+    """Lê um quadro binário. Com células uint8 sem compressão, a grade é uma
+    visão direta sobre o buffer recebido (sem cópia)."""
+    (_, comando, codificacao, comprimido, linha_inicio, linha_fim, offset,
+     linhas, colunas, passo, prob_crescimento, prob_fogo, semente, tempo_calculo, passos, linhas_grade,
+     linhas_serie, *contadores) = CABECALHO.unpack_from(dados)
+
+    serie = None
+    if linhas_serie:
+        tabela = np.frombuffer(dados, dtype=CONTADOR, count=linhas_serie * len(CAMPOS_ESTATISTICAS),
+                               offset=CABECALHO.size).reshape(linhas_serie, -1)
+        serie = [dict(zip(CAMPOS_ESTATISTICAS, map(int, linha))) for linha in tabela]
+    corpo = memoryview(dados)[CABECALHO.size + linhas_serie * len(CAMPOS_ESTATISTICAS) * CONTADOR.itemsize:]
+    if comprimido:
+        corpo = zlib.decompress(corpo)
+
+    grade = None
+    if linhas and colunas:
+        if codificacao == CELULAS_2BITS:
+            grade = desempacotar_2bits(corpo, linhas, colunas)
+        else:
+            grade = np.frombuffer(corpo, dtype=np.uint8, count=linhas * colunas).reshape(linhas, colunas)
+
+    return {
+        'comando': NOMES_COMANDOS[comando],
+        'grade': grade,
+        'linha_inicio': linha_inicio,
+        'linha_fim': linha_fim,
+        'offset': offset,
+        'passo': passo,
+        'prob_crescimento': prob_crescimento,
+        'prob_fogo': prob_fogo,
+        'semente': None if semente == SEM_SEMENTE else semente,
+        'tempo_calculo': tempo_calculo,
+        'passos': passos,
+        'linhas_grade': linhas_grade,
+        'serie': serie,
+        # Toda faixa tem ao menos uma célula: contadores todos zerados significam ausência
+        'estatisticas': dict(zip(CAMPOS_ESTATISTICAS, contadores)) if any(contadores) else None,
+    }
+
+
+def codificar_partes(dados, formato, comprimir=False, empacotar=True):
+    """Serializa uma mensagem (dicionário do protocolo) no formato negociado, em partes
+    para envio com scatter/gather (src/quadros.py).
+    No formato binário as células vão com 2 bits (empacotar) ou como uint8 cru."""
+    comando = dados.get('comando', 'resultado')
+    if formato != FORMATO_BINARIO or comando not in COMANDOS:
+        # Mensagens de controle (negociação) sempre em JSON; grades NumPy viram listas
+        return [json.dumps(dados, default=lambda obj: obj.tolist()).encode('utf-8')]
+
+    if comando == 'processar':
+        regiao = dados['regiao']
+        return partes_binario(
+            comando, np.asarray(regiao['matriz'], dtype=np.uint8),
+            regiao['linha_inicio_original'], regiao['linha_fim_original'], regiao['offset_original'],
+            dados.get('passo', 0), dados['prob_crescimento'], dados['prob_fogo'], empacotar, comprimir,
+            dados.get('semente'),
+        )
+
+    campo = CAMPOS_GRADE.get(comando)
+    grade = None if campo is None else np.asarray(dados[campo], dtype=np.uint8)
+    return partes_binario(
+        comando, grade, dados.get('linha_inicio', 0), dados.get('linha_fim', 0), 0, dados.get('passo', 0),
+        dados.get('prob_crescimento', 0.0), dados.get('prob_fogo', 0.0), empacotar, comprimir,
+        dados.get('semente'), dados.get('estatisticas'), dados.get('tempo_calculo', 0.0), dados.get('passos', 1),
+        dados.get('linhas_grade', 0), dados.get('serie'),
+    )
+
+
+def codificar(dados, formato, comprimir=False, empacotar=True):
+    """Serializa uma mensagem numa sequência de bytes só (mesmos parâmetros de codificar_partes)."""
+    return b''.join(memoryview(parte).cast('B') for parte in codificar_partes(dados, formato, comprimir, empacotar))
+
+
+def decodificar(mensagem):
+    """Lê uma mensagem em qualquer formato (bytes, bytearray ou memoryview) e devolve o
+    dicionário do protocolo. Grades uint8 do formato binário são vistas sobre a mensagem."""
+    if bytes(mensagem[:len(MAGICO)]) != MAGICO:
+        return json.loads(bytes(mensagem).decode('utf-8'))
+
+    quadro = decodificar_binario(mensagem)
+    if quadro['comando'] == 'processar':
+        return {
+            'comando': 'processar',
+            'regiao': {
+                'matriz': quadro['grade'],
+                'linha_inicio_original': quadro['linha_inicio'],
+                'linha_fim_original': quadro['linha_fim'],
+                'offset_original': quadro['offset'],
+            },
+            'passo': quadro['passo'],
+            'prob_crescimento': quadro['prob_crescimento'],
+            'prob_fogo': quadro['prob_fogo'],
+            'semente': quadro['semente'],
+        }
+
+    mensagem = {chave: quadro[chave] for chave in CAMPOS_CABECALHO}
+    if quadro['estatisticas'] is not None:
+        mensagem['estatisticas'] = quadro['estatisticas']
+    if quadro['serie'] is not None:
+        mensagem['serie'] = quadro['serie']
+    mensagem['comando'] = quadro['comando']
+    campo = CAMPOS_GRADE.get(quadro['comando'])
+    if campo is not None:
+        mensagem[campo] = quadro['grade']
+    return mensagem
+
+
+def escolher_formato(formatos_cliente):
+    """Escolhe o formato preferido do servidor entre os oferecidos pelo cliente."""
+    for formato in FORMATOS:
+        if formato in formatos_cliente:
+            return formato
+    return FORMATO_JSON
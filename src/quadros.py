@@ -0,0 +1,99 @@
+import os
+import struct
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Cada quadro no socket: tamanho do corpo (4 bytes, big-endian) seguido do corpo
+TAMANHO = struct.Struct('!I')
+
+# Capacidade inicial do buffer de recepção; cresce (dobrando) com a maior mensagem vista
+CAPACIDADE_INICIAL = 1 << 16
+
+
+def montar_quadro(partes):
+    """Buffers do quadro, na ordem: o tamanho seguido das partes do corpo, sem concatenar."""
+    partes = [memoryview(parte).cast('B') for parte in partes]
+    partes = [parte for parte in partes if parte.nbytes]
+    return [memoryview(TAMANHO.pack(sum(parte.nbytes for parte in partes)))] + partes
+
+
+def descartar_enviados(partes, enviados):
+    """Tira das partes os `enviados` bytes que já saíram (a última pode sair pela metade)."""
+    while partes and enviados >= partes[0].nbytes:
+        enviados -= partes[0].nbytes
+        partes.pop(0)
+    if enviados:
+        partes[0] = partes[0][enviados:]
+    return partes
+
+
+def enviar_quadro(sock, partes):
+    """Envia um quadro num socket bloqueante com sendmsg (scatter/gather): o cabeçalho e a
+    grade saem dos próprios buffers, sem montar uma cópia da mensagem inteira.
+    Retorna o total de bytes enviados."""
+    partes = montar_quadro(partes)
+    total = sum(parte.nbytes for parte in partes)
+    if not hasattr(sock, 'sendmsg'):
+        sock.sendall(b''.join(partes))
+        return total
+    while partes:
+        descartar_enviados(partes, sock.sendmsg(partes))
+    return total
+
+
+class Receptor:
+    """Recebe os quadros de uma conexão com recv_into num buffer reaproveitado entre as
+    mensagens: sem concatenações, e a memória fica no tamanho da maior mensagem.
+    O corpo devolvido é uma vista do buffer, válida até o próximo quadro da conexão
+    (quem precisar dos dados depois disso deve copiá-los). Serve a sockets bloqueantes
+    (receber) e não bloqueantes (ler e completo, chamados a cada evento do seletor)."""
+
+    def __init__(self, capacidade=CAPACIDADE_INICIAL):
+        self.buffer = bytearray(capacidade)
+        self.cabecalho = bytearray(TAMANHO.size)
+        self.alvo = memoryview(self.cabecalho)
+        self.corpo = None
+        self.lidos = 0
+
+    @property
+    def novo(self):
+        """True quando nenhum byte do quadro atual chegou ainda."""
+        return self.corpo is None and self.lidos == 0
+
+    def reservar(self, tamanho):
+        """Vista de `tamanho` bytes do buffer, trocado por um maior se preciso (não é
+        redimensionado: vistas do quadro anterior podem estar em uso)."""
+        if len(self.buffer) < tamanho:
+            self.buffer = bytearray(max(tamanho, 2 * len(self.buffer)))
+        return memoryview(self.buffer)[:tamanho]
+
+    def ler(self, sock):
+        """Um recv_into a partir de onde o quadro parou. Retorna os bytes lidos (0: conexão
+        fechada); num socket não bloqueante, BlockingIOError vai para o chamador."""
+        lidos = sock.recv_into(self.alvo[self.lidos:])
+        self.lidos += lidos
+        if self.corpo is None and self.lidos == len(self.alvo):
+            # Cabeçalho completo: o resto do quadro vai direto para o buffer
+            self.corpo = self.alvo = self.reservar(TAMANHO.unpack(self.cabecalho)[0])
+            self.lidos = 0
+        return lidos
+
+    def completo(self):
+        """Corpo do quadro, se já chegou inteiro (e prepara o próximo), senão None."""
+        if self.corpo is None or self.lidos < len(self.corpo):
+            return None
+        corpo = self.corpo
+        self.corpo = None
+        self.alvo = memoryview(self.cabecalho)
+        self.lidos = 0
+        return corpo
+
+    def receber(self, sock):
+        """Lê um quadro inteiro de um socket bloqueante; None se a conexão fechar."""
+        while True:
+            corpo = self.completo()
+            if corpo is not None:
+                return corpo
+            if self.ler(sock) == 0:
+                return None
@@ -1,14 +1,25 @@
+import os
 import random
+import sys
 import time
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.estatisticas import novos_contadores
+from src.nucleo import IMPLEMENTACOES, NUCLEO, buffer_como, como, formatar
+
 # Estados possíveis
 VAZIO = 0
 ARVORE = 1
 FOGO = 2
 
 
-def criar_matriz(n, prob_arvore=0.6):
+def criar_matriz(n, prob_arvore=0.6, semente=None):
     """Cria uma matriz nxn com árvores distribuídas aleatoriamente. Cada célula tem prob_arvore de ser uma árvore"""
+    if semente is not None:
+        # Mesma grade inicial de todos os motores (fluxo reproduzível de src/aleatorio.py)
+        from src.inicializacao import criar_grade
+        return criar_grade(n, prob_arvore, semente=semente).tolist()
     return [
         [ARVORE if random.random() < prob_arvore else VAZIO for _ in range(n)]
         for _ in range(n)
@@ -28,52 +39,72 @@ def vizinhos(i, j, n):
     return coords
 
 
-def proximo_estado(matriz, prob_crescimento=0.01, prob_fogo=0.0001):
+def proximo_estado(matriz, prob_crescimento=0.01, prob_fogo=0.0001, semente=None, passo=0, contadores=None,
+                   nucleo=None):
     """Calcula o próximo estado da matriz conforme o modelo Forest Fire
     Regras:
     - Espaço vazio pode virar árvore com prob_crescimento
     - Árvore pode pegar fogo:
         - espontaneamente (prob_fogo)
         - ou se qualquer vizinho está em chamas
-    - Fogo vira VAZIO"""
+    - Fogo vira VAZIO
+    O passo é feito pelo núcleo `nucleo` de src/nucleo.py (padrão: o escolhido na
+    importação); o resultado vem no formato da entrada (lista de listas ou array).
+    Com semente, cada célula usa o número do passo `passo` no fluxo reproduzível.
+    contadores (src/estatisticas.py) recebe as contagens do passo, feitas durante a atualização."""
     n = len(matriz)
-    nova = [[VAZIO for _ in range(n)] for _ in range(n)]
-
-    for i in range(n):
-        for j in range(n):
-            cel = matriz[i][j]
-
-            # Se está vazio → pode nascer árvore
-            if cel == VAZIO:
-                nova[i][j] = ARVORE if random.random() < prob_crescimento else VAZIO
-
-            # Se é árvore → pode pegar fogo
-            elif cel == ARVORE:
-                if random.random() < prob_fogo:
-                    nova[i][j] = FOGO
-                else:
-                    queimando = any(
-                        matriz[x][y] == FOGO for x, y in vizinhos(i, j, n)
-                    )
-                    nova[i][j] = FOGO if queimando else ARVORE
-
-            # Se está pegando fogo → vira vazio
-            elif cel == FOGO:
-                nova[i][j] = VAZIO
-
-    return nova
-
-
-def simular(n, iteracoes, prob_arvore=0.6, prob_crescimento=0.01, prob_fogo=0.0001):
-    """Executa a simulação sequencial completa e retorna o tempo gasto"""
-    matriz = criar_matriz(n, prob_arvore)
-
-    inicio = time.time()
-
-    for _ in range(iteracoes):
-        matriz = proximo_estado(matriz, prob_crescimento, prob_fogo)
-
-    fim = time.time()
+    nucleo = nucleo or NUCLEO
+    atual = formatar(matriz, nucleo)
+    nova = buffer_como(atual)
+    sorteio = None
+    if semente is not None:
+        from src.aleatorio import sorteios
+        sorteio = sorteios(semente, passo, 0, n, n)
+    IMPLEMENTACOES[nucleo](atual, nova, 0, n, prob_crescimento, prob_fogo, sorteio, contadores)
+    return como(matriz, nova)
+
+
+def simular(n, iteracoes, prob_arvore=0.6, prob_crescimento=0.01, prob_fogo=0.0001, motor="python", semente=None,
+            gravador=None, serie=None):
+    """Executa a simulação sequencial completa e retorna o tempo gasto.
+    motor="python" é a referência em Python puro (nucleo.avancar_python, grade em listas),
+    qualquer que seja o núcleo padrão de src/nucleo.py.
+    motor="numpy" usa o motor vetorizado (src/vetorizado.py), motor="fronteira" o motor
+    de fronteira ativa (src/fronteira.py) e motor="bits" a grade compacta de 2 bits por
+    célula (src/bitplanos.py), todos com as mesmas regras. Com a mesma semente, os motores
+    python, numpy e bits produzem grades idênticas; o de fronteira, a mesma distribuição.
+    gravador (src/gravacao.py) grava em disco um de cada N estados, sem parar o cálculo, e
+    serie (lista) recebe os contadores de cada passo (src/estatisticas.py)."""
+    if motor == "numpy":
+        from src.vetorizado import simular_vetorizado
+        return simular_vetorizado(n, iteracoes, prob_arvore, prob_crescimento, prob_fogo,
+                                  semente=semente, gravador=gravador, serie=serie)
+    if motor == "fronteira":
+        from src.fronteira import simular_fronteira
+        return simular_fronteira(n, iteracoes, prob_arvore, prob_crescimento, prob_fogo,
+                                 semente=semente, gravador=gravador, serie=serie)
+    if motor == "bits":
+        from src.bitplanos import simular_bits
+        return simular_bits(n, iteracoes, prob_arvore, prob_crescimento, prob_fogo,
+                            semente=semente, gravador=gravador, serie=serie)
+    if motor != "python":
+        raise ValueError(f"Motor desconhecido: {motor}")
+
+    matriz = criar_matriz(n, prob_arvore, semente)
+
+    inicio = time.perf_counter()
+
+    if gravador is not None:
+        gravador.registrar(0, matriz)
+    for passo in range(iteracoes):
+        contadores = None if serie is None else novos_contadores()
+        matriz = proximo_estado(matriz, prob_crescimento, prob_fogo, semente, passo, contadores, 'python')
+        if serie is not None:
+            serie.append(contadores)
+        if gravador is not None:
+            gravador.registrar(passo + 1, matriz)
+
+    fim = time.perf_counter()
     return fim - inicio
 
 
@@ -81,6 +112,7 @@ if __name__ == "__main__":
     # Execução simples para teste
     n = 200
     iteracoes = 200
+    motor = sys.argv[1] if len(sys.argv) > 1 else "python"
 
-    tempo = simular(n, iteracoes)
-    print(f"Tempo sequencial: {tempo:.4f} segundos")
+    tempo = simular(n, iteracoes, motor=motor)
+    print(f"Tempo sequencial ({motor}): {tempo:.4f} segundos")
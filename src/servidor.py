@@ -1,30 +1,46 @@
-import random
+import os
+import sys
 import time
 import socket
-import json
+import selectors
 import threading
 
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.aleatorio import semente_aleatoria
+from src.inicializacao import PADROES, criar_grade, gerar_linhas, grade_inicial
+from src.protocolo import FORMATO_JSON, FORMATOS, codificar_partes, decodificar, escolher_formato
+from src.quadros import Receptor, descartar_enviados, enviar_quadro, montar_quadro
+from src.estatisticas import novos_contadores, salvar_serie, somar_contadores
+from src.vetorizado import avancar_faixa
+from src.gravacao import Gravador
+from src.instrumentacao import Instrumentacao, InstrumentacaoDesligada
+from src.memoria_local import GradesCompartilhadas, endereco_local
+from src.paralelo import dividir_linhas
+
 # Estados possíveis  
 VAZIO = 0
 ARVORE = 1
 FOGO = 2
 
 def criar_matriz(n, prob_arvore=0.6):
-    """Cria uma matriz nxn com árvores distribuídas aleatoriamente."""
-    return [
-        [ARVORE if random.random() < prob_arvore else VAZIO for _ in range(n)]
-        for _ in range(n)
-    ]
-
-def dividir_matriz_em_regioes(n, num_clientes):
-    """Divide a matriz em regiões horizontais para distribuir entre clientes."""
-    linhas_por_cliente = n // num_clientes
-    regioes = []
-    for i in range(num_clientes):
-        inicio = i * linhas_por_cliente
-        fim = n if i == num_clientes - 1 else (i + 1) * linhas_por_cliente
-        regioes.append((inicio, fim))
-    return regioes
+    """Cria uma matriz nxn com árvores distribuídas aleatoriamente (sorteio em bloco)."""
+    return criar_grade(n, prob_arvore)
+
+def salvar_checkpoint(arquivo, matriz, passo):
+    """Grava a grade e o número de passos já executados. A escrita vai para um arquivo
+    temporário renomeado no fim, então uma queda no meio não corrompe o checkpoint anterior."""
+    temporario = arquivo + '.tmp'
+    with open(temporario, 'wb') as f:
+        np.savez(f, matriz=matriz, passo=passo)
+    os.replace(temporario, arquivo)
+
+def carregar_checkpoint(arquivo):
+    """Lê um checkpoint gravado por salvar_checkpoint e retorna (matriz, passo)."""
+    with np.load(arquivo) as dados:
+        return dados['matriz'].astype(np.uint8), int(dados['passo'])
 
 def extrair_regiao_com_bordas(matriz, linha_inicio, linha_fim):
     """Extrai região com bordas para cálculo correto da vizinhança."""
@@ -32,7 +48,11 @@ def extrair_regiao_com_bordas(matriz, linha_inicio, linha_fim):
     inicio_expandido = max(0, linha_inicio - 1)
     fim_expandido = min(n, linha_fim + 1)
     
-    regiao = [matriz[i][:] for i in range(inicio_expandido, fim_expandido)]
+    if isinstance(matriz, np.ndarray):
+        # Visão das linhas, sem cópia: a serialização já copia os dados
+        regiao = matriz[inicio_expandido:fim_expandido]
+    else:
+        regiao = [matriz[i][:] for i in range(inicio_expandido, fim_expandido)]
     
     return {
         'matriz': regiao,
@@ -42,11 +62,54 @@ def extrair_regiao_com_bordas(matriz, linha_inicio, linha_fim):
     }
 
 
+def nome_cliente(cliente_id):
+    """Nome do cliente nos relatórios de instrumentação (numerados a partir de 1, como no log)."""
+    return f'cliente {cliente_id + 1}'
+
+
+class FalhaCliente(Exception):
+    """Um cliente caiu ou deixou de responder dentro do timeout."""
+
+
 class ServidorForestFire:
-    def __init__(self, porta=8000):
+    def __init__(self, porta=8000, formatos=FORMATOS, comprimir=False, timeout=30.0, semente=None, instrumentacao=None,
+                 memoria_local=True):
         self.porta = porta
         self.clientes = []
         self.servidor_socket = None
+        self.formatos = formatos
+        self.comprimir = comprimir
+        self.bytes_enviados = 0
+        self.bytes_recebidos = 0
+        # Uma entrada por troca concorrente: latência de cada cliente e tempo do retardatário
+        self.metricas = []
+        # Segundos sem receber nada (resposta ou batimento) até considerar o cliente perdido
+        self.timeout = timeout
+        self.rng = np.random.default_rng()
+        # Com semente, os clientes sorteiam no fluxo reproduzível (src/aleatorio.py): o
+        # resultado não depende da divisão em faixas, de falhas nem do número de clientes
+        self.semente = semente
+        # Contadores de cada passo (src/estatisticas.py), somados entre os clientes;
+        # por passo, então iterações refeitas depois de uma falha não duplicam entradas
+        self.estatisticas = {}
+        # Tempos de cada fase por passo e por cliente (src/instrumentacao.py), desligado por
+        # padrão; o tempo de cálculo de cada cliente vem nas respostas. Desligada, é uma
+        # instância própria: o servidor guarda nela o passo em andamento
+        self.instrumentacao = InstrumentacaoDesligada() if instrumentacao is None else instrumentacao
+        # Parâmetros da grade inicial quando os clientes geram as próprias faixas (modo
+        # estado com semente): o servidor nunca monta a grade inteira
+        self.geracao = None
+        # Com memoria_local, clientes na mesma máquina leem e escrevem a grade em memória
+        # compartilhada (src/memoria_local.py); pelo socket passam só mensagens de controle
+        self.memoria_local = memoria_local
+        self.memoria = None
+        # Ocupação dos nós: tempo do servidor parado no seletor à espera dos clientes e
+        # tempo de cálculo declarado por cada cliente nas respostas (o resto é ociosidade)
+        self.ocioso = 0.0
+        self.calculo = {}
+        # Clientes que entraram no modo dinâmico e ainda não mandaram o 'ola': estado de
+        # recepção não bloqueante de cada um, mantido entre as iterações
+        self.entrando = {}
         
     def iniciar_servidor(self):
         """Inicia o servidor e aceita conexões."""
@@ -68,94 +131,911 @@ class ServidorForestFire:
         while len(self.clientes) < num_clientes:
             try:
                 cliente_socket, endereco = self.servidor_socket.accept()
-                self.clientes.append({'socket': cliente_socket, 'endereco': endereco})
-                print(f"Cliente {len(self.clientes)} conectado de {endereco}")
+                self.registrar_cliente(cliente_socket, endereco)
             except Exception as e:
                 print(f"Erro: {e}")
                 break
     
+    def registrar_cliente(self, cliente_socket, endereco):
+        """Configura a conexão de um novo cliente, negocia o formato e o adiciona à lista."""
+        cliente_id = self.adicionar_cliente(cliente_socket, endereco)
+        self.negociar_formato(cliente_id)
+        return cliente_id
+    
+    def adicionar_cliente(self, cliente_socket, endereco, ativo=True):
+        """Configura a conexão de um novo cliente e o adiciona à lista, ainda no formato JSON.
+        Retorna o índice do cliente."""
+        cliente_socket.setblocking(True)
+        # Tamanho e mensagem vão em dois envios: sem Nagle para não esperar o ACK atrasado
+        cliente_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # vazao: linhas por segundo medidas no modo dinâmico (média móvel)
+        # local: o cliente está nesta máquina e aceita a grade em memória compartilhada
+        # receptor: buffer de recepção da conexão, reaproveitado entre as mensagens (src/quadros.py)
+        cliente = {'socket': cliente_socket, 'endereco': endereco, 'formato': FORMATO_JSON, 'vazao': None,
+                   'ativo': ativo, 'local': False, 'receptor': Receptor()}
+        self.clientes.append(cliente)
+        return len(self.clientes) - 1
+    
+    def clientes_ativos(self):
+        """Índices dos clientes que ainda não falharam."""
+        return [i for i, cliente in enumerate(self.clientes) if cliente['ativo']]
+    
+    def marcar_falha(self, cliente_id, motivo):
+        """Tira o cliente da simulação e fecha sua conexão."""
+        cliente = self.clientes[cliente_id]
+        if not cliente['ativo']:
+            return
+        cliente['ativo'] = False
+        print(f"Cliente {cliente_id + 1} perdido ({motivo})")
+        try:
+            cliente['socket'].close()
+        except OSError:
+            pass
+    
+    def negociar_formato(self, cliente_id, timeout=5.0):
+        """Espera a mensagem 'ola' do cliente (até timeout segundos) e conclui a negociação."""
+        cliente = self.clientes[cliente_id]
+        cliente['socket'].settimeout(timeout)
+        try:
+            ola = self.receber_dados(cliente_id)
+        finally:
+            cliente['socket'].settimeout(None)
+        return self.concluir_negociacao(cliente_id, ola)
+    
+    def concluir_negociacao(self, cliente_id, ola):
+        """Responde ao 'ola' do cliente com o formato escolhido e o adota. Clientes que não
+        negociam continuam no formato JSON. Retorna o formato."""
+        cliente = self.clientes[cliente_id]
+        if ola and ola.get('comando') == 'ola':
+            cliente['local'] = self.memoria_local and bool(ola.get('memoria')) and endereco_local(cliente['endereco'])
+            formato = escolher_formato([f for f in ola.get('formatos', []) if f in self.formatos])
+            # A resposta ainda vai em JSON, o formato que o cliente espera antes da escolha
+            if not self.enviar_dados(cliente_id, {'comando': 'formato', 'formato': formato}):
+                self.marcar_falha(cliente_id, "falha ao responder o 'ola'")
+                return FORMATO_JSON
+            cliente['formato'] = formato
+        transporte = ', memória compartilhada' if cliente['local'] else ''
+        print(f"Cliente {cliente_id + 1} conectado de {cliente['endereco']} (formato {cliente['formato']}{transporte})")
+        return cliente['formato']
+    
+    def receber_entrada(self, seletor, sock, eventos, cliente_id):
+        """Cliente que entrou com a simulação em andamento: lê o 'ola' pelo seletor, sem
+        bloquear as faixas em andamento. Retorna True quando a negociação termina e o
+        cliente pode receber faixas; se a conexão cair antes, o cliente é descartado."""
+        try:
+            ola = self.atender_evento(seletor, sock, eventos, self.entrando[cliente_id], cliente_id)
+        except OSError:
+            self.descartar_entrada(seletor, cliente_id)
+            return False
+        if ola is None:
+            return False
+        seletor.unregister(sock)
+        del self.entrando[cliente_id]
+        self.clientes[cliente_id]['ativo'] = True
+        self.concluir_negociacao(cliente_id, ola)
+        return self.clientes[cliente_id]['ativo']
+    
+    def descartar_entrada(self, seletor, cliente_id):
+        """Desiste de um cliente que caiu ou ficou em silêncio antes de mandar o 'ola'."""
+        sock = self.clientes[cliente_id]['socket']
+        seletor.unregister(sock)
+        del self.entrando[cliente_id]
+        try:
+            sock.close()
+        except OSError:
+            pass
+
     def enviar_dados(self, cliente_id, dados):
-        """Envia dados para um cliente."""
+        """Envia dados para um cliente no formato negociado com ele."""
         try:
-            mensagem = json.dumps(dados).encode('utf-8')
-            tamanho = len(mensagem)
             cliente = self.clientes[cliente_id]
-            cliente['socket'].sendall(tamanho.to_bytes(4, byteorder='big'))
-            cliente['socket'].sendall(mensagem)
+            partes = codificar_partes(dados, cliente['formato'], self.comprimir)
+            self.bytes_enviados += enviar_quadro(cliente['socket'], partes)
             return True
         except:
             return False
     
     def receber_dados(self, cliente_id):
-        """Recebe dados de um cliente."""
+        """Recebe dados de um cliente, descartando os batimentos ('vivo')."""
         try:
             cliente = self.clientes[cliente_id]
-            tamanho_bytes = cliente['socket'].recv(4)
-            tamanho = int.from_bytes(tamanho_bytes, byteorder='big')
-            
-            dados_bytes = b''
-            while len(dados_bytes) < tamanho:
-                chunk = cliente['socket'].recv(min(tamanho - len(dados_bytes), 4096))
-                if not chunk:
-                    break
-                dados_bytes += chunk
-            
-            return json.loads(dados_bytes.decode('utf-8'))
+            while True:
+                mensagem = cliente['receptor'].receber(cliente['socket'])
+                if mensagem is None:
+                    return None
+                self.bytes_recebidos += 4 + len(mensagem)
+                dados = decodificar(mensagem)
+                if dados.get('comando') != 'vivo':
+                    return dados
         except:
             return None
     
-    def processar_iteracao(self, matriz, num_clientes, prob_crescimento=0.01, prob_fogo=0.0001):
-        """Processa uma iteração distribuída."""
+    def escrever_pendente(self, sock, estado):
+        """Envia o que o socket (não bloqueante) aceitar dos buffers pendentes, todos de
+        uma vez com sendmsg (scatter/gather)."""
+        saida = estado['saida']
+        while saida:
+            try:
+                enviados = sock.sendmsg(saida)
+            except BlockingIOError:
+                return
+            descartar_enviados(saida, enviados)
+    
+    def ler_disponivel(self, sock, estado):
+        """Lê o que houver no socket (não bloqueante) para o quadro em montagem, no buffer
+        de recepção do cliente. Retorna o corpo da mensagem quando ela fica completa, senão None."""
+        receptor = estado['receptor']
+        while True:
+            corpo = receptor.completo()
+            if corpo is not None:
+                self.bytes_recebidos += 4 + len(corpo)
+                return corpo
+            novo = receptor.novo
+            try:
+                lidos = receptor.ler(sock)
+            except BlockingIOError:
+                return None
+            if lidos == 0:
+                raise ConnectionError("cliente desconectou")
+            estado['contato'] = time.perf_counter()
+            if novo:
+                estado['primeiro_byte'] = estado['contato']
+    
+    def atender_evento(self, seletor, sock, eventos, estado, cliente_id):
+        """Trata um evento do seletor para um cliente: continua o envio pendente e lê o
+        que chegou. Retorna a resposta quando completa; batimentos ('vivo') só renovam o prazo."""
+        nome = nome_cliente(cliente_id)
+        if eventos & selectors.EVENT_WRITE and estado['saida']:
+            self.escrever_pendente(sock, estado)
+            if not estado['saida']:
+                seletor.modify(sock, selectors.EVENT_READ, cliente_id)
+                self.instrumentacao.registrar('envio', estado['inicio'], time.perf_counter(), trabalhador=nome)
+        if not eventos & selectors.EVENT_READ:
+            return None
+        while True:
+            mensagem = self.ler_disponivel(sock, estado)
+            if mensagem is None:
+                return None
+            recebido = time.perf_counter()
+            with self.instrumentacao.medir('decodificacao', trabalhador=nome):
+                dados = decodificar(mensagem)
+            if dados.get('comando') != 'vivo':
+                # O cálculo no cliente termina pouco antes do primeiro byte da resposta
+                primeiro_byte = estado['primeiro_byte']
+                self.instrumentacao.registrar('recepcao', primeiro_byte, recebido, trabalhador=nome)
+                if dados.get('tempo_calculo'):
+                    self.calculo[cliente_id] = self.calculo.get(cliente_id, 0.0) + dados['tempo_calculo']
+                    self.instrumentacao.registrar('calculo', primeiro_byte - dados['tempo_calculo'], primeiro_byte,
+                                                  trabalhador=nome)
+                return dados
+    
+    def esperar(self, seletor):
+        """seletor.select com o tempo parado somado à ociosidade do servidor."""
+        inicio = time.perf_counter()
+        eventos = seletor.select(timeout=1.0)
+        self.ocioso += time.perf_counter() - inicio
+        return eventos
+    
+    def expirados(self, estados, pendentes):
+        """Clientes pendentes sem nenhum contato há mais de self.timeout segundos."""
+        agora = time.perf_counter()
+        return [c for c in pendentes if agora - estados[c]['contato'] > self.timeout]
+    
+    def preparar_envio(self, cliente_id, dados):
+        """Codifica a mensagem e cria o estado de envio/recepção não bloqueante do cliente."""
+        cliente = self.clientes[cliente_id]
+        with self.instrumentacao.medir('serializacao', trabalhador=nome_cliente(cliente_id)):
+            saida = montar_quadro(codificar_partes(dados, cliente['formato'], self.comprimir))
+        self.bytes_enviados += sum(parte.nbytes for parte in saida)
+        return self.estado_conexao(cliente_id, saida)
+    
+    def estado_conexao(self, cliente_id, saida=None):
+        """Põe o socket do cliente em modo não bloqueante e cria o seu estado de envio (os
+        buffers pendentes em saida) e de recepção, usado com o seletor."""
+        cliente = self.clientes[cliente_id]
+        cliente['socket'].setblocking(False)
+        return {
+            'saida': [] if saida is None else saida,
+            'receptor': cliente['receptor'],
+            'inicio': time.perf_counter(),
+            'contato': time.perf_counter(),
+        }
+    
+    def trocar_concorrente(self, envios, ao_receber=None, passo=0):
+        """Envia todas as mensagens ao mesmo tempo e recebe as respostas na ordem em
+        que ficam prontas, chamando ao_receber(cliente_id, resultado) para cada uma
+        enquanto as demais ainda estão a caminho. envios mapeia cliente_id -> mensagem.
+        Clientes que caem ou estouram o timeout são marcados como perdidos e ficam com
+        resultado None."""
+        seletor = selectors.DefaultSelector()
+        estados = {}
+        inicio = time.perf_counter()
+        
+        for cliente_id, dados in envios.items():
+            estados[cliente_id] = self.preparar_envio(cliente_id, dados)
+            seletor.register(self.clientes[cliente_id]['socket'], selectors.EVENT_READ | selectors.EVENT_WRITE, cliente_id)
+        
+        resultados = {}
+        latencias = {}
+        try:
+            while len(resultados) < len(envios):
+                for chave, eventos in self.esperar(seletor):
+                    cliente_id = chave.data
+                    sock = chave.fileobj
+                    try:
+                        resultado = self.atender_evento(seletor, sock, eventos, estados[cliente_id], cliente_id)
+                    except OSError as erro:
+                        seletor.unregister(sock)
+                        self.marcar_falha(cliente_id, erro)
+                        resultados[cliente_id] = None
+                        continue
+                    
+                    if resultado is not None:
+                        seletor.unregister(sock)
+                        latencias[cliente_id] = time.perf_counter() - inicio
+                        resultados[cliente_id] = resultado
+                        if ao_receber:
+                            ao_receber(cliente_id, resultado)
+                
+                pendentes = [c for c in envios if c not in resultados]
+                for cliente_id in self.expirados(estados, pendentes):
+                    seletor.unregister(self.clientes[cliente_id]['socket'])
+                    self.marcar_falha(cliente_id, "timeout")
+                    resultados[cliente_id] = None
+        finally:
+            seletor.close()
+            for cliente_id in envios:
+                try:
+                    self.clientes[cliente_id]['socket'].setblocking(True)
+                except OSError:
+                    pass
+        
+        tempos = sorted(latencias.values())
+        self.metricas.append({
+            'passo': passo,
+            'latencias': latencias,
+            # Quanto o último cliente atrasou a iteração em relação ao primeiro
+            'retardatario': tempos[-1] - tempos[0] if tempos else 0.0,
+        })
+        return resultados
+    
+    def processar_iteracao(self, matriz, num_clientes, prob_crescimento=0.01, prob_fogo=0.0001, passo=0):
+        """Processa uma iteração distribuída entre até num_clientes clientes ativos.
+        Faixas de clientes que falham são refeitas na mesma iteração."""
         n = len(matriz)
-        regioes = dividir_matriz_em_regioes(n, num_clientes)
-        
-        # Envia trabalho para clientes
-        for i in range(num_clientes):
-            regiao_data = extrair_regiao_com_bordas(matriz, regioes[i][0], regioes[i][1])
-            trabalho = {
-                'comando': 'processar',
-                'regiao': regiao_data,
-                'prob_crescimento': prob_crescimento,
-                'prob_fogo': prob_fogo
-            }
-            self.enviar_dados(i, trabalho)
+        self.instrumentacao.passo = passo
+        ativos = self.clientes_ativos()[:num_clientes]
+        regioes = dict(zip(ativos, dividir_linhas(n, len(ativos)))) if ativos else {}
         
-        # Recebe resultados
-        nova_matriz = [[0 for _ in range(n)] for _ in range(n)]
-        for i in range(num_clientes):
-            resultado = self.receber_dados(i)
+        # Cada faixa é montada assim que chega, enquanto as outras ainda são esperadas
+        matriz, nova_matriz = self.buffers_iteracao(matriz)
+        self.estatisticas[passo] = novos_contadores()
+        perdidas = self.distribuir_faixas(matriz, nova_matriz, regioes, prob_crescimento, prob_fogo, passo)
+        if not ativos:
+            perdidas = [(0, n)]
+        self.recuperar_faixas(matriz, nova_matriz, perdidas, prob_crescimento, prob_fogo, passo)
+        return nova_matriz
+    
+    def buffers_iteracao(self, matriz):
+        """Grade de entrada e buffer de saída de uma iteração. Com memória compartilhada,
+        são os dois buffers do segmento (a grade é copiada para ele na primeira vez), e os
+        clientes locais leem e escrevem as suas linhas direto neles."""
+        if self.memoria is None:
+            return matriz, np.zeros_like(matriz)
+        origem = self.memoria.indice(matriz)
+        if origem is None:
+            origem = 0
+            self.memoria.grades[0][...] = matriz
+        return self.memoria.grades[origem], self.memoria.grades[1 - origem]
+    
+    def usa_memoria(self, cliente_id):
+        """True se o cliente troca a grade pela memória compartilhada."""
+        return self.memoria is not None and self.clientes[cliente_id]['local']
+    
+    def mensagem_processar(self, cliente_id, matriz, linha_inicio, linha_fim, prob_crescimento, prob_fogo, passo):
+        """Comando que pede ao cliente as linhas [linha_inicio, linha_fim) do próximo passo.
+        Cliente remoto recebe a região com as bordas; cliente local recebe só o intervalo e
+        os nomes dos segmentos, lê de matriz e escreve no outro buffer."""
+        dados = {'passo': passo, 'prob_crescimento': prob_crescimento, 'prob_fogo': prob_fogo,
+                 'semente': self.semente}
+        if self.usa_memoria(cliente_id):
+            dados.update(comando='processar_local', grades=self.memoria.nomes, linhas_grade=self.memoria.n,
+                         origem=self.memoria.indice(matriz), linha_inicio=linha_inicio, linha_fim=linha_fim)
+        else:
+            dados.update(comando='processar', regiao=extrair_regiao_com_bordas(matriz, linha_inicio, linha_fim))
+        return dados
+    
+    def distribuir_faixas(self, matriz, nova_matriz, regioes, prob_crescimento, prob_fogo, passo):
+        """Envia cada faixa de regioes (cliente_id -> (inicio, fim)) ao seu cliente e monta
+        os resultados em nova_matriz. Retorna as faixas cujos clientes falharam."""
+        trabalhos = {}
+        with self.instrumentacao.medir('particionamento', passo):
+            for cliente_id, (linha_inicio, linha_fim) in regioes.items():
+                trabalhos[cliente_id] = self.mensagem_processar(cliente_id, matriz, linha_inicio, linha_fim,
+                                                                prob_crescimento, prob_fogo, passo)
+        
+        def montar(cliente_id, resultado):
             if resultado:
-                linha_inicio, linha_fim = regioes[i]
-                matriz_resultado = resultado['matriz_processada']
-                for idx, linha_global in enumerate(range(linha_inicio, linha_fim)):
-                    nova_matriz[linha_global] = matriz_resultado[idx]
+                linha_inicio, linha_fim = regioes[cliente_id]
+                with self.instrumentacao.medir('montagem', passo):
+                    # Cliente local já escreveu as linhas no buffer compartilhado
+                    if 'matriz_processada' in resultado:
+                        nova_matriz[linha_inicio:linha_fim] = resultado['matriz_processada']
+                    self.somar_estatisticas(passo, resultado)
+        
+        resultados = self.trocar_concorrente(trabalhos, montar, passo)
+        return [regioes[c] for c, resultado in resultados.items() if resultado is None]
+    
+    def somar_estatisticas(self, passo, resultado):
+        """Soma aos contadores do passo os que vieram na resposta de um cliente."""
+        if resultado.get('estatisticas'):
+            somar_contadores(self.estatisticas.setdefault(passo, novos_contadores()), resultado['estatisticas'])
+    
+    def recuperar_faixas(self, matriz, nova_matriz, perdidas, prob_crescimento, prob_fogo, passo):
+        """Refaz na mesma iteração as faixas de clientes que falharam: redistribui entre os
+        sobreviventes e, se não sobrar nenhum, calcula no próprio servidor."""
+        while perdidas:
+            ativos = self.clientes_ativos()
+            if not ativos:
+                for linha_inicio, linha_fim in perdidas:
+                    avancar_faixa(matriz, nova_matriz, linha_inicio, linha_fim, prob_crescimento, prob_fogo, self.rng,
+                                  self.semente, passo, 0, self.estatisticas.setdefault(passo, novos_contadores()))
+                return
+            
+            print(f"Reatribuindo {len(perdidas)} faixa(s) a {len(ativos)} cliente(s)")
+            # Um cliente por faixa nesta rodada; o que sobrar vai na próxima
+            regioes = dict(zip(ativos, perdidas))
+            perdidas = perdidas[len(regioes):]
+            perdidas += self.distribuir_faixas(matriz, nova_matriz, regioes, prob_crescimento, prob_fogo, passo)
+    
+    def tamanho_faixa(self, cliente_id, restantes, ativos, fator=2, linhas_min=8):
+        """Escolhe quantas linhas entregar ao cliente no modo dinâmico.
+        Cada entrega leva uma fração das linhas restantes proporcional à vazão medida
+        do cliente, dividida por fator: sobram faixas para redistribuir no fim da iteração."""
+        vazoes = [self.clientes[c]['vazao'] for c in ativos]
+        conhecidas = [v for v in vazoes if v]
+        media = sum(conhecidas) / len(conhecidas) if conhecidas else 1.0
+        # Clientes ainda sem medida (recém-chegados) entram com a vazão média
+        soma = sum(v or media for v in vazoes)
+        peso = (self.clientes[cliente_id]['vazao'] or media) / soma
+        return min(restantes, max(linhas_min, int(np.ceil(restantes * peso / fator))))
+    
+    def processar_iteracao_dinamica(self, matriz, prob_crescimento=0.01, prob_fogo=0.0001, passo=0):
+        """Processa uma iteração distribuindo faixas sob demanda a partir de uma fila.
+        Cliente que termina recebe a próxima faixa, com tamanho ajustado pela sua vazão;
+        clientes que se conectam durante a iteração já passam a receber faixas. A faixa de
+        um cliente que falha volta para a fila."""
+        n = len(matriz)
+        self.instrumentacao.passo = passo
+        matriz, nova_matriz = self.buffers_iteracao(matriz)
+        self.estatisticas[passo] = novos_contadores()
+        seletor = selectors.DefaultSelector()
+        self.servidor_socket.setblocking(False)
+        seletor.register(self.servidor_socket, selectors.EVENT_READ, None)
+        # Negociações que começaram numa iteração anterior continuam nesta
+        for cliente_id in self.entrando:
+            self.clientes[cliente_id]['socket'].setblocking(False)
+            seletor.register(self.clientes[cliente_id]['socket'], selectors.EVENT_READ, cliente_id)
         
+        proxima_linha = 0
+        devolvidas = []
+        estados = {}
+        faixas = {}
+        livres = self.clientes_ativos()
+        latencias = {}
+        inicio = time.perf_counter()
+        
+        def despachar():
+            nonlocal proxima_linha
+            while livres and (devolvidas or proxima_linha < n):
+                cliente_id = livres.pop(0)
+                if devolvidas:
+                    linha_inicio, linha_fim = devolvidas.pop()
+                else:
+                    ativos = livres + list(faixas) + [cliente_id]
+                    linhas = self.tamanho_faixa(cliente_id, n - proxima_linha, ativos)
+                    linha_inicio, linha_fim = proxima_linha, proxima_linha + linhas
+                    proxima_linha = linha_fim
+                faixas[cliente_id] = (linha_inicio, linha_fim)
+                with self.instrumentacao.medir('particionamento', passo):
+                    dados = self.mensagem_processar(cliente_id, matriz, linha_inicio, linha_fim, prob_crescimento,
+                                                    prob_fogo, passo)
+                estados[cliente_id] = self.preparar_envio(cliente_id, dados)
+                sock = self.clientes[cliente_id]['socket']
+                seletor.register(sock, selectors.EVENT_READ | selectors.EVENT_WRITE, cliente_id)
+        
+        try:
+            despachar()
+            while faixas:
+                for chave, eventos in self.esperar(seletor):
+                    cliente_id = chave.data
+                    if cliente_id is None:
+                        # Novo cliente entrando com a simulação em andamento: o 'ola' é lido
+                        # pelo seletor, e só depois dele o cliente passa a receber faixas
+                        try:
+                            cliente_socket, endereco = self.servidor_socket.accept()
+                        except OSError:
+                            continue
+                        novo = self.adicionar_cliente(cliente_socket, endereco, ativo=False)
+                        self.entrando[novo] = self.estado_conexao(novo)
+                        seletor.register(cliente_socket, selectors.EVENT_READ, novo)
+                        continue
+                    if cliente_id in self.entrando:
+                        if self.receber_entrada(seletor, chave.fileobj, eventos, cliente_id):
+                            livres.append(cliente_id)
+                            despachar()
+                        continue
+                    
+                    estado = estados[cliente_id]
+                    sock = chave.fileobj
+                    try:
+                        resultado = self.atender_evento(seletor, sock, eventos, estado, cliente_id)
+                    except OSError as erro:
+                        # Cliente perdido: a faixa volta para a fila
+                        seletor.unregister(sock)
+                        self.marcar_falha(cliente_id, erro)
+                        devolvidas.append(faixas.pop(cliente_id))
+                        despachar()
+                        continue
+                    
+                    if resultado is not None:
+                        seletor.unregister(sock)
+                        linha_inicio, linha_fim = faixas.pop(cliente_id)
+                        with self.instrumentacao.medir('montagem', passo):
+                            if 'matriz_processada' in resultado:
+                                nova_matriz[linha_inicio:linha_fim] = resultado['matriz_processada']
+                            self.somar_estatisticas(passo, resultado)
+                        
+                        duracao = time.perf_counter() - estado['inicio']
+                        latencias[cliente_id] = latencias.get(cliente_id, 0.0) + duracao
+                        vazao = (linha_fim - linha_inicio) / max(duracao, 1e-9)
+                        anterior = self.clientes[cliente_id]['vazao']
+                        self.clientes[cliente_id]['vazao'] = vazao if anterior is None else 0.5 * anterior + 0.5 * vazao
+                        
+                        livres.append(cliente_id)
+                        despachar()
+                
+                for cliente_id in self.expirados(estados, list(faixas)):
+                    seletor.unregister(self.clientes[cliente_id]['socket'])
+                    self.marcar_falha(cliente_id, "timeout")
+                    devolvidas.append(faixas.pop(cliente_id))
+                for cliente_id in self.expirados(self.entrando, list(self.entrando)):
+                    self.descartar_entrada(seletor, cliente_id)
+                despachar()
+            
+            # Sem nenhum cliente vivo: o servidor termina a iteração sozinho
+            if proxima_linha < n:
+                devolvidas.append((proxima_linha, n))
+            if devolvidas:
+                self.recuperar_faixas(matriz, nova_matriz, devolvidas, prob_crescimento, prob_fogo, passo)
+        finally:
+            seletor.close()
+            self.servidor_socket.setblocking(True)
+            for cliente in self.clientes:
+                try:
+                    cliente['socket'].setblocking(True)
+                except OSError:
+                    pass
+        
+        fim = time.perf_counter() - inicio
+        self.metricas.append({
+            'passo': passo,
+            'latencias': latencias,
+            # Tempo ocioso do cliente que terminou primeiro até o fim da iteração
+            'retardatario': fim - min(latencias.values()) if latencias else 0.0,
+        })
         return nova_matriz
     
-    def simular_distribuida(self, n, iteracoes, num_clientes):
-        """Executa simulação distribuída completa."""
-        print(f"Simulação {n}x{n}, {iteracoes} iterações, {num_clientes} clientes")
+    def carregar_faixas(self, matriz, prob_crescimento=0.01, prob_fogo=0.0001, profundidade=1):
+        """Modo com estado: divide a grade entre os clientes ativos e envia a cada um a
+        sua faixa, que fica residente nele. Retorna as bordas de cada faixa (as k primeiras
+        e as k últimas linhas, k = profundidade, limitada à altura da menor faixa).
+        Com matriz None, cada cliente gera a sua faixa da grade inicial a partir da semente
+        (self.geracao) e o servidor gera só as linhas de borda: nenhuma faixa trafega.
+        Clientes locais copiam a faixa da memória compartilhada."""
+        ativos = self.clientes_ativos()
+        n = self.geracao['n'] if matriz is None else len(matriz)
+        regioes = dividir_linhas(n, len(ativos))
+        self.distribuicao = list(zip(ativos, regioes))
+        k = self.profundidade = max(1, min([profundidade] + [fim - inicio for inicio, fim in regioes]))
+        # Com halos recalculados, cliente e vizinho precisam dos mesmos sorteios
+        semente = semente_aleatoria() if self.semente is None and k > 1 else self.semente
+        bordas = []
+        for i, (linha_inicio, linha_fim) in self.distribuicao:
+            dados = {
+                'comando': 'carregar',
+                'linha_inicio': linha_inicio,
+                'linha_fim': linha_fim,
+                'prob_crescimento': prob_crescimento,
+                'prob_fogo': prob_fogo,
+                'semente': semente,
+                'passos': k,
+                'linhas_grade': n,
+            }
+            if matriz is None:
+                # Comando de controle (JSON): a faixa é gerada no cliente
+                dados.update(comando='gerar', prob_arvore=self.geracao['prob_arvore'], padrao=self.geracao['padrao'],
+                             semente_grade=self.geracao['semente'])
+                topo, base = (gerar_linhas(a, b, n, self.geracao['prob_arvore'], self.geracao['semente'],
+                                           self.geracao['padrao'])
+                              for a, b in ((linha_inicio, linha_inicio + k), (linha_fim - k, linha_fim)))
+            elif self.usa_memoria(i):
+                if self.memoria.indice(matriz) is None:
+                    self.memoria.grades[0][...] = matriz
+                    matriz = self.memoria.grades[0]
+                dados.update(comando='carregar_local', grades=self.memoria.nomes, origem=self.memoria.indice(matriz))
+                topo, base = matriz[linha_inicio:linha_inicio + k], matriz[linha_fim - k:linha_fim]
+            else:
+                dados['faixa'] = matriz[linha_inicio:linha_fim]
+                topo, base = matriz[linha_inicio:linha_inicio + k], matriz[linha_fim - k:linha_fim]
+            if not self.enviar_dados(i, dados):
+                self.marcar_falha(i, "falha ao enviar a faixa")
+                raise FalhaCliente(i)
+            bordas.append(np.vstack((topo, base)))
+        return bordas
+    
+    def processar_iteracao_estado(self, bordas, passo=0, passos=1):
+        """Modo com estado: repassa a cada cliente só as linhas vizinhas da sua faixa
+        e recebe de volta as novas bordas. O tráfego por passo é O(n), não O(n²).
+        Com passos > 1 (até a profundidade dos halos), cada cliente avança vários passos
+        por troca: uma ida e volta na rede a cada `passos` passos.
+        Se algum cliente falhar, o estado da sua faixa se perde: levanta FalhaCliente."""
+        num_faixas = len(bordas)
+        k = self.profundidade
+        vazia = np.zeros((k, bordas[0].shape[1]), dtype=np.uint8)
+        self.instrumentacao.passo = passo
+        
+        envios = {}
+        with self.instrumentacao.medir('particionamento', passo):
+            for j, (cliente_id, _) in enumerate(self.distribuicao):
+                # Fora da grade não há fogo: a linha vazia equivale a não ter vizinho
+                acima = bordas[j - 1][k:] if j > 0 else vazia
+                abaixo = bordas[j + 1][:k] if j < num_faixas - 1 else vazia
+                envios[cliente_id] = {'comando': 'passo', 'bordas': np.vstack((acima, abaixo)), 'passo': passo,
+                                      'passos': passos}
+        
+        resultados = self.trocar_concorrente(envios, passo=passo)
+        if any(resultado is None for resultado in resultados.values()):
+            raise FalhaCliente(passo)
+        with self.instrumentacao.medir('montagem', passo):
+            for p in range(passo, passo + passos):
+                self.estatisticas[p] = novos_contadores()
+            for resultado in resultados.values():
+                if passos > 1:
+                    for p, contadores in enumerate(resultado['serie'], passo):
+                        somar_contadores(self.estatisticas[p], contadores)
+                else:
+                    self.somar_estatisticas(passo, resultado)
+            # Cópia: as bordas recebidas são vistas do buffer de recepção de cada cliente
+            return [np.array(resultados[c]['bordas'], dtype=np.uint8) for c, _ in self.distribuicao]
+    
+    def iniciar_pipeline(self, passo, ate):
+        """Modo pipeline: pede a cada cliente que calcule já o interior da faixa no passo
+        `passo` e, daí em diante, o do passo seguinte logo após cada resposta (até `ate`)."""
+        for cliente_id, _ in self.distribuicao:
+            if not self.enviar_dados(cliente_id, {'comando': 'antecipar', 'passo': passo, 'ate': ate}):
+                self.marcar_falha(cliente_id, "falha ao iniciar o pipeline")
+                raise FalhaCliente(cliente_id)
+    
+    def processar_estado_pipeline(self, bordas, passo=0, passos=1):
+        """Modo com estado em pipeline (halos de uma linha): avança `passos` passos sem
+        barreira entre as faixas. Cada faixa recebe os halos do passo seguinte assim que as
+        duas vizinhas terminam o passo atual, sem esperar a grade inteira; enquanto isso, os
+        clientes já calculam o interior (iniciar_pipeline). Faixas distantes podem estar em
+        passos diferentes. Retorna as bordas de cada faixa ao fim do bloco.
+        Se algum cliente falhar, espera as respostas já pedidas e levanta FalhaCliente."""
+        num_faixas = len(bordas)
+        ids = [cliente_id for cliente_id, _ in self.distribuicao]
+        fim = passo + passos
+        vazia = np.zeros((1, bordas[0].shape[1]), dtype=np.uint8)
+        # Bordas de cada faixa por passo concluído e próximo passo de cada faixa
+        historico = [{passo: b} for b in bordas]
+        proximo = [passo] * num_faixas
+        for p in range(passo, fim):
+            self.estatisticas[p] = novos_contadores()
+        
+        seletor = selectors.DefaultSelector()
+        estados = {}
+        em_andamento = {}
+        latencias = {}
+        concluidas = {}
+        falhou = False
+        inicio = time.perf_counter()
+        
+        def pronta(j):
+            p = proximo[j]
+            return (not falhou and p < fim and ids[j] not in em_andamento
+                    and (j == 0 or p in historico[j - 1]) and (j == num_faixas - 1 or p in historico[j + 1]))
+        
+        def despachar(j):
+            p = proximo[j]
+            cliente_id = ids[j]
+            # Fora da grade não há fogo: a linha vazia equivale a não ter vizinho
+            acima = historico[j - 1][p][1:] if j > 0 else vazia
+            abaixo = historico[j + 1][p][:1] if j < num_faixas - 1 else vazia
+            self.instrumentacao.passo = p
+            estados[cliente_id] = self.preparar_envio(cliente_id, {'comando': 'passo', 'bordas': np.vstack((acima, abaixo)),
+                                                                    'passo': p, 'passos': 1})
+            em_andamento[cliente_id] = (j, p)
+            seletor.register(self.clientes[cliente_id]['socket'], selectors.EVENT_READ | selectors.EVENT_WRITE,
+                             cliente_id)
+        
+        def perder(cliente_id, motivo):
+            nonlocal falhou
+            seletor.unregister(self.clientes[cliente_id]['socket'])
+            em_andamento.pop(cliente_id)
+            self.marcar_falha(cliente_id, motivo)
+            falhou = True
+        
+        try:
+            for j in range(num_faixas):
+                if pronta(j):
+                    despachar(j)
+            while em_andamento:
+                for chave, eventos in self.esperar(seletor):
+                    cliente_id = chave.data
+                    try:
+                        resultado = self.atender_evento(seletor, chave.fileobj, eventos, estados[cliente_id], cliente_id)
+                    except OSError as erro:
+                        perder(cliente_id, erro)
+                        continue
+                    if resultado is None:
+                        continue
+                    
+                    seletor.unregister(chave.fileobj)
+                    j, p = em_andamento.pop(cliente_id)
+                    agora = time.perf_counter()
+                    latencias.setdefault(cliente_id, []).append(agora - estados[cliente_id]['inicio'])
+                    with self.instrumentacao.medir('montagem', p):
+                        # Cópia: as bordas recebidas são vistas do buffer de recepção do cliente
+                        historico[j][p + 1] = np.array(resultado['bordas'], dtype=np.uint8)
+                        self.somar_estatisticas(p, resultado)
+                    proximo[j] = p + 1
+                    if proximo[j] == fim:
+                        concluidas[j] = agora
+                    # Bordas que nenhuma faixa ainda vai pedir
+                    minimo = min(proximo)
+                    for h in historico:
+                        for antigo in [q for q in h if q < minimo]:
+                            del h[antigo]
+                    for vizinha in (j - 1, j, j + 1):
+                        if 0 <= vizinha < num_faixas and pronta(vizinha):
+                            despachar(vizinha)
+                
+                for cliente_id in self.expirados(estados, list(em_andamento)):
+                    perder(cliente_id, "timeout")
+        finally:
+            seletor.close()
+            for cliente_id in ids:
+                try:
+                    self.clientes[cliente_id]['socket'].setblocking(True)
+                except OSError:
+                    pass
+        if falhou:
+            raise FalhaCliente(passo)
+        
+        self.metricas.append({
+            'passo': passo,
+            'latencias': {c: sum(v) / len(v) for c, v in latencias.items()},
+            # Quanto a última faixa terminou o bloco depois da primeira
+            'retardatario': max(concluidas.values()) - min(concluidas.values()) if concluidas else 0.0,
+        })
+        return [h[fim] for h in historico]
+    
+    def coletar_grade(self):
+        """Modo com estado: busca a grade completa nos clientes (snapshots e resultado final).
+        Clientes locais escrevem a faixa direto na memória compartilhada, onde a grade é montada."""
+        regioes = dict(self.distribuicao)
+        n = self.distribuicao[-1][1][1]
+        matriz = np.zeros((n, n), dtype=np.uint8) if self.memoria is None else self.memoria.grades[0]
+        def montar(cliente_id, resultado):
+            if resultado and 'matriz_processada' in resultado:
+                linha_inicio, linha_fim = regioes[cliente_id]
+                matriz[linha_inicio:linha_fim] = resultado['matriz_processada']
+        
+        pedidos = {c: {'comando': 'coletar_local', 'grades': self.memoria.nomes} if self.usa_memoria(c)
+                   else {'comando': 'coletar'} for c in regioes}
+        resultados = self.trocar_concorrente(pedidos, montar)
+        if any(resultado is None for resultado in resultados.values()):
+            raise FalhaCliente('coletar')
+        return matriz
+    
+    def simular_estado(self, matriz, passo_inicial, iteracoes, intervalo_checkpoint, checkpoint=None, gravador=None,
+                       profundidade=1, pipeline=False):
+        """Laço do modo com estado. A cada intervalo_checkpoint passos a grade é coletada
+        como ponto de retorno; se um cliente falhar, a simulação volta a esse ponto e
+        redistribui as faixas entre os sobreviventes (ou segue no servidor, sem clientes).
+        Com gravador, a grade também é coletada nos passos que ele deve gravar.
+        Com profundidade k > 1, os clientes avançam blocos de até k passos por troca; os
+        blocos terminam nos pontos de retorno e nos passos gravados.
+        Com pipeline, os passos entre pontos de retorno (e passos gravados) correm sem
+        barreira (processar_estado_pipeline); a profundidade fica em 1."""
+        if pipeline:
+            profundidade = 1
+        # Sem matriz (grade gerada nos clientes), o ponto de retorno inicial é gerá-la de novo
+        retorno = (None if matriz is None else matriz.copy(), passo_inicial)
+        passo = passo_inicial
+        bordas = None
+        while passo < iteracoes:
+            if not self.clientes_ativos():
+                print(f"Sem clientes ativos: continuando no servidor a partir do passo {passo}")
+                if matriz is None:
+                    matriz = self.gerar_grade()
+                for passo in range(passo, iteracoes):
+                    matriz = self.processar_iteracao(matriz, 0, passo=passo)
+                    self.concluir_passo(matriz, passo, iteracoes, gravador, checkpoint, intervalo_checkpoint)
+                return matriz
+            try:
+                if bordas is None:
+                    bordas = self.carregar_faixas(matriz, profundidade=profundidade)
+                    if pipeline:
+                        self.iniciar_pipeline(passo, iteracoes)
+                passos = min(iteracoes - passo if pipeline else self.profundidade, iteracoes - passo,
+                             intervalo_checkpoint - passo % intervalo_checkpoint)
+                if gravador is not None:
+                    passos = min(passos, gravador.intervalo - passo % gravador.intervalo)
+                if pipeline:
+                    bordas = self.processar_estado_pipeline(bordas, passo=passo, passos=passos)
+                else:
+                    bordas = self.processar_iteracao_estado(bordas, passo=passo, passos=passos)
+                anterior, passo = passo, passo + passos
+                if anterior % 20 == 0 or anterior // 20 != (passo - 1) // 20:
+                    print(f"Iteração {passo - 1} ({self.estatisticas[passo - 1]['fogo']} células em chamas)")
+                ponto_de_retorno = passo % intervalo_checkpoint == 0 or passo == iteracoes
+                gravar = gravador is not None and gravador.deve_gravar(passo)
+                if ponto_de_retorno or gravar:
+                    matriz = self.coletar_grade()
+                if gravar:
+                    gravador.registrar(passo, matriz)
+                if ponto_de_retorno:
+                    retorno = (matriz.copy(), passo)
+                    if checkpoint:
+                        salvar_checkpoint(checkpoint, matriz, passo)
+            except FalhaCliente:
+                matriz, passo = None if retorno[0] is None else retorno[0].copy(), retorno[1]
+                bordas = None
+                print(f"Voltando ao passo {passo} com {len(self.clientes_ativos())} cliente(s)")
+        return matriz
+    
+    def concluir_passo(self, matriz, passo, iteracoes, gravador, checkpoint, intervalo_checkpoint):
+        """Depois de um passo com a grade inteira no servidor (matriz já no estado passo + 1):
+        grava o estado, mostra o progresso a cada 20 passos e salva o checkpoint a cada
+        intervalo_checkpoint passos e no último."""
+        if gravador is not None:
+            gravador.registrar(passo + 1, matriz)
+        if passo % 20 == 0:
+            print(f"Iteração {passo} ({len(self.clientes_ativos())} clientes, "
+                  f"{self.estatisticas[passo]['fogo']} células em chamas)")
+        if checkpoint and ((passo + 1) % intervalo_checkpoint == 0 or passo + 1 == iteracoes):
+            salvar_checkpoint(checkpoint, matriz, passo + 1)
+    
+    def gerar_grade(self):
+        """Grade inicial completa a partir dos parâmetros de self.geracao."""
+        g = self.geracao
+        return criar_grade(g['n'], g['prob_arvore'], g['semente'], g['padrao'], os.cpu_count() or 1)
+    
+    def simular_distribuida(self, n, iteracoes, num_clientes, modo='regioes', checkpoint=None, intervalo_checkpoint=50,
+                            gravador=None, profundidade=1, prob_arvore=0.6, inicial='uniforme', pipeline=False):
+        """Executa simulação distribuída completa.
+        modo='estado' mantém as faixas nos clientes e troca só as bordas a cada passo
+        (com profundidade k > 1, a cada k passos, com halos de k linhas);
+        modo='dinamico' distribui faixas sob demanda conforme a vazão de cada cliente e
+        aceita clientes novos durante a simulação.
+        Com checkpoint (caminho de arquivo), o estado é gravado a cada intervalo_checkpoint
+        passos e, se o arquivo já existir, a simulação continua de onde parou.
+        gravador (src/gravacao.py) grava em disco um de cada N estados.
+        inicial é um padrão de src/inicializacao.py ('uniforme', 'aglomerada', 'aceiros') ou
+        um arquivo .npy com a grade inicial (lido por mapeamento de memória). No modo estado
+        com semente e sem gravador, os clientes geram as próprias faixas.
+        Se algum cliente estiver nesta máquina (e memoria_local), a grade fica em memória
+        compartilhada com ele (src/memoria_local.py) durante a simulação.
+        pipeline=True (modo estado) sobrepõe comunicação e cálculo: os clientes calculam o
+        interior da faixa enquanto os halos viajam e cada faixa segue para o próximo passo
+        assim que as vizinhas terminam. Ao final, a ocupação de cada nó é impressa."""
+        print(f"Simulação {n}x{n}, {iteracoes} iterações, {num_clientes} clientes (modo {modo})")
         
         self.aceitar_clientes(num_clientes)
-        matriz = criar_matriz(n)
+        passo_inicial = 0
+        self.geracao = None
+        if checkpoint and os.path.exists(checkpoint):
+            matriz, passo_inicial = carregar_checkpoint(checkpoint)
+            print(f"Retomando do checkpoint {checkpoint} no passo {passo_inicial}")
+        elif modo == 'estado' and self.semente is not None and gravador is None and inicial in PADROES:
+            self.geracao = {'n': n, 'prob_arvore': prob_arvore, 'semente': self.semente, 'padrao': inicial}
+            matriz = None
+        else:
+            matriz = grade_inicial(n, prob_arvore, self.semente, inicial, os.cpu_count() or 1)
+        
+        self.bytes_enviados = 0
+        self.bytes_recebidos = 0
+        self.metricas = []
+        self.estatisticas = {}
+        self.ocioso = 0.0
+        self.calculo = {}
+        if any(self.clientes[c]['local'] for c in self.clientes_ativos()):
+            self.memoria = GradesCompartilhadas(n)
+        inicio = time.perf_counter()
+        if gravador is not None:
+            gravador.registrar(passo_inicial, matriz)
+        if modo == 'estado':
+            matriz = self.simular_estado(matriz, passo_inicial, iteracoes, intervalo_checkpoint, checkpoint, gravador,
+                                         profundidade, pipeline)
+            if matriz is None:
+                matriz = self.gerar_grade()
+        else:
+            for i in range(passo_inicial, iteracoes):
+                if modo == 'dinamico':
+                    matriz = self.processar_iteracao_dinamica(matriz, passo=i)
+                else:
+                    matriz = self.processar_iteracao(matriz, num_clientes, passo=i)
+                self.concluir_passo(matriz, i, iteracoes, gravador, checkpoint, intervalo_checkpoint)
+        fim = time.perf_counter()
+        # A grade final não pode ser uma vista do segmento, que é apagado em seguida
+        self.matriz = matriz if self.memoria is None else np.array(matriz)
+        matriz = None
+        self.fechar_memoria()
         
-        inicio = time.time()
-        for i in range(iteracoes):
-            matriz = self.processar_iteracao(matriz, num_clientes)
-            if i % 20 == 0:
-                print(f"Iteração {i}")
-        fim = time.time()
+        executadas = iteracoes - passo_inicial
+        if executadas > 0:
+            print(f"Bytes por iteração: {self.bytes_enviados / executadas:.0f} enviados, "
+                  f"{self.bytes_recebidos / executadas:.0f} recebidos")
+            self.imprimir_latencias()
+            self.imprimir_ocupacao(fim - inicio)
+            serie = self.serie_estatisticas()
+            print(f"Área queimada: {sum(c['queimadas'] for c in serie)} células; "
+                  f"ao final, {serie[-1]['arvore']} árvores e {serie[-1]['fogo']} em chamas")
+            if self.instrumentacao.ativa:
+                self.instrumentacao.imprimir()
         
-        # Encerra clientes
-        for i in range(num_clientes):
+        # Encerra clientes (inclusive os que entraram durante a simulação)
+        for i in self.clientes_ativos():
             self.enviar_dados(i, {'comando': 'encerrar'})
         
         tempo = fim - inicio
         print(f"Tempo distribuído: {tempo:.4f}s")
         return tempo
     
+    def serie_estatisticas(self):
+        """Contadores dos passos executados, em ordem (para estatisticas.salvar_serie)."""
+        return [self.estatisticas[passo] for passo in sorted(self.estatisticas)]
+    
+    def imprimir_latencias(self):
+        """Resume as latências por cliente e o tempo de espera pelo retardatário."""
+        if not self.metricas:
+            return
+        latencias = {}
+        for metrica in self.metricas:
+            for cliente_id, latencia in metrica['latencias'].items():
+                latencias.setdefault(cliente_id, []).append(latencia)
+        for cliente_id in sorted(latencias):
+            valores = latencias[cliente_id]
+            print(f"Cliente {cliente_id + 1}: latência média {1000 * sum(valores) / len(valores):.2f} ms")
+        retardatario = sum(m['retardatario'] for m in self.metricas) / len(self.metricas)
+        print(f"Espera média pelo retardatário: {1000 * retardatario:.2f} ms")
+    
+    def imprimir_ocupacao(self, tempo):
+        """Fração do tempo da simulação em que cada nó trabalhou e em que ficou parado. O
+        servidor está ocioso enquanto espera no seletor; um cliente, fora do cálculo das
+        faixas (esperando halos ou comandos, ou comunicando). Com pipeline, a ociosidade
+        dos clientes cai porque o interior é calculado enquanto as bordas viajam."""
+        if tempo <= 0:
+            return
+        ocioso = min(self.ocioso, tempo)
+        print(f"Servidor: {100 * (tempo - ocioso) / tempo:.0f}% ocupado, {100 * ocioso / tempo:.0f}% ocioso")
+        for cliente_id in sorted(self.calculo):
+            ocupado = min(self.calculo[cliente_id], tempo)
+            print(f"Cliente {cliente_id + 1}: {100 * ocupado / tempo:.0f}% calculando, "
+                  f"{100 * (tempo - ocupado) / tempo:.0f}% ocioso ou comunicando")
+    
+    def fechar_memoria(self):
+        """Apaga os segmentos de memória compartilhada da simulação, se houver."""
+        if self.memoria is not None:
+            self.memoria.fechar()
+            self.memoria = None
+    
     def fechar(self):
         """Fecha conexões."""
+        self.fechar_memoria()
         for cliente in self.clientes:
             try:
                 cliente['socket'].close()
@@ -177,10 +1057,49 @@ if __name__ == "__main__":
         iteracoes = int(sys.argv[2])  # número de iterações  
         num_clientes = int(sys.argv[3])  # número de clientes
         
-        servidor = ServidorForestFire()
+        # Opções extras: "json" força o formato JSON (para comparar bytes na rede) e
+        # "estado" mantém as faixas nos clientes trocando só as bordas e "dinamico"
+        # distribui faixas sob demanda (clientes podem entrar durante a simulação)
+        opcoes = sys.argv[4:]
+        formatos = [FORMATO_JSON] if 'json' in opcoes else FORMATOS
+        modo = next((m for m in ('estado', 'dinamico') if m in opcoes), 'regioes')
+        # "checkpoint=arquivo" grava checkpoints periódicos e retoma deles
+        checkpoint = next((o.split('=', 1)[1] for o in opcoes if o.startswith('checkpoint=')), None)
+        # "estatisticas=arquivo.csv" grava os contadores de cada passo
+        arquivo_estatisticas = next((o.split('=', 1)[1] for o in opcoes if o.startswith('estatisticas=')), None)
+        # "gravar=diretorio" grava a cada 10 passos a grade em disco (src/gravacao.py)
+        gravacao = next((o.split('=', 1)[1] for o in opcoes if o.startswith('gravar=')), None)
+        # "semente=N" torna a execução reproduzível (mesma grade dos outros motores)
+        semente = next((int(o.split('=', 1)[1]) for o in opcoes if o.startswith('semente=')), None)
+        # "perfil=arquivo.json" mede as fases de cada passo e grava um trace do Chrome
+        perfil = next((o.split('=', 1)[1] for o in opcoes if o.startswith('perfil=')), None)
+        # "inicial=padrao" (uniforme, aglomerada, aceiros) ou "inicial=arquivo.npy" escolhe a grade inicial
+        inicial = next((o.split('=', 1)[1] for o in opcoes if o.startswith('inicial=')), 'uniforme')
+        if inicial not in PADROES:
+            n = len(np.load(inicial, mmap_mode='r'))
+        # "profundidade=k" (modo estado) troca bordas a cada k passos, com halos de k linhas
+        profundidade = next((int(o.split('=', 1)[1]) for o in opcoes if o.startswith('profundidade=')), 1)
+        # "tcp" faz a grade passar pelo socket mesmo com clientes nesta máquina
+        memoria_local = 'tcp' not in opcoes
+        # "pipeline" (modo estado) sobrepõe o cálculo dos clientes à troca de halos
+        pipeline = 'pipeline' in opcoes
+        
+        instrumentacao = Instrumentacao() if perfil else None
+        servidor = ServidorForestFire(formatos=formatos, semente=semente, instrumentacao=instrumentacao,
+                                      memoria_local=memoria_local)
         if servidor.iniciar_servidor():
-            servidor.simular_distribuida(n, iteracoes, num_clientes)
+            gravador = Gravador(gravacao, n, intervalo=10, delta=True) if gravacao else None
+            try:
+                servidor.simular_distribuida(n, iteracoes, num_clientes, modo, checkpoint, gravador=gravador,
+                                             profundidade=profundidade, inicial=inicial, pipeline=pipeline)
+                if arquivo_estatisticas:
+                    salvar_serie(arquivo_estatisticas, servidor.serie_estatisticas(), min(servidor.estatisticas, default=0))
+                if perfil:
+                    instrumentacao.salvar_trace(perfil)
+            finally:
+                if gravador is not None:
+                    gravador.fechar()
             servidor.fechar()
     else:
-        print("Uso: python servidor.py <tamanho> <iteracoes> <clientes>") 
+        print("Uso: python servidor.py <tamanho> <iteracoes> <clientes> [json] [estado|dinamico] [checkpoint=arquivo] [semente=N] [gravar=diretorio] [estatisticas=arquivo.csv] [perfil=trace.json] [profundidade=k] [inicial=padrao|arquivo.npy] [tcp] [pipeline]") 
         print("Exemplo: python servidor.py 300 20 2")
\ No newline at end of file
@@ -0,0 +1,156 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.aleatorio import FLUXO_PASSO, sorteios
+from src.estatisticas import novos_contadores, somar_transicoes
+
+# Estados possíveis
+VAZIO = 0
+ARVORE = 1
+FOGO = 2
+
+
+# Quantidade de sorteios por bloco ao criar a grade (limita a memória temporária)
+CELULAS_POR_BLOCO = 1 << 22
+
+
+def sortear_linhas(inicio, fim, m, rng=None, semente=None, passo=0, fluxo=FLUXO_PASSO):
+    """Um número uniforme por célula das linhas [inicio, fim). Com semente, os números vêm
+    do fluxo contador de src/aleatorio.py e não dependem da divisão em faixas."""
+    if semente is not None:
+        return sorteios(semente, passo, inicio, fim, m, fluxo)
+    return rng.random((fim - inicio, m))
+
+
+def vizinhos_em_fogo(grade):
+    """Retorna a máscara das células com algum vizinho de Moore em chamas.
+    O OR 3x3 é separável: primeiro nas linhas, depois nas colunas. A própria
+    célula entra no resultado, o que não importa porque só é usado para árvores.
+    Aceita também uma pilha de grades independentes (k, n, m)."""
+    n, m = grade.shape[-2:]
+    fogo = np.zeros(grade.shape[:-2] + (n + 2, m + 2), dtype=bool)
+    fogo[..., 1:-1, 1:-1] = grade == FOGO
+
+    vertical = fogo[..., :-2, :] | fogo[..., 1:-1, :] | fogo[..., 2:, :]
+    return vertical[..., :-2] | vertical[..., 1:-1] | vertical[..., 2:]
+
+
+def aplicar_regras(atual, nova, inicio, fim, prob_crescimento, prob_fogo, sorteio, contadores=None):
+    """Escreve em nova[inicio:fim] o próximo estado das linhas [inicio, fim) de atual, com
+    os sorteios dados (um número por célula das linhas). Lê uma linha de borda acima e
+    abaixo da faixa para a vizinhança. contadores (src/estatisticas.py) recebe as
+    contagens do passo, tiradas das máscaras que a atualização já calcula."""
+    n = atual.shape[0]
+    topo = max(0, inicio - 1)
+    base = min(n, fim + 1)
+
+    queimando = vizinhos_em_fogo(atual[topo:base])[inicio - topo:fim - topo]
+    cel = atual[inicio:fim]
+    arvore = cel == ARVORE
+
+    # Um sorteio por célula, como na versão de referência: o mesmo número decide
+    # o crescimento (células vazias) ou a ignição espontânea (árvores)
+    saida = nova[inicio:fim]
+    vazio = cel == VAZIO
+    crescimento = vazio & (sorteio < prob_crescimento)
+    ignicoes = arvore & ((sorteio < prob_fogo) | queimando)
+    saida[...] = arvore | crescimento
+    saida[ignicoes] = FOGO
+    if contadores is not None:
+        somar_transicoes(contadores, cel.size, np.count_nonzero(arvore), np.count_nonzero(vazio),
+                         np.count_nonzero(crescimento), np.count_nonzero(ignicoes))
+    return saida
+
+
+def avancar_faixa(atual, nova, inicio, fim, prob_crescimento=0.01, prob_fogo=0.0001, rng=None,
+                  semente=None, passo=0, deslocamento=0, contadores=None):
+    """Escreve em nova[inicio:fim] o próximo estado das linhas [inicio, fim) de atual.
+    Com semente, os sorteios são os do passo `passo` para as linhas globais
+    [inicio + deslocamento, fim + deslocamento), o que torna o resultado reproduzível.
+    contadores (src/estatisticas.py) recebe as contagens do passo."""
+    rng = np.random.default_rng() if rng is None and semente is None else rng
+    sorteio = sortear_linhas(inicio + deslocamento, fim + deslocamento, atual.shape[1], rng, semente, passo)
+    return aplicar_regras(atual, nova, inicio, fim, prob_crescimento, prob_fogo, sorteio, contadores)
+
+
+def avancar_passos(atual, nova, inicio, fim, passos, prob_crescimento=0.01, prob_fogo=0.0001, rng=None,
+                   semente=None, passo=0, deslocamento=0, serie=None, acima=None, abaixo=None, avancar=avancar_faixa):
+    """Bloqueio temporal: avança `passos` passos as linhas [inicio, fim) de um buffer local
+    que traz também `acima` e `abaixo` linhas de halo (padrão: todas as linhas do buffer
+    fora da faixa). Com halos de `passos` linhas, a faixa avança vários passos sem
+    sincronizar com as vizinhas: a cada passo o trecho válido do halo perde uma linha de
+    cada lado, e as linhas de halo ainda necessárias são recalculadas aqui (trabalho
+    redundante com a faixa vizinha). Halo menor que `passos` só é correto na borda da
+    grade, onde as linhas além do buffer contam como vazias.
+    Com mais de um passo é preciso semente: a faixa e a vizinha recalculam as mesmas
+    linhas com os mesmos sorteios. serie (lista) recebe os contadores de cada passo, só
+    das linhas da faixa. avancar é o motor de uma faixa (avancar_faixa ou
+    bitplanos.avancar_faixa_bits). Retorna (atual, nova) já trocados: atual tem o resultado."""
+    altura = atual.n if hasattr(atual, 'n') else len(atual)
+    acima = inicio if acima is None else acima
+    abaixo = altura - fim if abaixo is None else abaixo
+    for k in range(passos):
+        # Linhas de halo que ainda influenciam a faixa nos passos que faltam
+        margem = passos - 1 - k
+        topo, base = inicio - min(acima, margem), fim + min(abaixo, margem)
+        contadores = None if serie is None else novos_contadores()
+        if topo < inicio:
+            avancar(atual, nova, topo, inicio, prob_crescimento, prob_fogo, rng, semente, passo + k, deslocamento)
+        avancar(atual, nova, inicio, fim, prob_crescimento, prob_fogo, rng, semente, passo + k, deslocamento,
+                contadores)
+        if base > fim:
+            avancar(atual, nova, fim, base, prob_crescimento, prob_fogo, rng, semente, passo + k, deslocamento)
+        if serie is not None:
+            serie.append(contadores)
+        atual, nova = nova, atual
+    return atual, nova
+
+
+def proximo_estado_vetorizado(grade, prob_crescimento=0.01, prob_fogo=0.0001, rng=None, nova=None,
+                              semente=None, passo=0, contadores=None):
+    """Calcula o próximo estado da grade inteira com operações em bloco.
+    Mesmas regras de sequencial.proximo_estado; nova pode ser um buffer reaproveitado."""
+    if nova is None:
+        nova = np.empty_like(grade)
+    avancar_faixa(grade, nova, 0, grade.shape[0], prob_crescimento, prob_fogo, rng, semente, passo, 0, contadores)
+    return nova
+
+
+def simular_vetorizado(n, iteracoes, prob_arvore=0.6, prob_crescimento=0.01, prob_fogo=0.0001, semente=None,
+                       gravador=None, serie=None):
+    """Executa a simulação com o motor NumPy e retorna o tempo gasto.
+    gravador (src/gravacao.py) recebe os estados a gravar em disco e serie (lista)
+    recebe os contadores de cada passo (src/estatisticas.py)."""
+    from src.inicializacao import criar_grade
+    rng = np.random.default_rng()
+    grade = criar_grade(n, prob_arvore, semente)
+    buffer = np.empty_like(grade)
+
+    inicio = time.perf_counter()
+
+    if gravador is not None:
+        gravador.registrar(0, grade)
+    for passo in range(iteracoes):
+        contadores = None if serie is None else novos_contadores()
+        buffer = proximo_estado_vetorizado(grade, prob_crescimento, prob_fogo, rng, buffer, semente, passo, contadores)
+        if serie is not None:
+            serie.append(contadores)
+        grade, buffer = buffer, grade
+        if gravador is not None:
+            gravador.registrar(passo + 1, grade)
+
+    fim = time.perf_counter()
+    return fim - inicio
+
+
+if __name__ == "__main__":
+    n = 1000
+    iteracoes = 100
+
+    tempo = simular_vetorizado(n, iteracoes)
+    print(f"Tempo vetorizado: {tempo:.4f} segundos")
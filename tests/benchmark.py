@@ -1,62 +1,224 @@
-import sys
+import contextlib
+import csv
+import io
+import json
 import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(RAIZ)
 
 from src.sequencial import simular
 from src.paralelo import simular_paralelo_final
 
-def benchmark_threads():
-    """Benchmark comparando sequencial vs paralelo com diferentes threads."""
-    
-    print("\n===== Benchmark: Sequencial vs Paralelo =====\n")
-    
-    # Configurações de teste
-    configuracoes = [
-        {"n": 100, "iteracoes": 50},
-        {"n": 200, "iteracoes": 50},
-        {"n": 400, "iteracoes": 25},
-    ]
-    
-    threads_list = [2, 4, 8]
-    
-    for config in configuracoes:
-        n = config["n"]
-        iteracoes = config["iteracoes"]
-        
-        print(f"Matriz {n}x{n} - {iteracoes} iterações")
-        print("-" * 40)
-        
-        # Sequencial
-        tempo_seq = simular(n, iteracoes)
-        print(f"Sequencial:\t{tempo_seq:.4f}s")
-        
-        # Paralelo
-        print("Threads\tTempo (s)\tSpeedup")
-        for threads in threads_list:
-            tempo_par = simular_paralelo_final(
-                n, 
-                iteracoes, 
-                threads, 
-                #"linhas"
-            )
-            speedup = tempo_seq / tempo_par
-            print(f"{threads}\t{tempo_par:.4f}\t\t{speedup:.2f}x")
-        
-        print()
-
-
-# Tamanhos de matriz
-sizes = [100, 200, 500, 800, 1000]
-iterations = 100 
-
-print("\n===== Benchmark da Versão Sequencial =====\n")
-print("Matriz\tIterações\tTempo (s)")
-print("------------------------------------------")
-
-for n in sizes:
-    tempo = simular(n, iterations)
-    print(f"{n}x{n}\t{iterations}\t\t{tempo:.4f}")
-
-# Executa também o benchmark de threads
-benchmark_threads()
+# Campos de cada linha de resultado (JSON e CSV)
+CAMPOS = ('motor', 'n', 'iteracoes', 'trabalhadores', 'repeticoes', 'mediana', 'q1', 'q3', 'iqr',
+          'minimo', 'celulas_por_segundo', 'memoria_pico_mb', 'bytes_por_iteracao')
+
+
+def porta_livre():
+    """Porta TCP livre no loopback para um servidor de benchmark."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+
+def simular_distribuido(n, iteracoes, num_clientes, semente=None, modo='regioes'):
+    """Servidor e num_clientes clientes (processos de src/cliente.py) no loopback.
+    Retorna o tempo das iterações medido pelo servidor, sem a espera pelas conexões, e os
+    bytes trafegados por iteração (enviados mais recebidos pelo servidor)."""
+    from src.servidor import ServidorForestFire
+
+    porta = porta_livre()
+    servidor = ServidorForestFire(porta, semente=semente)
+    clientes = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        if not servidor.iniciar_servidor():
+            raise RuntimeError(f"Não foi possível abrir a porta {porta}")
+        try:
+            for _ in range(num_clientes):
+                clientes.append(subprocess.Popen([sys.executable, os.path.join(RAIZ, 'src', 'cliente.py'), str(porta)],
+                                                 stdout=subprocess.DEVNULL))
+            tempo = servidor.simular_distribuida(n, iteracoes, num_clientes, modo)
+            return tempo, (servidor.bytes_enviados + servidor.bytes_recebidos) / iteracoes
+        finally:
+            servidor.fechar()
+            for cliente in clientes:
+                try:
+                    cliente.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    cliente.kill()
+
+
+# Motores medidos: nome -> (função (n, iteracoes, trabalhadores, semente) -> tempo, ou
+# (tempo, bytes por iteração) nos distribuídos, e se o número de trabalhadores (threads,
+# processos, clientes) faz diferença)
+MOTORES = {
+    'python': (lambda n, it, t, s: simular(n, it, motor="python", semente=s), False),
+    'numpy': (lambda n, it, t, s: simular(n, it, motor="numpy", semente=s), False),
+    'fronteira': (lambda n, it, t, s: simular(n, it, motor="fronteira", semente=s), False),
+    'bits': (lambda n, it, t, s: simular(n, it, motor="bits", semente=s), False),
+    'threads': (lambda n, it, t, s: simular_paralelo_final(n, it, t, backend="threads", semente=s), True),
+    'bits-threads': (lambda n, it, t, s: simular_paralelo_final(n, it, t, backend="bits", semente=s), True),
+    'blocos': (lambda n, it, t, s: simular_paralelo_final(n, it, t, backend="blocos", semente=s), True),
+    'processos': (lambda n, it, t, s: simular_paralelo_final(n, it, t, backend="processos", semente=s), True),
+    # Calibra no aquecimento (se ainda não houver calibração guardada) e mede a escolha
+    'auto': (lambda n, it, t, s: simular_paralelo_final(n, it, backend="auto", semente=s), False),
+    'distribuido': (lambda n, it, t, s: simular_distribuido(n, it, t, s, 'regioes'), True),
+    'distribuido-estado': (lambda n, it, t, s: simular_distribuido(n, it, t, s, 'estado'), True),
+    'distribuido-dinamico': (lambda n, it, t, s: simular_distribuido(n, it, t, s, 'dinamico'), True),
+}
+
+
+def pico_memoria():
+    """Maior memória residente (MB) deste processo e dos filhos já encerrados."""
+    pico = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+
+
+def medir_caso(caso):
+    """Roda num processo novo: aquecimento (descartado) e repetições de um caso.
+    Retorna os tempos de cada repetição, o pico de memória do processo e os bytes na rede
+    por iteração de cada repetição (vazio nos motores locais)."""
+    funcao, _ = MOTORES[caso['motor']]
+    argumentos = (caso['n'], caso['iteracoes'], caso['trabalhadores'], caso['semente'])
+    for _ in range(caso['aquecimento']):
+        funcao(*argumentos)
+    medidas = [funcao(*argumentos) for _ in range(caso['repeticoes'])]
+    tempos = [m[0] if isinstance(m, tuple) else m for m in medidas]
+    trafego = [m[1] for m in medidas if isinstance(m, tuple)]
+    return tempos, pico_memoria(), trafego
+
+
+def resumir(caso, tempos, memoria, trafego=()):
+    """Mediana e intervalo interquartil dos tempos, vazão, memória e, nos motores
+    distribuídos, a mediana dos bytes por iteração de um caso."""
+    q1, mediana, q3 = np.percentile(tempos, [25, 50, 75])
+    return {
+        'motor': caso['motor'], 'n': caso['n'], 'iteracoes': caso['iteracoes'],
+        'trabalhadores': caso['trabalhadores'], 'repeticoes': len(tempos),
+        'mediana': float(mediana), 'q1': float(q1), 'q3': float(q3), 'iqr': float(q3 - q1),
+        'minimo': float(min(tempos)),
+        'celulas_por_segundo': caso['n'] * caso['n'] * caso['iteracoes'] / float(mediana),
+        'memoria_pico_mb': round(memoria, 1),
+        'bytes_por_iteracao': round(float(np.median(trafego))) if trafego else None,
+    }
+
+
+def medir(caso):
+    """Mede um caso num processo criado só para ele: o pico de memória e o estado do
+    interpretador não vêm de casos anteriores."""
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        tempos, memoria, trafego = pool.submit(medir_caso, caso).result()
+    return resumir(caso, tempos, memoria, trafego)
+
+
+def montar_casos(motores, tamanhos, trabalhadores, iteracoes, repeticoes=5, aquecimento=1, semente=0):
+    """Matriz de casos: cada motor em cada tamanho e, nos paralelos, em cada número de
+    trabalhadores. A semente fixa faz todos partirem da mesma grade e seguirem a mesma evolução."""
+    casos = []
+    for motor in motores:
+        paralelo = MOTORES[motor][1]
+        for n in tamanhos:
+            for t in (trabalhadores if paralelo else [1]):
+                casos.append({'motor': motor, 'n': n, 'iteracoes': iteracoes, 'trabalhadores': t,
+                              'repeticoes': repeticoes, 'aquecimento': aquecimento, 'semente': semente})
+    return casos
+
+
+def ambiente():
+    """Descrição da máquina, guardada junto dos resultados."""
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'plataforma': platform.platform(),
+            'processador': platform.processor(), 'nucleos': os.cpu_count()}
+
+
+def salvar_json(arquivo, resultados):
+    with open(arquivo, 'w') as f:
+        json.dump({'ambiente': ambiente(), 'resultados': resultados}, f, indent=1)
+
+
+def salvar_csv(arquivo, resultados):
+    with open(arquivo, 'w', newline='') as f:
+        escritor = csv.DictWriter(f, CAMPOS)
+        escritor.writeheader()
+        escritor.writerows(resultados)
+
+
+def identificar(resultado):
+    return resultado['motor'], resultado['n'], resultado['iteracoes'], resultado['trabalhadores']
+
+
+def comparar(resultados, arquivo_base, tolerancia=0.10):
+    """Compara com uma execução salva (JSON). Um caso regrediu se a mediana piorou mais que
+    a tolerância e os intervalos interquartis não se sobrepõem (não é só ruído).
+    Retorna a lista de (resultado, razão entre as medianas) dos casos que regrediram."""
+    with open(arquivo_base) as f:
+        base = {identificar(r): r for r in json.load(f)['resultados']}
+
+    regressoes = []
+    print(f"\nComparação com {arquivo_base} (tolerância {100 * tolerancia:.0f}%)")
+    for resultado in resultados:
+        anterior = base.get(identificar(resultado))
+        if anterior is None:
+            continue
+        razao = resultado['mediana'] / anterior['mediana']
+        regrediu = razao > 1 + tolerancia and resultado['q1'] > anterior['q3']
+        if regrediu:
+            regressoes.append((resultado, razao))
+        print(f"{resultado['motor']:<21}{resultado['n']:>6}{resultado['trabalhadores']:>4}  "
+              f"{anterior['mediana']:.4f}s -> {resultado['mediana']:.4f}s  x{razao:.2f}"
+              f"{'  REGRESSÃO' if regrediu else ''}")
+    return regressoes
+
+
+def imprimir(resultado):
+    print(f"{resultado['motor']:<21}{resultado['n']:>6}{resultado['trabalhadores']:>4}  "
+          f"{resultado['mediana']:>9.4f}s ±{resultado['iqr']:<8.4f}"
+          f"{resultado['celulas_por_segundo'] / 1e6:>10.2f} Mcél/s{resultado['memoria_pico_mb']:>9.1f} MB"
+          + (f"{resultado['bytes_por_iteracao']:>10} B/it" if resultado.get('bytes_por_iteracao') is not None else ""))
+
+
+def lista(texto, tipo=str):
+    return [tipo(v) for v in texto.split(',')]
+
+
+if __name__ == "__main__":
+    # Opções no formato chave=valor, por exemplo:
+    # python tests/benchmark.py motores=numpy,bits tamanhos=500,1000 trabalhadores=1,2,4 json=base.json
+    # python tests/benchmark.py base=base.json     (falha com código 1 se algum caso regrediu)
+    opcoes = dict(o.split('=', 1) for o in sys.argv[1:] if '=' in o)
+    motores = lista(opcoes.get('motores', ','.join(MOTORES)))
+    desconhecidos = [m for m in motores if m not in MOTORES]
+    if desconhecidos:
+        print(f"Motores desconhecidos: {', '.join(desconhecidos)} (disponíveis: {', '.join(MOTORES)})")
+        sys.exit(2)
+
+    casos = montar_casos(motores, lista(opcoes.get('tamanhos', '200,500'), int),
+                         lista(opcoes.get('trabalhadores', '1,2,4'), int), int(opcoes.get('iteracoes', 20)),
+                         int(opcoes.get('repeticoes', 5)), int(opcoes.get('aquecimento', 1)),
+                         int(opcoes.get('semente', 0)))
+
+    print(f"{len(casos)} casos, {casos[0]['repeticoes']} repetições cada (Python {platform.python_version()}, "
+          f"{os.cpu_count()} núcleos)\n")
+    print(f"{'Motor':<21}{'n':>6}{'T':>4}  {'Mediana':>10} {'IQR':<9}{'Vazão':>10}{'Memória':>14}{'Rede':>15}")
+    resultados = []
+    for caso in casos:
+        resultado = medir(caso)
+        imprimir(resultado)
+        resultados.append(resultado)
+
+    if 'json' in opcoes:
+        salvar_json(opcoes['json'], resultados)
+    if 'csv' in opcoes:
+        salvar_csv(opcoes['csv'], resultados)
+    if 'base' in opcoes and comparar(resultados, opcoes['base'], float(opcoes.get('tolerancia', 0.10))):
+        sys.exit(1)
@@ -0,0 +1,90 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.aleatorio import sorteios
+from src.estatisticas import novos_contadores
+from src.gravacao import Gravador, LeitorGravacao
+from src.nucleo import IMPLEMENTACOES, avancar_python, buffer_como
+from src.paralelo import simular_paralelo_final
+from src.sequencial import simular
+
+# Estados possíveis
+VAZIO = 0
+ARVORE = 1
+FOGO = 2
+
+SEMENTE = 3
+
+# Grades (linhas x colunas) da conformidade: 1x1, pequenas, quadradas e retangulares
+CASOS = [(1, 1), (3, 7), (16, 16), (40, 25), (64, 130)]
+
+
+def faixas(n):
+    """Grade inteira, metade de cima, faixa até a borda de baixo e faixa interna."""
+    return sorted({(0, n), (0, (n + 1) // 2), (n // 3, n), (n // 3, max(n // 3, 2 * n // 3))})
+
+
+def grade_sorteada(n, m):
+    rng = np.random.default_rng(SEMENTE + n * m)
+    return rng.choice(np.array([VAZIO, ARVORE, FOGO], dtype=np.uint8), size=(n, m), p=[0.3, 0.6, 0.1])
+
+
+@pytest.mark.parametrize('nome', sorted(IMPLEMENTACOES))
+@pytest.mark.parametrize('n, m', CASOS)
+def test_nucleo_igual_a_referencia(nome, n, m):
+    """Mesmo estado e mesmos contadores da referência em Python puro, com os mesmos sorteios."""
+    grade = grade_sorteada(n, m)
+    for inicio, fim in faixas(n):
+        sorteio = sorteios(SEMENTE, n + m, inicio, fim, m)
+        esperado, obtido = buffer_como(grade.tolist()), np.zeros_like(grade)
+        contadores_esperados, contadores_obtidos = novos_contadores(), novos_contadores()
+        avancar_python(grade.tolist(), esperado, inicio, fim, 0.3, 0.05, sorteio, contadores_esperados)
+        IMPLEMENTACOES[nome](grade.copy(), obtido, inicio, fim, 0.3, 0.05, sorteio, contadores_obtidos)
+        assert np.array_equal(np.array(esperado, dtype=np.uint8)[inicio:fim], obtido[inicio:fim]), (inicio, fim)
+        assert contadores_esperados == contadores_obtidos, (inicio, fim)
+
+
+N = 64
+ITERACOES = 12
+
+# Motores e backends que, com a mesma semente, chegam à mesma grade
+EXECUCOES = {
+    'python': lambda **kw: simular(N, ITERACOES, 0.6, 0.05, 0.01, motor="python", **kw),
+    'numpy': lambda **kw: simular(N, ITERACOES, 0.6, 0.05, 0.01, motor="numpy", **kw),
+    'bits': lambda **kw: simular(N, ITERACOES, 0.6, 0.05, 0.01, motor="bits", **kw),
+    'threads': lambda **kw: simular_paralelo_final(N, ITERACOES, 3, 0.6, 0.05, 0.01, backend="threads", **kw),
+    'processos': lambda **kw: simular_paralelo_final(N, ITERACOES, 3, 0.6, 0.05, 0.01, backend="processos", **kw),
+    'processos-profundidade': lambda **kw: simular_paralelo_final(N, ITERACOES, 3, 0.6, 0.05, 0.01,
+                                                                  backend="processos", profundidade=4, **kw),
+    'bits-threads': lambda **kw: simular_paralelo_final(N, ITERACOES, 3, 0.6, 0.05, 0.01, backend="bits", **kw),
+    'bits-profundidade': lambda **kw: simular_paralelo_final(N, ITERACOES, 3, 0.6, 0.05, 0.01, backend="bits",
+                                                             profundidade=5, **kw),
+    'blocos': lambda **kw: simular_paralelo_final(N, ITERACOES, 3, 0.6, 0.05, 0.01, backend="blocos", **kw),
+}
+
+
+def executar(nome, diretorio):
+    """Grade final (lida da gravação) e contadores de cada passo de uma execução com semente."""
+    serie = []
+    caminho = os.path.join(diretorio, nome)
+    with Gravador(caminho, N, intervalo=ITERACOES) as gravador:
+        EXECUCOES[nome](semente=SEMENTE, gravador=gravador, serie=serie)
+    return LeitorGravacao(caminho)[ITERACOES], serie
+
+
+@pytest.fixture(scope='module')
+def referencia(tmp_path_factory):
+    return executar('python', tmp_path_factory.mktemp('referencia'))
+
+
+@pytest.mark.parametrize('nome', [nome for nome in EXECUCOES if nome != 'python'])
+def test_motores_iguais_com_semente(nome, referencia, tmp_path):
+    grade, serie = executar(nome, tmp_path)
+    grade_esperada, serie_esperada = referencia
+    assert np.array_equal(grade, grade_esperada)
+    assert serie == serie_esperada